@@ -0,0 +1,379 @@
+"""Backtests --threshold & --cooldown against the quotes recorded with main.py --store.
+
+Reports, for every threshold & cooldown of the grid, how many notifications
+would have been sent for each pair & the distribution of their spreads. The
+decisions of Calculate & Notify are computed for all the ticks of a pair at
+once with NumPy, the pairs are backtested in parallel processes, each
+sweeping the whole grid over its own ticks.
+
+Only the quotes are stored, not when the exchanges were otherwise heard
+from, so a quote is left out once it's older than --max-age, whereas live
+an exchange is only left out once its feed went silent - no message, ping
+nor pong - for that long. A quote that doesn't change for a while on a
+connected feed is thus stale here but not live, which leaves out some of
+the notifications that would have been sent.
+
+Usage: python backtest.py STORE [--pairs BTCUSDT,ETHUSDT] [--thresholds 0.5,1,2] [--cooldowns 0,60,300]
+                                [--taker-fee binance=0.00075,kucoin=0.0008]
+"""
+
+import argparse
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, NamedTuple, Optional
+
+# numpy is only needed by the backtest, not by the monitoring itself
+try:
+    import numpy as np
+except ImportError:
+    sys.exit("The backtest needs numpy, pip install numpy")
+
+from exchanges import registry
+
+# fee assumed for the exchanges that can't be loaded, e.g. a plugin no longer installed
+DEFAULT_TAKER_FEE = 0.001
+
+
+def fee_overrides(value: str) -> dict[str, float]:
+    """Parse a comma separated list of exchange=fee, like main.py's --taker-fee."""
+    overrides = {}
+    for entry in value.split(","):
+        if not entry.strip():
+            continue
+        exchange, _, fee = entry.partition("=")
+        try:
+            fee = float(fee)
+        except ValueError:
+            fee = -1
+        if not exchange.strip() or not 0 <= fee < 1:
+            raise argparse.ArgumentTypeError(f"invalid entry '{entry}'")
+        overrides[exchange.strip().lower()] = fee
+    return overrides
+
+
+def taker_fees(
+    names: list[str], overrides: Optional[dict[str, float]] = None
+) -> dict[str, float]:
+    """Taker fees of the exchanges, by the names stored along with their quotes.
+
+    overrides holds the fees set with --taker-fee, by the lower case names.
+    Only the modules of the other exchanges get imported.
+    """
+    overrides = overrides or {}
+    fees = {}
+    for name in names:
+        if name.lower() in overrides:
+            fees[name] = overrides[name.lower()]
+            continue
+        try:
+            fees[name] = registry.load(name.lower()).taker_fee
+        except (KeyError, ImportError):
+            print(
+                f"Unknown exchange {name}, assuming a taker fee of {DEFAULT_TAKER_FEE:%}",
+                file=sys.stderr,
+            )
+            fees[name] = DEFAULT_TAKER_FEE
+    return fees
+
+
+class Ticks(NamedTuple):
+    """The quotes of a pair, oldest first, as columns."""
+
+    time: np.ndarray
+    exchange: np.ndarray
+    bid: np.ndarray
+    bid_size: np.ndarray
+    ask: np.ndarray
+    ask_size: np.ndarray
+    # names of the exchanges, indexed by the exchange column
+    names: list[str]
+
+
+def load(path: str, pair: str, start: int = 0, end: int = 2**63 - 1) -> Ticks:
+    """The quotes of pair received from start until end, nanoseconds since the epoch."""
+    db = sqlite3.connect(path)
+    try:
+        rows = db.execute(
+            "SELECT receive_time, exchange, bid, bid_size, ask, ask_size FROM quotes "
+            "WHERE pair = ? AND receive_time >= ? AND receive_time < ? ORDER BY receive_time",
+            (pair, start, end),
+        ).fetchall()
+    finally:
+        db.close()
+
+    names = sorted({row[1] for row in rows})
+    index = {name: i for i, name in enumerate(names)}
+    return Ticks(
+        np.fromiter((row[0] for row in rows), np.int64, len(rows)),
+        np.fromiter((index[row[1]] for row in rows), np.int64, len(rows)),
+        *(
+            np.fromiter((row[i] for row in rows), np.float64, len(rows))
+            for i in range(2, 6)
+        ),
+        names,
+    )
+
+
+def align(ticks: Ticks) -> np.ndarray:
+    """The time x exchange matrix of the latest tick of each exchange at each tick, forward filled.
+
+    Row t holds, for every exchange, the index of its latest tick up to &
+    including tick t, or -1 before its first one.
+    """
+    rows = np.arange(len(ticks.time))
+    latest = np.full((len(rows), len(ticks.names)), -1, dtype=np.int64)
+    latest[rows, ticks.exchange] = rows
+    return np.maximum.accumulate(latest, axis=0)
+
+
+def evaluate(
+    ticks: Ticks, fees: list[float], max_age: float = 30.0
+) -> tuple[np.ndarray, np.ndarray]:
+    """The spreads Calculate & Notify would have evaluated on every tick, in %.
+
+    Returns the headline spread, between the highest bid & the lowest ask of
+    different exchanges, and the executable spread after the taker fees of the
+    most profitable pair of exchanges, as Notify compares to the threshold.
+    Both are NaN where fewer than two exchanges have a fresh quote, the
+    executable one also where nothing can be traded at a profit.
+    """
+    latest = align(ticks)
+    seen = latest >= 0
+    latest = np.where(seen, latest, 0)
+    # a quote older than max_age is left out, standing in for its exchange going silent, see the module's docstring
+    fresh = seen
+    if max_age > 0:
+        fresh = seen & (ticks.time[:, None] - ticks.time[latest] <= max_age * 1e9)
+
+    bids = np.where(fresh, ticks.bid[latest], -np.inf)
+    asks = np.where(fresh, ticks.ask[latest], np.inf)
+    rows = np.arange(len(ticks.time))
+    valid = fresh.sum(axis=1) >= 2
+
+    # an exchange with both the highest bid and the lowest ask is paired with the runner-up
+    # of whichever side leaves the wider spread, like Calculate.latest_prices
+    sell, buy = bids.argmax(axis=1), asks.argmin(axis=1)
+    best_bid, best_ask = bids[rows, sell], asks[rows, buy]
+    other_bids, other_asks = bids.copy(), asks.copy()
+    other_bids[rows, buy] = -np.inf
+    other_asks[rows, sell] = np.inf
+    other_bid, other_ask = other_bids.max(axis=1), other_asks.min(axis=1)
+    same = sell == buy
+    with np.errstate(invalid="ignore"):
+        use_bid = other_bid - best_ask >= best_bid - other_ask
+    bid = np.where(same & use_bid, other_bid, best_bid)
+    ask = np.where(same & ~use_bid, other_ask, best_ask)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        headline = np.where(valid, (bid - ask) * 100 / ask, np.nan)
+
+    # the top of the books of every two exchanges are matched against each other, after the fees
+    best_profit = np.zeros(len(rows))
+    executable = np.full(len(rows), np.nan)
+    for b in range(len(ticks.names)):
+        buy_price = ticks.ask[latest[:, b]] * (1 + fees[b])
+        buy_size = ticks.ask_size[latest[:, b]]
+        for s in range(len(ticks.names)):
+            if s == b:
+                continue
+            sell_price = ticks.bid[latest[:, s]] * (1 - fees[s])
+            size = np.minimum(buy_size, ticks.bid_size[latest[:, s]])
+            profit = size * (sell_price - buy_price)
+            better = fresh[:, b] & fresh[:, s] & (profit > best_profit)
+            best_profit = np.where(better, profit, best_profit)
+            executable = np.where(
+                better, (sell_price - buy_price) * 100 / buy_price, executable
+            )
+
+    return headline, executable
+
+
+def fire(times: np.ndarray, cooldown: float) -> np.ndarray:
+    """Indexes of the candidate times at which a notification is sent, each cooldown seconds after the previous one at the earliest."""
+    # where the next notification can be sent from each candidate, once the cooldown is strictly over
+    following = np.searchsorted(
+        times, times + int(cooldown * 1e9), side="right"
+    ).tolist()
+    fired = []
+    i = 0
+    while i < len(following):
+        fired.append(i)
+        i = following[i]
+    return np.array(fired, dtype=np.int64)
+
+
+def sweep(
+    times: np.ndarray,
+    executable: np.ndarray,
+    thresholds: list[float],
+    cooldowns: list[float],
+) -> list[dict[str, Any]]:
+    """The notifications every threshold & cooldown would have sent."""
+    results = []
+    for threshold in thresholds:
+        with np.errstate(invalid="ignore"):
+            candidates = np.flatnonzero(executable >= threshold)
+        for cooldown in cooldowns:
+            fired = candidates[fire(times[candidates], cooldown)]
+            spreads = executable[fired]
+            results.append(
+                {
+                    "threshold": threshold,
+                    "cooldown": cooldown,
+                    "alerts": len(fired),
+                    "spreads": (
+                        np.percentile(spreads, [50, 90, 99, 100])
+                        if len(fired)
+                        else np.zeros(4)
+                    ),
+                }
+            )
+    return results
+
+
+def backtest(
+    path: str,
+    pair: str,
+    fees: dict[str, float],
+    thresholds: list[float],
+    cooldowns: list[float],
+    max_age: float,
+    start: int,
+    end: int,
+) -> tuple[str, int, Optional[np.ndarray], list[dict[str, Any]]]:
+    """Evaluate the spreads of a pair & sweep the grid over them, in a worker process.
+
+    Returns the pair, its number of ticks, the percentiles of its headline
+    spread & the notifications of every point of the grid, see sweep.
+    """
+    ticks = load(path, pair, start, end)
+    if not len(ticks.time):
+        return pair, 0, None, []
+
+    headline, executable = evaluate(
+        ticks, [fees.get(name, DEFAULT_TAKER_FEE) for name in ticks.names], max_age
+    )
+    evaluated = headline[~np.isnan(headline)]
+    distribution = (
+        np.percentile(evaluated, [50, 90, 99, 100]) if len(evaluated) else None
+    )
+    if distribution is None:
+        return pair, len(ticks.time), None, []
+
+    # only the ticks reaching the lowest threshold can be notified
+    with np.errstate(invalid="ignore"):
+        candidates = np.flatnonzero(executable >= min(thresholds))
+    grid = sweep(ticks.time[candidates], executable[candidates], thresholds, cooldowns)
+    return pair, len(ticks.time), distribution, grid
+
+
+def main(args: argparse.Namespace) -> None:
+    db = sqlite3.connect(args.store)
+    if args.pairs:
+        pairs = [pair.strip().upper() for pair in args.pairs.split(",")]
+    else:
+        pairs = [row[0] for row in db.execute("SELECT DISTINCT pair FROM quotes")]
+    names = [row[0] for row in db.execute("SELECT DISTINCT exchange FROM quotes")]
+    db.close()
+    if not pairs:
+        sys.exit(f"No quotes stored in {args.store}")
+
+    thresholds = [float(value) for value in args.thresholds.split(",")]
+    cooldowns = [float(value) for value in args.cooldowns.split(",")]
+    start = int(args.start * 1e9)
+    end = int(args.end * 1e9) if args.end else 2**63 - 1
+    fees = taker_fees(names, args.taker_fee)
+
+    began = time.perf_counter()
+    total = 0
+    with ProcessPoolExecutor(max_workers=args.jobs or None) as pool:
+        evaluations = [
+            pool.submit(
+                backtest,
+                args.store,
+                pair,
+                fees,
+                thresholds,
+                cooldowns,
+                args.max_age,
+                start,
+                end,
+            )
+            for pair in pairs
+        ]
+
+        for future in evaluations:
+            pair, ticks, distribution, grid = future.result()
+            total += ticks
+            print(f"\n{pair}: {ticks:,} ticks")
+            if distribution is None:
+                print("  fewer than two exchanges at any time")
+                continue
+            print(
+                "  spread % p50 {:.4f} p90 {:.4f} p99 {:.4f} max {:.4f}".format(
+                    *distribution
+                )
+            )
+            print(
+                f"  {'threshold':>10}{'cooldown':>10}{'alerts':>10}"
+                f"{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}"
+            )
+            for result in grid:
+                print(
+                    f"  {result['threshold']:>10g}{result['cooldown']:>10g}{result['alerts']:>10,}"
+                    + "".join(f"{value:>10.4f}" for value in result["spreads"])
+                )
+
+    elapsed = time.perf_counter() - began
+    print(f"\n{total:,} ticks backtested in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    argsparse = argparse.ArgumentParser("Backtest")
+    argsparse.add_argument(
+        "store", help="SQLite database recorded with main.py --store"
+    )
+    argsparse.add_argument(
+        "--pairs",
+        type=str,
+        default="",
+        help="Comma separated list of the pair keys to backtest, e.g. BTCUSDT,ETHUSDT. Defaults to all the stored ones",
+    )
+    argsparse.add_argument(
+        "--thresholds",
+        type=str,
+        default="0.25,0.5,1,2",
+        help="Comma separated list of the thresholds to backtest, in %%",
+    )
+    argsparse.add_argument(
+        "--cooldowns",
+        type=str,
+        default="0,60,300,900",
+        help="Comma separated list of the cooldowns to backtest, in seconds",
+    )
+    argsparse.add_argument(
+        "--max-age",
+        type=float,
+        default=30.0,
+        help="Leave out the quotes older than max-age seconds, 0 never leaves them out. Defaults to 30 seconds",
+    )
+    argsparse.add_argument(
+        "--taker-fee",
+        type=fee_overrides,
+        default={},
+        help="Comma separated list of exchange=fee overriding the default taker fees, e.g. binance=0.00075,kucoin=0.0008",
+    )
+    argsparse.add_argument(
+        "--start", type=float, default=0.0, help="Unix time of the first quote"
+    )
+    argsparse.add_argument(
+        "--end", type=float, default=0.0, help="Unix time of the last quote"
+    )
+    argsparse.add_argument(
+        "--jobs",
+        type=int,
+        default=0,
+        help="Number of processes backtesting the pairs in parallel, defaults to the number of cores",
+    )
+    main(argsparse.parse_args())
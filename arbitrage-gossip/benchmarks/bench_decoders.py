@@ -0,0 +1,125 @@
+"""Messages per second each exchange decodes with every installed JSON decoder.
+
+Usage: python benchmarks/bench_decoders.py [--messages N]
+"""
+
+import argparse
+import gzip
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from exchanges import decoder
+from exchanges.binance import Binance
+from exchanges.bitfinex import Bitfinex
+from exchanges.bybit import ByBit
+from exchanges.ftx import FTX
+from exchanges.huobi import Huobi
+from exchanges.kucoin import KuCoin
+
+# a real ticker message of each exchange, along with the fields its run() loop reads
+SAMPLES = {
+    Binance: (
+        b'{"stream":"btcusdt@bookTicker","data":{"u":21434712390,"s":"BTCUSDT","b":"29313.49000000","B":"1.20412000","a":"29313.50000000","A":"0.31290000"}}',
+        lambda msg: (
+            msg["data"]["s"],
+            float(msg["data"]["b"]),
+            float(msg["data"]["B"]),
+            float(msg["data"]["a"]),
+            float(msg["data"]["A"]),
+        ),
+    ),
+    FTX: (
+        b'{"channel": "ticker", "market": "BTC/USDT", "type": "update", "data": {"bid": 29310.0, "ask": 29311.0, "bidSize": 0.7335, "askSize": 0.2153, "last": 29310.0, "time": 1654929638.6974728}}',
+        lambda msg: (
+            msg["market"],
+            msg["data"]["bid"],
+            msg["data"]["bidSize"],
+            msg["data"]["ask"],
+            msg["data"]["askSize"],
+            msg["data"]["time"],
+        ),
+    ),
+    ByBit: (
+        b'{"topic": "bookTicker", "params": {"symbol": "BTCUSDT", "binary": "false", "symbolName": "BTCUSDT"}, "data": {"symbol": "BTCUSDT", "bidPrice": "29259.03", "bidQty": "0.412846", "askPrice": "29259.04", "askQty": "0.060722", "time": 1654935180037}}',
+        lambda msg: (
+            msg["data"]["symbol"],
+            float(msg["data"]["bidPrice"]),
+            float(msg["data"]["bidQty"]),
+            float(msg["data"]["askPrice"]),
+            float(msg["data"]["askQty"]),
+            msg["data"]["time"],
+        ),
+    ),
+    Huobi: (
+        gzip.compress(
+            b'{"ch": "market.btcusdt.ticker", "ts": 1654932129289, "tick": {"open": 30082.59, "high": 30186.19, "low": 28841.12, "close": 29342.99, "amount": 16438.237897971736, "vol": 483399849.8806693, "count": 521649, "bid": 29342.98, "bidSize": 6.133091, "ask": 29342.99, "askSize": 2.129672, "lastPrice": 29342.99, "lastSize": 0.00737}}'
+        ),
+        lambda msg: (
+            msg["ch"],
+            float(msg["tick"]["bid"]),
+            float(msg["tick"]["bidSize"]),
+            float(msg["tick"]["ask"]),
+            float(msg["tick"]["askSize"]),
+            msg["ts"],
+        ),
+    ),
+    KuCoin: (
+        b'{"type": "message", "topic": "/market/ticker:ETH-USDT", "subject": "trade.ticker", "data": {"bestAsk": "1669.15", "bestAskSize": "16.0276667", "bestBid": "1669.14", "bestBidSize": "5.1395149", "price": "1669.15", "sequence": "1629182000135", "size": "0.0017103", "time": 1654934466343}}',
+        lambda msg: (
+            msg["topic"],
+            float(msg["data"]["bestBid"]),
+            float(msg["data"]["bestBidSize"]),
+            float(msg["data"]["bestAsk"]),
+            float(msg["data"]["bestAskSize"]),
+            msg["data"]["time"],
+        ),
+    ),
+    Bitfinex: (
+        b"[318834, [29278, 12.84014315, 29283, 8.850295029999998, -795, -0.0264, 29283, 628.17665028, 30182, 28864]]",
+        lambda msg: (msg[0], *map(float, msg[1][:4])),
+    ),
+}
+
+
+def bench(exchange: type, messages: int) -> float:
+    """Messages per second decoded & extracted by the exchange with the selected decoder."""
+    raw, extract = SAMPLES[exchange]
+    loads = decoder.loads_for(exchange.schema)
+
+    if exchange is Huobi:
+        # huobi's frames are gzip compressed binary, the rest are text
+        def handle(raw):
+            return extract(loads(gzip.decompress(raw)))
+
+    else:
+        raw = raw.decode()
+
+        def handle(raw):
+            return extract(loads(raw))
+
+    start = time.perf_counter()
+    for _ in range(messages):
+        handle(raw)
+    return messages / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    argsparse = argparse.ArgumentParser("Decoder benchmark")
+    argsparse.add_argument("--messages", type=int, default=200_000)
+    args = argsparse.parse_args()
+
+    names = list(decoder.DECODERS)
+    print(f"{'exchange':<10}" + "".join(f"{name:>14}" for name in names))
+    for exchange in SAMPLES:
+        results = []
+        for name in names:
+            decoder.use(name)
+            results.append(bench(exchange, args.messages))
+        print(
+            f"{exchange.__name__:<10}"
+            + "".join(f"{result:>14,.0f}" for result in results)
+        )
+    print("messages/sec, decode + fields extraction")
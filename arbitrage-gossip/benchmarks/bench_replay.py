@@ -0,0 +1,172 @@
+"""Replays recorded websocket frames through the exchanges, Calculate & Notify.
+
+Reports the messages per second each exchange handles, the cost of parsing
+a frame into a tick, and the latency from a tick being stored to Calculate
+& Notify deciding on it.
+
+Record the frames first with main.py --capture CAPTURE_DIR, then
+Usage: python benchmarks/bench_replay.py CAPTURE_DIR [--speed S] [--threshold T]
+"""
+
+import argparse
+import asyncio
+import glob
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from exchanges.base import BaseExchange
+from exchanges.binance import Binance
+from exchanges.bitfinex import Bitfinex
+from exchanges.bybit import ByBit
+from exchanges.capture import SUFFIX, Frame, read_capture
+from exchanges.ftx import FTX
+from exchanges.huobi import Huobi
+from exchanges.kucoin import KuCoin
+from exchanges.replay import replay, restore
+
+from calculate import Calculate
+from notify import Notify
+
+CLASSES = {cls.__name__: cls for cls in (Binance, FTX, ByBit, Huobi, KuCoin, Bitfinex)}
+
+
+def load(directory: str) -> dict[str, tuple[dict, list[Frame]]]:
+    """The metadata & the frames of every capture file in directory, by exchange name."""
+    captures = {}
+    for path in sorted(glob.glob(os.path.join(directory, f"*{SUFFIX}"))):
+        metadata, frames = read_capture(path)
+        captures[metadata["exchange"]] = (metadata, list(frames))
+    return captures
+
+
+def percentiles(values: list[float], *ps: float) -> list[float]:
+    """The ps percentiles of values, by the nearest rank."""
+    if not values:
+        return [0.0] * len(ps)
+    values = sorted(values)
+    return [values[min(len(values) - 1, int(p / 100 * len(values)))] for p in ps]
+
+
+async def yield_cost(frames: int) -> float:
+    """Seconds the replay spends yielding to the event loop between frames."""
+    start = time.perf_counter()
+    for _ in range(frames):
+        await asyncio.sleep(0)
+    return time.perf_counter() - start
+
+
+async def bench_parse(name: str, metadata: dict, frames: list[Frame]) -> None:
+    """Replay the frames of a single exchange as fast as possible, without evaluating them."""
+    exchange = restore(CLASSES[name], metadata)
+    ticks = 0
+
+    def count(exchange: BaseExchange, key: str) -> None:
+        nonlocal ticks
+        ticks += 1
+
+    exchange.register_callback(count)
+
+    start = time.perf_counter()
+    await replay({exchange: frames})
+    elapsed = time.perf_counter() - start
+    parsing = max(elapsed - await yield_cost(len(frames)), 0.0)
+
+    print(
+        f"{name:<10}{len(frames):>10,}{ticks:>10,}{len(frames) / elapsed:>14,.0f}"
+        f"{parsing / max(len(frames), 1) * 1e6:>12.2f}"
+    )
+
+
+async def bench_decision(
+    captures: dict[str, tuple[dict, list[Frame]]], speed: float, threshold: float
+) -> None:
+    """Replay all the exchanges together, evaluating every tick like main.py does."""
+    exchanges = {
+        name.lower(): restore(CLASSES[name], metadata)
+        for name, (metadata, _) in captures.items()
+    }
+    keys = {key for exchange in exchanges.values() for key in exchange.pairs.values()}
+    calculate = Calculate(exchanges=exchanges)
+    notify = Notify(
+        pairs={key: {"key": key} for key in keys},
+        calculate=calculate,
+        platforms={},
+        threshold=threshold,
+    )
+    # walk the order books whenever the spread changes, as when logging every evaluation at the info level
+    notify.log_interval = 0
+
+    evaluated: list[float] = []
+    decided: list[float] = []
+
+    async def decide() -> None:
+        while True:
+            for key in await calculate.wait_for_tick():
+                # the latency is measured from the newest of the pair's ticks to the end of its single evaluation
+                tick = max(
+                    exchange.data[key].receive_time
+                    for exchange in exchanges.values()
+                    if key in exchange.data
+                )
+                start = time.time_ns()
+                await notify.evaluate(key)
+                end = time.time_ns()
+                evaluated.append((end - start) / 1e3)
+                decided.append((end - tick) / 1e3)
+
+    decisions = asyncio.create_task(decide())
+    await replay(
+        {exchanges[name.lower()]: frames for name, (_, frames) in captures.items()},
+        speed,
+    )
+    decisions.cancel()
+
+    print(f"\n{len(decided):,} evaluations, microseconds")
+    print(f"{'':<22}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+    for label, values in (
+        ("evaluate", evaluated),
+        ("tick to decision", decided),
+    ):
+        print(
+            f"{label:<22}"
+            + "".join(
+                f"{value:>10.1f}" for value in percentiles(values, 50, 90, 99, 100)
+            )
+        )
+
+
+async def main(args: argparse.Namespace) -> None:
+    captures = load(args.capture)
+    if not captures:
+        sys.exit(f"No {SUFFIX} files found in {args.capture}")
+
+    print(
+        f"{'exchange':<10}{'frames':>10}{'ticks':>10}{'messages/sec':>14}{'us/frame':>12}"
+    )
+    for name, (metadata, frames) in captures.items():
+        await bench_parse(name, metadata, frames)
+
+    await bench_decision(captures, args.speed, args.threshold)
+
+
+if __name__ == "__main__":
+    argsparse = argparse.ArgumentParser("Replay benchmark")
+    argsparse.add_argument("capture", help="Directory recorded with main.py --capture")
+    argsparse.add_argument(
+        "--speed",
+        type=float,
+        default=0.0,
+        help="Speed of the evaluated replay relative to the recording, 0 for as fast as possible",
+    )
+    argsparse.add_argument("--threshold", type=float, default=1.0)
+    args = argsparse.parse_args()
+
+    # only the numbers get printed, not the connections interrupted at the end of the replays, nor the
+    # evaluations, which are still formatted as with the info level
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger().handlers[0].setLevel(logging.ERROR)
+    asyncio.run(main(args))
@@ -1,77 +1,219 @@
-import random
+import asyncio
 import logging as log
-import os
-import signal
-from typing import Any
+from time import monotonic_ns
+from typing import Any, Iterable, Optional
 
 from exchanges.base import BaseExchange
+from utils.tracker import PriceTracker
+
+
+def match(
+    asks: Iterable[tuple[float, float]],
+    bids: Iterable[tuple[float, float]],
+    buy_fee: float,
+    sell_fee: float,
+) -> tuple[float, float, float]:
+    """Buy the asks & sell them to the bids, level by level, for as long as it's profitable after the fees.
+
+    The levels are (price, size) pairs, from the best one. Returns the matched
+    size, what buying it costs and what selling it brings in, fees included.
+    """
+    size = cost = proceeds = 0.0
+    asks, bids = iter(asks), iter(bids)
+    ask, ask_size = next(asks, (0.0, 0.0))
+    bid, bid_size = next(bids, (0.0, 0.0))
+    while ask_size > 0 and bid_size > 0:
+        buy_price = ask * (1 + buy_fee)
+        sell_price = bid * (1 - sell_fee)
+        if sell_price <= buy_price:
+            break
+
+        matched = min(ask_size, bid_size)
+        size += matched
+        cost += matched * buy_price
+        proceeds += matched * sell_price
+
+        ask_size -= matched
+        bid_size -= matched
+        if not ask_size:
+            ask, ask_size = next(asks, (0.0, 0.0))
+        if not bid_size:
+            bid, bid_size = next(bids, (0.0, 0.0))
+
+    return size, cost, proceeds
 
 
 class Calculate:
     """ "Calculate the price differences between the exchanges."""
 
-    def __init__(self, exchanges: dict[str, BaseExchange]) -> None:
+    def __init__(self, exchanges: dict[str, BaseExchange], max_age: float = 0) -> None:
         """All implemented exchanges"""
         self.exchanges = exchanges
 
-        """Exchanges prices"""
-        self.exchanges_monitor: dict[str, Any] = {}
-        self.exchanges_prices: dict[str, Any] = {}
+        """Quotes of exchanges silent for longer than max_age seconds are left out, 0 keeps them forever"""
+        self.max_age = max_age
+
+        """Maps each exchange object to its key in self.exchanges"""
+        self.names = {obj: name for name, obj in self.exchanges.items()}
+
+        """Best bid & best ask of each exchange per pair key, kept sorted as the ticks arrive"""
+        self.bids: dict[str, PriceTracker] = {}
+        self.asks: dict[str, PriceTracker] = {}
+
+        """Pair keys that received a tick since the last evaluation"""
+        self.changed: set[str] = set()
+
+        """Set whenever any of the exchanges receives a new tick"""
+        self.updated = asyncio.Event()
+        for exchange in self.exchanges.values():
+            exchange.register_callback(self.on_tick)
+
+    def on_tick(self, exchange: BaseExchange, key: str) -> None:
+        """Called by the exchanges on every top of the book update."""
+        bids = self.bids.get(key)
+        if bids is None:
+            bids = self.bids[key] = PriceTracker()
+            self.asks[key] = PriceTracker()
+
+        name = self.names[exchange]
+        quote = exchange.data[key]
+        bids.update(name, quote.bid)
+        self.asks[key].update(name, quote.ask)
+        self.changed.add(key)
+        self.updated.set()
+
+    async def wait_for_tick(self, coalesce: float = 0) -> set[str]:
+        """Block until at least one exchange pushes a new price, return the updated pair keys.
+
+        When coalesce is set, keep collecting ticks for that many seconds after
+        the first one, so that a burst of updates results in a single evaluation.
+        """
+        await self.updated.wait()
+        if coalesce > 0:
+            await asyncio.sleep(coalesce)
+        self.updated.clear()
+
+        changed, self.changed = self.changed, set()
+        return changed
 
     async def percentage_change(self, x, y) -> float:
         """Get the percentage change between two values."""
         return (x - y) * 100 / y
 
-    async def latest_prices(self) -> Any:
-        """Get the latest prices from all the exchanges."""
-        for name, obj in self.exchanges.items():
-            if "price" in obj.data:
-                self.exchanges_monitor[name] = {
-                    "exchange": obj.exchange,
-                    "pair": obj.pair,
-                    "price": obj.data["price"],
-                    "time": obj.data["time"],
-                }
-                self.exchanges_prices[name] = obj.data["price"]
-
-        if not self.exchanges_prices:
+    async def latest_prices(self, key: str) -> Any:
+        """Get the best executable opportunity of a pair among all the exchanges.
+
+        "max" is the exchange with the highest bid, where the pair gets sold, and
+        "min" is the exchange with the lowest ask, where the pair gets bought.
+        Returns False unless at least two exchanges are offering the pair.
+        """
+        bids = self.bids.get(key)
+        if bids is None:
             return False
+        asks = self.asks[key]
 
-        exchange_max = max(self.exchanges_prices, key=self.exchanges_prices.get)
-        exchange_min = min(self.exchanges_prices, key=self.exchanges_prices.get)
-        # this whole scheme is in case there are N(Where N>1) monitored exchanges and on all of them the price is X
-        # there exists a possibility that exchange_min and exchange_max will be the same thing
-        # so we shuffle and try again, until they differ
+        now = monotonic_ns()
         while True:
-            if exchange_min != exchange_max:
+            if len(bids) < 2:
+                return False
+
+            sell, buy = bids.max(), asks.min()
+            if sell == buy:
+                # an exchange with both the highest bid and the lowest ask can't trade against itself,
+                # pair it with the runner-up of whichever side leaves the wider spread
+                other_sell, other_buy = bids.max(exclude=buy), asks.min(exclude=sell)
+                if (
+                    bids.prices[other_sell] - asks.prices[buy]
+                    >= bids.prices[sell] - asks.prices[other_buy]
+                ):
+                    sell = other_sell
+                else:
+                    buy = other_buy
+
+            # the stale quotes are only looked for among the picked ones, and dropped until their exchange ticks again
+            stale = [name for name in (sell, buy) if self._stale(name, now)]
+            if not stale:
                 break
-            elif len(self.exchanges_prices) == 1:
-                log.error(
-                    f"Only {self.exchanges_prices} is offering this pair. Aborting the program."
-                )
-                os.kill(os.getpid(), signal.SIGKILL)
+            for name in stale:
+                self._drop(key, name)
 
-            elif (exchange_min == exchange_max) and (len(self.exchanges_prices) > 1):
-                tmp = list(self.exchanges_prices.items())
-                random.shuffle(tmp)
-                self.exchanges_prices = dict(tmp)
+        return {
+            "max": self._describe(key, sell, "bid"),
+            "min": self._describe(key, buy, "ask"),
+        }
 
-                exchange_min = min(self.exchanges_prices, key=self.exchanges_prices.get)
-                if exchange_min == exchange_max:
+    async def executable(self, key: str) -> Any:
+        """Get the most profitable opportunity of a pair that can actually be executed.
+
+        Every two exchanges are matched against each other through their order
+        books, buying on one and selling on the other after both taker fees.
+        Returns False when no size can be traded at a profit.
+        """
+        bids = self.bids.get(key)
+        if bids is None or len(bids) < 2:
+            return False
+        asks = self.asks[key]
+
+        now = monotonic_ns()
+        for name in [name for name in bids.prices if self._stale(name, now)]:
+            self._drop(key, name)
+
+        best = None
+        for buy, ask in asks.prices.items():
+            buy_fee = self.exchanges[buy].taker_fee
+            for sell, bid in bids.prices.items():
+                sell_fee = self.exchanges[sell].taker_fee
+                # only the exchanges whose top of the book is already profitable get matched deeper
+                if sell == buy or bid * (1 - sell_fee) <= ask * (1 + buy_fee):
                     continue
-                else:
-                    break
+
+                size, cost, proceeds = match(
+                    self.exchanges[buy].levels(key, "ask"),
+                    self.exchanges[sell].levels(key, "bid"),
+                    buy_fee,
+                    sell_fee,
+                )
+                if size and (best is None or proceeds - cost > best[0]):
+                    best = (proceeds - cost, buy, sell, size, cost, proceeds)
+
+        if best is None:
+            return False
+
+        profit, buy, sell, size, cost, proceeds = best
+        buy_vwap, sell_vwap = cost / size, proceeds / size
+        return {
+            "max": self._describe(key, sell, "bid"),
+            "min": self._describe(key, buy, "ask"),
+            "size": size,
+            "buy_vwap": buy_vwap,
+            "sell_vwap": sell_vwap,
+            "profit": profit,
+            "price_diff": sell_vwap - buy_vwap,
+            "price_diff_perc": await self.percentage_change(sell_vwap, buy_vwap),
+        }
+
+    def _stale(self, name: str, now: Optional[int] = None) -> bool:
+        """Whether nothing, not even a heartbeat, was received from the exchange for longer than max_age."""
+        return (
+            self.max_age > 0
+            and self.exchanges[name].health.silence(now) > self.max_age * 1e9
+        )
+
+    def _drop(self, key: str, name: str) -> None:
+        log.debug("Leaving out the stale %s quote of %s", name, key)
+        self.bids[key].discard(name)
+        self.asks[key].discard(name)
+
+    def _describe(self, key: str, name: str, side: str) -> dict[str, Any]:
+        obj = self.exchanges[name]
+        quote = obj.data[key]
+        # the times are nanosecond timestamps, formatted only when displayed
         return {
-            "max": {
-                "exchange": self.exchanges_monitor[exchange_max]["exchange"],
-                "pair": self.exchanges_monitor[exchange_max]["pair"],
-                "price": self.exchanges_monitor[exchange_max]["price"],
-                "time": self.exchanges_monitor[exchange_max]["time"],
-            },
-            "min": {
-                "exchange": self.exchanges_monitor[exchange_min]["exchange"],
-                "pair": self.exchanges_monitor[exchange_min]["pair"],
-                "price": self.exchanges_monitor[exchange_min]["price"],
-                "time": self.exchanges_monitor[exchange_min]["time"],
-            },
+            "exchange": obj.exchange,
+            "pair": key,
+            "side": side,
+            "price": quote.bid if side == "bid" else quote.ask,
+            "size": quote.bid_size if side == "bid" else quote.ask_size,
+            "time": quote.exchange_time,
+            "received": quote.receive_time,
         }
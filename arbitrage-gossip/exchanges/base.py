@@ -1,5 +1,23 @@
+import aiohttp
+import asyncio
+import json
+import logging as log
 from abc import ABC, abstractmethod
-from typing import Any
+from time import monotonic, perf_counter_ns, time_ns
+from typing import Any, Callable, Iterable, Optional, Union
+from urllib.parse import urlsplit, urlunsplit
+
+from exchanges import decoder
+from exchanges.book import Level, OrderBook
+from exchanges.capture import Capture, capture_path
+from exchanges.catalog import SymbolCatalog
+from exchanges.connection import Connection, StreamError
+from exchanges.health import FeedHealth
+from exchanges.quote import Quote
+from exchanges.reconnect import Reconnect
+from exchanges.session import create_session
+from utils.hotlog import DebugSampler
+from utils.pairs import pair_key
 
 
 class BaseExchange(ABC):
@@ -9,31 +27,676 @@ class BaseExchange(ABC):
     have to be implemented by each monitored exchange(subclass).
     """
 
-    def __init__(self, pair: str) -> None:
-        """Monitored pair"""
-        self.pair = pair
+    """ TypedDict describing the fields read from the websocket messages, used to decode only them when possible """
+    schema: Optional[type] = None
+
+    """ Same as schema, for the depth stream messages """
+    depth_schema: Optional[type] = None
+
+    """ Whether the exchange can maintain local order books from a depth stream """
+    supports_depth = False
+
+    """ Fraction of the traded amount paid as fee when taking liquidity """
+    taker_fee = 0.001
+
+    """ Notation of the pairs the exchange is created with, one of those built by utils.pairs.make_pair """
+    notation = "merged"
+
+    """ Seconds between the websocket pings checking that the connection is still alive """
+    heartbeat = 10.0
+
+    """ Seconds without any message, heartbeats included, after which the connection is dropped & reestablished """
+    receive_deadline = 60.0
+
+    """ Seconds after which the exchange drops a connection, None if it doesn't """
+    max_lifetime: Optional[float] = None
+
+    """ Seconds by which the connections are rotated ahead of max_lifetime, & staggered from each other """
+    rotate_ahead = 900.0
+
+    """ Whether a second, standby, connection is kept subscribed to the same streams """
+    standby = False
+
+    """ Attributes holding the urls of the exchange's servers """
+    endpoints: tuple[str, ...] = ("api", "api_ws")
+
+    """ Directory the received websocket frames are recorded into, None doesn't record them """
+    capture_dir: Optional[str] = None
+
+    """ Whether the exchange greets every connection with a message, awaited before subscribing """
+    welcome = False
+
+    """ Failed subscriptions in a row retried before giving up on the exchange """
+    max_subscribe_retries = 3
+
+    """ The decoding of one in every parse_sample messages is timed, into health.parse_time """
+    parse_sample = 64
+
+    """ Whether the order book snapshots are downloaded with _fetch_snapshot, rather than streamed over the websocket """
+    rest_snapshots = False
+
+    """ Upper bounds, in seconds, of the first & of any delay between the snapshot downloads of a symbol """
+    snapshot_backoff = 1.0
+    snapshot_backoff_cap = 30.0
+
+    """ Snapshots downloaded in a row before giving up syncing an order book """
+    max_snapshot_attempts = 10
+
+    """ Errors raised by _decode on a malformed frame, which is skipped """
+    decode_errors: tuple[type[Exception], ...] = decoder.ERRORS
+
+    """ Seconds between the warnings about the skipped malformed frames """
+    malformed_warn_interval = 10.0
+
+    def __init__(
+        self,
+        pairs: Union[str, list[str]],
+        session: Optional[aiohttp.ClientSession] = None,
+        catalog: Optional[SymbolCatalog] = None,
+        depth: bool = False,
+    ) -> None:
+        if isinstance(pairs, str):
+            pairs = [pairs]
+
+        """ Monitored pairs, mapping the exchange's own notation to the pair key shared by all exchanges
+        self.pairs = {
+            "ethusdt" : "ETHUSDT",
+            "btcusdt" : "BTCUSDT"
+            }
+        """
+        self.pairs: dict[str, str] = {
+            self._symbol(pair): pair_key(pair) for pair in pairs
+        }
 
         """ Exchange name """
         self.exchange = self.__class__.__name__
 
-        """ Holds the latest price fetched from the websocket and date in the format %Y/%m/%dT%H:%M:%S.%f" 
+        """ Holds the latest quote fetched from the websocket for each pair key, updated in place
         self.data = {
-            "price" : price,
-            "time"  : date
+            "ETHUSDT" : Quote(price, exchange_time, receive_time)
             }
         """
-        self.data: dict[str, Any] = {}
+        self.data: dict[str, Quote] = {}
+
+        """ Client session used for both the rest calls & the websocket connections, usually shared by all exchanges """
+        self._session = session
+
+        """ Whether the session was created by (and has to be closed by) this exchange """
+        self._owns_session = False
+
+        """ Whether the order books are streamed, instead of only the top of the book """
+        self.depth = depth and self.supports_depth
+        if depth and not self.supports_depth:
+            log.warning(
+                f"{self.exchange} Depth isn't supported, streaming the top of the book"
+            )
+
+        if (
+            self.depth
+            and self.rest_snapshots
+            and type(self)._fetch_snapshot is BaseExchange._fetch_snapshot
+        ):
+            raise TypeError(
+                f"{self.exchange} downloads its order book snapshots, yet doesn't implement _fetch_snapshot"
+            )
+
+        """ Local order books of each pair key, only when streaming the depth """
+        self.books: dict[str, OrderBook] = {}
+
+        """ Snapshot downloads in progress, per symbol """
+        self._snapshots: dict[str, asyncio.Task] = {}
+
+        """ Decodes the websocket messages """
+        self.loads = decoder.loads_for(self.depth_schema if self.depth else self.schema)
+
+        """ Liveness of the feed, updated on every received message """
+        self.health = FeedHealth()
+
+        """ Messages left until the next one whose decoding is timed """
+        self._parse_countdown = 1
+
+        """ When the last malformed frame was warned about, as per time.monotonic """
+        self._malformed_warned = float("-inf")
+
+        """ Recording of the received frames, when capturing into capture_dir """
+        self.capture: Optional[Capture] = None
+
+        """ Decides which of the received messages get logged, without formatting the rest """
+        self.debug = DebugSampler()
+
+        """ Symbols listed by the exchanges, usually shared by all exchanges """
+        self.catalog = catalog
+
+        """ Functions called with the exchange object and the pair key whenever self.data is updated """
+        self.callbacks: list[Callable[["BaseExchange", str], None]] = []
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The session passed on initialization, or a lazily created one if none was."""
+        if self._session is None:
+            self._session = create_session()
+            self._owns_session = True
+        return self._session
+
+    async def close(self) -> None:
+        """Close the session, unless it's shared with other exchanges, & the capture file."""
+        if self.capture is not None:
+            self.capture.close()
+            self.capture = None
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+            self._owns_session = False
+
+    def use_base_url(self, url: str) -> None:
+        """Point the exchange at another server, e.g. a mock exchange.
+
+        The scheme & host of each of the endpoints are replaced by those of
+        url, keeping their paths. An https url moves the websocket endpoints
+        to wss, an http one to ws.
+        """
+        base = urlsplit(url)
+        secure = base.scheme in ("https", "wss")
+        for name in self.endpoints:
+            endpoint = getattr(self, name, None)
+            if not endpoint:
+                continue
+            parts = urlsplit(endpoint)
+            if parts.scheme in ("ws", "wss"):
+                scheme = "wss" if secure else "ws"
+            else:
+                scheme = "https" if secure else "http"
+            setattr(
+                self,
+                name,
+                urlunsplit((scheme, base.netloc, parts.path, parts.query, "")),
+            )
+
+    def _symbol(self, pair: str) -> str:
+        """Convert a pair to the exchange's own notation."""
+        return pair
+
+    async def _receive(
+        self,
+        ws: aiohttp.ClientWebSocketResponse,
+        reconnect: Optional[Reconnect] = None,
+    ) -> Any:
+        """Receive & decode the next message, skipping the malformed frames.
+
+        Raises asyncio.TimeoutError when nothing arrives within receive_deadline
+        seconds, so that silently dead connections get reestablished, or when
+        the connection is due to be rotated. Raises TypeError when the
+        connection gets closed.
+        """
+        while True:
+            data = await self._receive_frame(ws, reconnect)
+            try:
+                self._parse_countdown -= 1
+                if self._parse_countdown:
+                    return self._decode(data)
+                self._parse_countdown = self.parse_sample
+                start = perf_counter_ns()
+                decoded = self._decode(data)
+                self.health.parse_time.observe((perf_counter_ns() - start) / 1e9)
+                return decoded
+            except self.decode_errors as e:
+                self._malformed(data, e)
+
+    async def _receive_frame(
+        self,
+        ws: aiohttp.ClientWebSocketResponse,
+        reconnect: Optional[Reconnect],
+    ) -> Union[str, bytes]:
+        remaining = reconnect.remaining() if reconnect is not None else None
+        rotating = remaining is not None and remaining < self.receive_deadline
+
+        while True:
+            try:
+                msg = await ws.receive(
+                    timeout=remaining if rotating else self.receive_deadline
+                )
+            except asyncio.TimeoutError:
+                if rotating:
+                    log.info(f"{self.exchange} Rotating the connection")
+                else:
+                    log.warning(
+                        f"{self.exchange} No message for {self.receive_deadline} seconds, reconnecting"
+                    )
+                raise
+
+            # connected with autoping=False, the pings & pongs come through to keep the feed alive
+            if msg.type == aiohttp.WSMsgType.PING:
+                await ws.pong(msg.data)
+            elif msg.type != aiohttp.WSMsgType.PONG:
+                break
+            self.health.alive()
+
+        if msg.type not in (aiohttp.WSMsgType.TEXT, aiohttp.WSMsgType.BINARY):
+            raise TypeError(f"Received message {msg.type}:{msg.data!r} is not data")
+        self.health.received()
+        if self.capture is not None:
+            self.capture.write(ws, msg.data)
+        return msg.data
+
+    def _malformed(self, data: Union[str, bytes], error: Exception) -> None:
+        """Count a frame that couldn't be decoded, warning about them at most every malformed_warn_interval seconds."""
+        self.health.malformed += 1
+        now = monotonic()
+        if now - self._malformed_warned < self.malformed_warn_interval:
+            return
+        self._malformed_warned = now
+        log.warning(
+            f"{self.exchange} Skipping a malformed frame ({self.health.malformed} so far): {error!r} {data[:100]!r}"
+        )
+
+    def _decode(self, data: Union[str, bytes]) -> Any:
+        return self.loads(data)
+
+    def register_callback(
+        self, callback: Callable[["BaseExchange", str], None]
+    ) -> None:
+        """Register a function to be called on every new tick."""
+        self.callbacks.append(callback)
+
+    def _update(
+        self,
+        key: str,
+        bid: float,
+        bid_size: float,
+        ask: float,
+        ask_size: float,
+        exchange_time: int = 0,
+        sequence: int = 0,
+        receive_time: int = 0,
+    ) -> None:
+        """Store the latest top of the book of key and push it to the callbacks.
+
+        exchange_time is in nanoseconds since the epoch, exchanges not sending a
+        timestamp leave it out and the receive time is used instead. sequence is
+        the exchange's update id, if it sends one. receive_time defaults to now,
+        it's set for the updates received by another process.
+
+        Updates older than the stored one, or repeating it within a second, are
+        dropped, so that the same update received over the standby connection is
+        pushed once.
+        """
+        now = receive_time or time_ns()
+        quote = self.data.get(key)
+        if quote is None:
+            quote = self.data[key] = Quote()
+        elif sequence:
+            if sequence <= quote.sequence:
+                return
+        elif exchange_time and exchange_time < quote.exchange_time:
+            return
+        elif (
+            now - quote.receive_time < 1_000_000_000
+            and exchange_time in (0, quote.exchange_time)
+            and bid == quote.bid
+            and ask == quote.ask
+            and bid_size == quote.bid_size
+            and ask_size == quote.ask_size
+        ):
+            return
+
+        quote.sequence = sequence
+        quote.bid = bid
+        quote.bid_size = bid_size
+        quote.ask = ask
+        quote.ask_size = ask_size
+        quote.receive_time = now
+        quote.exchange_time = exchange_time or quote.receive_time
+        self._on_tick(key)
+
+    def levels(self, key: str, side: str) -> Iterable[tuple[float, float]]:
+        """(price, size) of the "bid" or "ask" levels of key, from the best one.
+
+        Without a synced order book only the top of the book is known.
+        """
+        book = self.books.get(key)
+        if book is not None and book.synced:
+            return book.bids if side == "bid" else book.asks
+
+        quote = self.data[key]
+        if side == "bid":
+            return ((quote.bid, quote.bid_size),)
+        return ((quote.ask, quote.ask_size),)
+
+    def _book(self, key: str) -> OrderBook:
+        book = self.books.get(key)
+        if book is None:
+            book = self.books[key] = OrderBook()
+        return book
+
+    def _reset_books(self, symbols: Iterable[str]) -> None:
+        """Drop the order books of symbols, e.g. after reconnecting.
+
+        With standby the other connection keeps the books in sync meanwhile,
+        any updates missed by both are detected from the sequence numbers.
+        """
+        if self.standby:
+            return
+        for symbol in symbols:
+            book = self.books.get(self.pairs[symbol])
+            if book is not None:
+                book.clear()
+
+    def _apply_diff(
+        self,
+        key: str,
+        first: int,
+        last: int,
+        bids: Iterable[Level],
+        asks: Iterable[Level],
+        exchange_time: int = 0,
+    ) -> bool:
+        """Apply a depth diff carrying the changes numbered first to last.
+
+        Diffs received before the snapshot are buffered, those already included
+        in it are dropped. Returns False on a sequence gap, the book is then
+        dropped and has to be synced again from a new snapshot.
+        """
+        book = self._book(key)
+        if not book.synced:
+            book.pending.append((first, last, bids, asks, exchange_time))
+            return True
+        if last <= book.sequence:
+            return True
+        if first > book.sequence + 1:
+            log.warning(
+                f"{self.exchange} {key} Order book gap, expected {book.sequence + 1} got {first}, resyncing"
+            )
+            book.clear()
+            return False
+
+        book.apply(bids, asks)
+        book.sequence = last
+        self._update_top(key, book, exchange_time)
+        return True
+
+    def _load_snapshot(
+        self,
+        key: str,
+        sequence: int,
+        bids: Iterable[Level],
+        asks: Iterable[Level],
+        exchange_time: int = 0,
+    ) -> bool:
+        """Load a snapshot of the order book & apply the diffs buffered meanwhile."""
+        book = self._book(key)
+        pending = list(book.pending)
+        book.pending.clear()
+        book.load(bids, asks, sequence)
+        for diff in pending:
+            if not self._apply_diff(key, *diff):
+                return False
+
+        self._update_top(key, book, exchange_time)
+        return True
+
+    def _update_top(self, key: str, book: OrderBook, exchange_time: int = 0) -> None:
+        bid, bid_size = book.bids.best()
+        ask, ask_size = book.asks.best()
+        if bid and ask:
+            self._update(key, bid, bid_size, ask, ask_size, exchange_time)
+
+    def _resync(self, symbol: str) -> None:
+        """Download a snapshot of the order book of symbol, unless one is already on its way."""
+        task = self._snapshots.get(symbol)
+        if task is None or task.done():
+            self._snapshots[symbol] = asyncio.create_task(self._snapshot(symbol))
+
+    async def _snapshot(self, symbol: str) -> None:
+        """Sync the order book of symbol from a downloaded snapshot.
+
+        The attempts are spaced by a jittered exponential backoff, whether the
+        download failed or the snapshot didn't line up with the buffered diffs,
+        & given up after max_snapshot_attempts. The next diff that can't be
+        applied starts over.
+        """
+        key = self.pairs[symbol]
+        pacer = Reconnect(base=self.snapshot_backoff, cap=self.snapshot_backoff_cap)
+        while pacer.attempts < self.max_snapshot_attempts:
+            await pacer.wait()
+            try:
+                if self._load_snapshot(key, *await self._fetch_snapshot(symbol)):
+                    log.debug(f"{self.exchange} {key} Order book synced")
+                    return
+                log.warning(
+                    f"{self.exchange} {key} The order book snapshot doesn't line up with the buffered updates, retrying"
+                )
+            except (
+                aiohttp.ClientError,
+                asyncio.TimeoutError,
+                KeyError,
+                ValueError,
+            ) as e:
+                log.warning(
+                    f"{self.exchange} {key} Unable to fetch the order book: {e!r}"
+                )
+
+        log.error(
+            f"{self.exchange} {key} Giving up syncing the order book after {pacer.attempts} snapshots"
+        )
+
+    async def _fetch_snapshot(
+        self, symbol: str
+    ) -> tuple[int, Iterable[Level], Iterable[Level]]:
+        """Download the order book of symbol, returning its sequence number, bids & asks.
+
+        Required from the exchanges with rest_snapshots.
+        """
+        raise NotImplementedError(
+            f"{self.exchange} doesn't download its order book snapshots"
+        )
+
+    def _on_tick(self, key: str) -> None:
+        """Push the freshly updated self.data[key] to every registered callback."""
+        for callback in self.callbacks:
+            callback(self, key)
 
     @abstractmethod
-    async def _check_pair_exists(self) -> bool:
-        """Check if a pair is listed by the exchange."""
-        ...
+    async def _fetch_symbols(self) -> dict[str, dict[str, Any]]:
+        """Download all the symbols listed by the exchange.
 
-    async def _subscribe(self) -> bool:
-        """Subscribe to a given websocket channel."""
+        Returns the symbols in the exchange's own notation, e.g.
+        {"ethusdt": {"base": "ETH", "quote": "USDT", "active": True}}
+        """
         ...
 
-    @abstractmethod
+    async def _check_pair_exists(self) -> bool:
+        """Check which of the pairs are listed by the exchange and drop the rest.
+
+        Returns whether at least one of the pairs is listed.
+        """
+        if self.catalog is None:
+            self.catalog = SymbolCatalog()
+        await self.catalog.load([self])
+
+        offered = {}
+        for symbol, key in self.pairs.items():
+            # the listing tells how the exchange writes the pair, falling back on the symbol for the
+            # listings whose base & quote are left out
+            listed = self.catalog.find(self.exchange, key) or symbol
+            entry = self.catalog.lookup(self.exchange, listed)
+
+            if entry is None:
+                log.warning(
+                    f'{self.exchange} pair "{symbol}" is NOT offered. NOT MONITORING it on {self.exchange}.'
+                )
+            elif not entry["active"]:
+                log.warning(
+                    f'{self.exchange} pair "{symbol}" is currently disabled. NOT MONITORING it on {self.exchange}.'
+                )
+            else:
+                log.info(
+                    f'{self.exchange} pair "{symbol}" is offered. MONITORING {self.exchange}'
+                )
+                offered[listed] = key
+
+        self.pairs = offered
+        return bool(self.pairs)
+
     async def run(self) -> None:
-        """Run an infinite socket connection with the exchange, given that the pair is listed."""
+        """Run an infinite socket connection with the exchange, given that any of the pairs is listed.
+
+        With standby, a second connection is subscribed to the same streams, so
+        that the prices keep flowing while either of them reconnects.
+        """
+
+        # don't monitor the exchange if none of the pairs is listed
+        if not await self._check_pair_exists():
+            return
+
+        # the pairs are recorded as the exchange notes them, once checked
+        if self.capture_dir is not None and self.capture is None:
+            self.capture = Capture(
+                capture_path(self.capture_dir, self.exchange),
+                {"exchange": self.exchange, "pairs": self.pairs, "depth": self.depth},
+            )
+            log.info(
+                f"{self.exchange} Capturing the websocket frames into {self.capture.path}"
+            )
+
+        # the standby connection is rotated earlier, so that both are never rotated at once
+        connections = self._connections()
+        await asyncio.gather(
+            *(
+                self._run_connection(
+                    Reconnect(
+                        max_lifetime=self.max_lifetime
+                        and self.max_lifetime - (i + 1) * self.rotate_ahead,
+                        lifetimes=self.health.lifetimes,
+                    )
+                )
+                for i in range(connections)
+            )
+        )
+
+    def _connections(self) -> int:
+        """Number of connections subscribed to the same streams."""
+        return 2 if self.standby else 1
+
+    async def _run_connection(self, reconnect: Reconnect) -> None:
+        """Stream the prices over a single connection, reconnecting as paced by reconnect."""
+        await self._connect(reconnect, list(self.pairs))
+
+    async def _url(self, symbols: list[str]) -> str:
+        """Websocket url connected to, asked for anew on every connection."""
+        return self.api_ws
+
+    def _subscriptions(self, symbols: list[str]) -> list[Any]:
+        """Messages subscribing to the streams of symbols, each one acknowledged separately.
+
+        None by default, for the exchanges streaming whatever the url names.
+        """
+        return []
+
+    def _acknowledge(self, msg: Any, connection: Connection) -> Optional[bool]:
+        """Whether msg acknowledges a subscription, or refuses it.
+
+        None when msg isn't an answer to a subscription, it's then handled
+        like any other message.
+        """
+        return None
+
+    @abstractmethod
+    def _on_message(self, msg: Any, connection: Connection) -> Any:
+        """Handle a decoded message, e.g. store the quote it carries.
+
+        Returns a message to send back over the connection, None for most.
+        Raises StreamError when the connection has to be reestablished.
+        """
         ...
+
+    async def _connect(self, reconnect: Reconnect, symbols: list[str]) -> None:
+        """Stream the prices of symbols over a single connection, reconnecting as paced by reconnect.
+
+        Gives up once the subscriptions failed more than max_subscribe_retries
+        times in a row, dropping the quotes of symbols.
+        """
+        failures = 0
+        while True:
+            await reconnect.wait()
+            try:
+                url = await self._url(symbols)
+                async with self.session.ws_connect(
+                    url, heartbeat=self.heartbeat, autoping=False
+                ) as ws:
+                    log.debug(
+                        f"{self.exchange} Established a websocket connection towards {url}"
+                    )
+                    self._reset_books(symbols)
+                    connection = Connection(ws, symbols)
+
+                    if not await self._subscribe(connection):
+                        self.health.subscribe_failures += 1
+                        failures += 1
+                        if failures <= self.max_subscribe_retries:
+                            continue
+                        log.error(
+                            f"{self.exchange} Aborting due to too many subscription failures."
+                        )
+                        for symbol in symbols:
+                            self.data.pop(self.pairs[symbol], None)
+                        return
+
+                    failures = 0
+                    reconnect.established()
+                    await self._stream(connection, reconnect)
+            except (TypeError, asyncio.TimeoutError, StreamError) as e:
+                # the connection got closed, went silent, was rotated or lost messages
+                log.debug(f"{self.exchange} {e!r}")
+            except asyncio.CancelledError:
+                log.warning(f"{self.exchange} Interruption occurred. Exiting.")
+                raise
+            except Exception as e:
+                log.exception(e)
+
+    async def _subscribe(self, connection: Connection) -> bool:
+        """Subscribe to the streams of the connection's symbols, waiting for every subscription to be acknowledged.
+
+        The prices of the streams subscribed to first may arrive in between,
+        they are handled as they come.
+        """
+        ws = connection.ws
+        if self.welcome:
+            await self._receive(ws)
+
+        subscriptions = self._subscriptions(connection.symbols)
+        for subscription in subscriptions:
+            await ws.send_str(json.dumps(subscription))
+
+        pending = len(subscriptions)
+        while pending:
+            msg = await self._receive(ws)
+            acknowledged = self._acknowledge(msg, connection)
+            if acknowledged is None:
+                await self._handle(msg, connection)
+            elif acknowledged:
+                pending -= 1
+            else:
+                log.warning(f"{self.exchange} Unable to subscribe {msg}")
+                return False
+
+        log.debug(f"{self.exchange} Subscribed to {connection.symbols}")
+        return True
+
+    async def _handle(self, msg: Any, connection: Connection) -> None:
+        if self.debug():
+            log.debug("%s %s", self.exchange, msg)
+        reply = self._on_message(msg, connection)
+        if reply is not None:
+            await connection.ws.send_str(json.dumps(reply))
+
+    async def _stream(self, connection: Connection, reconnect: Reconnect) -> None:
+        """Handle the messages until the connection breaks."""
+        ws = connection.ws
+        receive, on_message, debug = self._receive, self._on_message, self.debug
+        while True:
+            msg = await receive(ws, reconnect)
+            if debug():
+                log.debug("%s %s", self.exchange, msg)
+            reply = on_message(msg, connection)
+            if reply is not None:
+                await ws.send_str(json.dumps(reply))
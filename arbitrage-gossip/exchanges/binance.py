@@ -1,9 +1,36 @@
 import aiohttp
-import asyncio.exceptions
 import logging as log
-from datetime import datetime
+from typing import Any, Optional, TypedDict, Union
 
 from exchanges.base import BaseExchange
+from exchanges.catalog import SymbolCatalog
+from exchanges.connection import Connection
+
+
+class _BookTicker(TypedDict):
+    u: int
+    s: str
+    b: str
+    B: str
+    a: str
+    A: str
+
+
+class BookTickerMessage(TypedDict):
+    data: _BookTicker
+
+
+class _DepthUpdate(TypedDict):
+    E: int
+    s: str
+    U: int
+    u: int
+    b: list[list[str]]
+    a: list[list[str]]
+
+
+class DepthUpdateMessage(TypedDict):
+    data: _DepthUpdate
 
 
 class Binance(BaseExchange):
@@ -13,76 +40,99 @@ class Binance(BaseExchange):
     api = "https://api.binance.com"
 
     """ Binance websocket api url """
-    api_ws = "wss://stream.binance.com:9443/ws"
+    api_ws = "wss://stream.binance.com:9443"
 
-    def __init__(self, pair: str) -> None:
-        super().__init__(pair.lower())
+    """ Fields read from the book ticker messages """
+    schema = BookTickerMessage
+
+    """ Fields read from the depth diff messages """
+    depth_schema = DepthUpdateMessage
+
+    supports_depth = True
+
+    rest_snapshots = True
+
+    taker_fee = 0.001
+
+    """ Binance drops every connection after 24 hours """
+    max_lifetime = 24 * 3600.0
+
+    def __init__(
+        self,
+        pairs: Union[str, list[str]],
+        session: Optional[aiohttp.ClientSession] = None,
+        catalog: Optional[SymbolCatalog] = None,
+        depth: bool = False,
+    ) -> None:
+        super().__init__(pairs, session, catalog, depth)
         log.info(f"{self.exchange} Initialized with {self.__dict__}")
 
-    async def _check_pair_exists(self) -> bool:
-        """Check if the pair is offered by Binance."""
+    def _symbol(self, pair: str) -> str:
+        return pair.lower()
+
+    async def _fetch_symbols(self) -> dict[str, dict[str, Any]]:
+        """Download all the symbols listed by Binance."""
 
         url = f"{self.api}/api/v3/exchangeInfo"
-        params = {"symbol": self.pair.upper()}
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, params=params) as resp:
-                log.debug({"{self.exchange} _check_pair_exists response": resp})
-                if resp.status == 200:
-                    resp = await resp.json()
-                    if (
-                        resp["symbols"][0]["symbol"] == self.pair.upper()
-                        and resp["symbols"][0]["status"] == "TRADING"
-                    ):
-                        log.info(
-                            f'{self.exchange} pair "{self.pair}" is offered. MONITORING {self.exchange}'
-                        )
-                        return True
-
-                log.warning(
-                    f'{self.exchange} pair "{self.pair}" is NOT offered. NOT MONITORING {self.exchange}.'
-                )
-                return False
-
-    async def run(self) -> None:
-        """Fetch the price from Binance."""
-
-        # don't monitor the exchange if the pair isn't listed
-        if not await self._check_pair_exists():
+        async with self.session.get(url) as resp:
+            log.debug(f"{self.exchange} _fetch_symbols response: {resp}")
+            resp = await resp.json()
+
+        # example symbol:
+        # {"symbol":"ETHBTC","status":"TRADING","baseAsset":"ETH","quoteAsset":"BTC",...}
+        return {
+            symbol["symbol"].lower(): {
+                "base": symbol["baseAsset"],
+                "quote": symbol["quoteAsset"],
+                "active": symbol["status"] == "TRADING",
+            }
+            for symbol in resp["symbols"]
+        }
+
+    async def _fetch_snapshot(self, symbol: str) -> tuple[int, list, list]:
+        """Download the order book of symbol."""
+
+        url = f"{self.api}/api/v3/depth"
+        params = {"symbol": symbol.upper(), "limit": 1000}
+        async with self.session.get(url, params=params) as resp:
+            resp = await resp.json()
+
+        # example response:
+        # {"lastUpdateId":21434712390,"bids":[["29313.49000000","1.20412000"]],"asks":[["29313.50000000","0.31290000"]]}
+        return resp["lastUpdateId"], resp["bids"], resp["asks"]
+
+    async def _url(self, symbols: list[str]) -> str:
+        # a single combined stream carries the best bid & ask of all the pairs, pushed on every change,
+        # or the changes of their order books, which are synced from a snapshot, it needs no subscription
+        stream = "depth@100ms" if self.depth else "bookTicker"
+        streams = "/".join(f"{symbol}@{stream}" for symbol in symbols)
+        return f"{self.api_ws}/stream?streams={streams}"
+
+    def _on_message(self, msg: dict[str, Any], connection: Connection) -> None:
+        if self.depth:
+            self._on_depth(msg["data"])
             return
 
-        url = f"{self.api_ws}/{self.pair}@miniTicker"
-        while True:
-            async with aiohttp.ClientSession() as session:
-                try:
-                    ws = await session.ws_connect(url)
-
-                    log.debug(
-                        f"{self.exchange} Created new Client session and Established a websocket connection towards {self.api_ws}"
-                    )
-
-                    while True:
-                        try:
-                            msg = await ws.receive_json()
-                            log.debug(f"{self.exchange} {msg}")
-
-                            # example response:
-                            # {"e":"24hrMiniTicker","E":1654932552785,"s":"BTCUSDT","c":"29313.50000000","o":"30088.62000000","h":"30184.40000000","l":"28850.00000000","v":"64257.42829000","q":"1891748550.51386060"}
-                            self.data = {
-                                "price": float(msg["c"]),
-                                "time": datetime.utcfromtimestamp(
-                                    msg["E"] / 1000
-                                ).strftime("%Y/%m/%dT%H:%M:%S.%f"),
-                            }
-                        except (TypeError, asyncio.exceptions.TimeoutError) as e:
-                            log.debug(str(e))
-                            break
-                        except (asyncio.exceptions.CancelledError, KeyboardInterrupt):
-                            log.warning(
-                                f"{self.exchange} Interruption occurred. Exiting."
-                            )
-                            return
-                except BaseException as e:
-                    log.exception(e)
-                    await asyncio.sleep(0.3)
-                    continue
+        # example response:
+        # {"stream":"btcusdt@bookTicker","data":{"u":21434712390,"s":"BTCUSDT","b":"29313.49000000","B":"1.20412000","a":"29313.50000000","A":"0.31290000"}}
+        # the book ticker doesn't carry a timestamp, the receive time is used
+        data = msg["data"]
+        self._update(
+            self.pairs[data["s"].lower()],
+            float(data["b"]),
+            float(data["B"]),
+            float(data["a"]),
+            float(data["A"]),
+            sequence=data["u"],
+        )
+
+    def _on_depth(self, data: dict[str, Any]) -> None:
+        # example response:
+        # {"stream":"btcusdt@depth@100ms","data":{"e":"depthUpdate","E":1654932552785,"s":"BTCUSDT","U":21434712391,"u":21434712398,"b":[["29313.49000000","1.10412000"]],"a":[["29313.50000000","0.00000000"]]}}
+        symbol = data["s"].lower()
+        key = self.pairs[symbol]
+        synced = self._apply_diff(
+            key, data["U"], data["u"], data["b"], data["a"], data["E"] * 1_000_000
+        )
+        if not synced or not self.books[key].synced:
+            self._resync(symbol)
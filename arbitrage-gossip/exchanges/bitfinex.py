@@ -1,10 +1,12 @@
 import aiohttp
-import asyncio.exceptions
+import asyncio
 import logging as log
-from datetime import datetime
-import json
+from typing import Any, Optional, Union
 
 from exchanges.base import BaseExchange
+from exchanges.catalog import SymbolCatalog
+from exchanges.connection import Connection, StreamError
+from exchanges.reconnect import Reconnect
 
 
 class Bitfinex(BaseExchange):
@@ -16,120 +18,164 @@ class Bitfinex(BaseExchange):
     """Bitfinex websocket api url"""
     api_ws = "wss://api-pub.bitfinex.com/ws/2"
 
-    def __init__(self, pair: str) -> None:
-        # for some reason bitfinex implements USDT as UST
-        pair = pair.upper().replace("USDT", "UST")
-        super().__init__(pair)
+    """ Maximum number of channels bitfinex allows on a single connection """
+    max_channels = 30
+
+    supports_depth = True
+
+    taker_fee = 0.002
+
+    notation = "-"
+
+    """ Bitfinex sends a heartbeat on every channel every 15 seconds """
+    receive_deadline = 20.0
+
+    """ Number of order book levels streamed when streaming the depth """
+    depth_levels = "100"
+
+    """ Connection flag numbering every message, so that lost ones are detected """
+    seq_all = 65536
+
+    def __init__(
+        self,
+        pairs: Union[str, list[str]],
+        session: Optional[aiohttp.ClientSession] = None,
+        catalog: Optional[SymbolCatalog] = None,
+        depth: bool = False,
+    ) -> None:
+        super().__init__(pairs, session, catalog, depth)
         log.info(f"{self.exchange} Initialized with {self.__dict__}")
 
-    async def _check_pair_exists(self) -> bool:
-        """Check if the pair is offered by Bitfinex."""
+    def _symbol(self, pair: str) -> str:
+        # for some reason bitfinex implements USDT as UST
+        return pair.upper().replace("USDT", "UST")
 
-        # check two pairs, BASE:QUOTE and BASEQUOTE
-        pairs = [self.pair.replace("-", ""), self.pair.replace("-", ":")]
+    async def _fetch_symbols(self) -> dict[str, dict[str, Any]]:
+        """Download all the pairs listed by Bitfinex."""
 
         url = f"{self.api}/v2/conf/pub:list:pair:exchange"
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as resp:
-                log.debug({"{self.exchange} _check_pair_exists response": resp})
-                resp = await resp.json()
-                if pairs[0] in resp[0]:
-                    log.info(
-                        f'{self.exchange} pair "{self.pair}" is offered. MONITORING {self.exchange}'
-                    )
-                    self.pair = pairs[0]
-                    return True
-                elif pairs[1] in resp[0]:
-                    log.info(
-                        f'{self.exchange} pair "{self.pair}" is offered. MONITORING {self.exchange}'
-                    )
-                    self.pair = pairs[1]
-                    return True
-
-                log.warning(
-                    f'{self.exchange} pair "{self.pair}" is NOT offered. NOT MONITORING {self.exchange}'
-                )
-                return False
-
-    async def _subscribe(self, ws) -> bool:
-        # sys.stdout.write(f"{self.exchange} SELF.PAIR: {self.pair}")
-        await ws.send_str(
-            json.dumps(
-                {
-                    "event": "subscribe",
-                    "channel": "ticker",
-                    "symbol": self.pair,
-                }
-            )
+        async with self.session.get(url) as resp:
+            log.debug(f"{self.exchange} _fetch_symbols response: {resp}")
+            resp = await resp.json()
+
+        # the pairs are listed as BASEQUOTE when both assets are 3 letters long, else as BASE:QUOTE
+        # [["BTCUST","ETHUST","DOGE:USD",...]]
+        symbols = {}
+        for symbol in resp[0]:
+            if ":" in symbol:
+                base, quote = symbol.split(":")
+            else:
+                base, quote = symbol[:3], symbol[3:]
+            symbols[symbol] = {
+                "base": "USDT" if base == "UST" else base,
+                "quote": "USDT" if quote == "UST" else quote,
+                "active": True,
+            }
+        return symbols
+
+    def _subscriptions(self, symbols: list[str]) -> list[Any]:
+        subscriptions: list[Any] = []
+        if self.depth:
+            # the order books are synced from the snapshot sent on subscription, numbering
+            # the messages tells whether any update got lost since
+            subscriptions.append({"event": "conf", "flags": self.seq_all})
+
+        if self.depth:
+            channel = {"channel": "book", "prec": "P0", "len": self.depth_levels}
+        else:
+            channel = {"channel": "ticker"}
+        subscriptions.extend(
+            {"event": "subscribe", "symbol": symbol, **channel} for symbol in symbols
         )
+        return subscriptions
 
+    def _acknowledge(self, msg: Any, connection: Connection) -> Optional[bool]:
         # first response is of the type
         # {'event': 'info', 'version': 2, 'serverId': '10f0969e-4291-4afc-ad35-02c80d847e6f', 'platform ': {'status': 1}}
-        # the second gives us indication if we are actually subscribed
+        # the next ones give us indication if we are actually subscribed, one per symbol
         # error looks like {'channel': 'ticker', 'symbol': 'BTCUSTT', 'event': 'error', 'msg': 'symbol: invalid', 'code': 10300, 'pair': 'TCUSTT'}
         # success looks like {'event': 'subscribed', 'channel': 'ticker', 'chanId': 627364, 'symbol': 'tBTCUST', 'pair': 'BTCUST'}
-        await ws.receive_json()
-        resp = await ws.receive_json()
-        if resp["event"] == "subscribed":
-            log.debug(f"{self.exchange} Subscribed to {self.pair}")
+        if isinstance(msg, list) or msg["event"] == "info":
+            return None
+        if msg["event"] == "subscribed":
+            connection.channels[msg["chanId"]] = self.pairs[msg["pair"]]
             return True
-        log.warning(f"{self.exchange} Unable to subscribe {resp}")
-        return False
-
-    async def run(self) -> None:
-        """Fetch the price from Bitfinex."""
+        # {'event': 'conf', 'status': 'OK', 'flags': 65536}
+        return msg["event"] == "conf" and msg.get("status") == "OK"
+
+    def _connections(self) -> int:
+        # the book updates aren't numbered, so those received over two connections can't be ordered
+        if self.depth:
+            return 1
+        return super()._connections()
+
+    async def _run_connection(self, reconnect: Reconnect) -> None:
+        """Fetch the prices from Bitfinex."""
+
+        # the pairs are split among as few connections as the channel limit allows
+        symbols = list(self.pairs)
+        await asyncio.gather(
+            *(
+                self._connect(
+                    reconnect if i == 0 else reconnect.clone(),
+                    symbols[i : i + self.max_channels],
+                )
+                for i in range(0, len(symbols), self.max_channels)
+            )
+        )
 
-        if not await self._check_pair_exists():
+    def _on_message(self, msg: Any, connection: Connection) -> None:
+        # bitfinex sends heartbeat packet every 15 seconds, so we check if it isn't one and then process
+        # the channel id identifies the pair
+        # example responses:
+        # [318834, [29278, 12.84014315, 29283, 8.850295029999998, -795, -0.0264, 29283, 628.17665028, 30182, 28864]]
+        # [318834, 'hb']
+        # the ticker starts with [BID, BID_SIZE, ASK, ASK_SIZE, ...]
+        if not isinstance(msg, list):
+            return
+        if self.depth:
+            self._on_sequenced(msg, connection)
             return
 
-        sub_retries = 0
-        max_sub_retries = 3
-        while True:
-            async with aiohttp.ClientSession() as session:
-                log.debug(f"{self.exchange} Created new client session.")
-
-                try:
-                    ws = await session.ws_connect(self.api_ws)
-                    log.debug(
-                        f"{self.exchange} Established a websocket connection towards {self.api_ws}"
-                    )
-
-                    sub_status = await self._subscribe(ws)
-                    if not sub_status and sub_retries <= max_sub_retries:
-                        sub_retries += 1
-                        await asyncio.sleep(3)
-                        continue
-                    if not sub_status and sub_retries > max_sub_retries:
-                        log.error(f"{self.exchange} Aborting due to too many subscription failures.")
-                        return
-                    elif sub_status:
-                        sub_retries = 0
-                    
-                    while True:
-                        try:
-                            msg = await ws.receive_json()
-                            log.debug(f"{self.exchange} received: {msg}")
-                            # bitfinex sends heartbeat packet every 15 seconds, so we check if it isn't one and then process
-                            # example responses:
-                            # [318834, [29278, 12.84014315, 29283, 8.850295029999998, -795, -0.0264, 29283, 628.17665028, 30182, 28864]]
-                            # [318834, 'hb']
-                            if msg[1] != "hb":
-                                self.data = {
-                                    "price": float(msg[1][6]),
-                                    "time": datetime.utcnow().strftime(
-                                        "%Y/%m/%dT%H:%M:%S.%f"
-                                    ),
-                                }
-                        except (TypeError, asyncio.exceptions.TimeoutError) as e:
-                            log.debug(str(e))
-                            break
-                        except (asyncio.exceptions.CancelledError, KeyboardInterrupt):
-                            log.warning(
-                                f"{self.exchange} Interruption occurred. Exiting."
-                            )
-                            return
-                except BaseException as e:
-                    log.exception(e)
-                    await asyncio.sleep(0.3)
-                    continue
+        if msg[1] != "hb":
+            # bitfinex's ticker doesn't carry a timestamp, the receive time is used
+            bid, bid_size, ask, ask_size = msg[1][:4]
+            self._update(
+                connection.channels[msg[0]],
+                float(bid),
+                float(bid_size),
+                float(ask),
+                float(ask_size),
+            )
+
+    def _on_sequenced(self, msg: list, connection: Connection) -> None:
+        # every message ends with its sequence number, a skipped one means updates were lost
+        # example responses, [PRICE, COUNT, AMOUNT] with a negative amount for the asks:
+        # [17082, [[29278, 2, 0.5], [29283, 1, -0.3]], 1]   - snapshot
+        # [17082, [29278, 1, 0.2], 2]                       - update, a count of 0 removes the level
+        # [17082, 'hb', 3]
+        sequence = connection.sequence
+        if sequence is not None and msg[-1] != sequence + 1:
+            log.warning(
+                f"{self.exchange} Lost messages, expected {sequence + 1} got {msg[-1]}, resyncing"
+            )
+            raise StreamError(f"Lost messages after {sequence}")
+        connection.sequence = msg[-1]
+
+        if msg[1] != "hb":
+            self._on_book(connection.channels[msg[0]], msg[1])
+
+    def _on_book(self, key: str, data: list) -> None:
+        book = self._book(key)
+        if data and isinstance(data[0], list):
+            book.load((), ())
+            levels = data
+        else:
+            levels = (data,)
+
+        for price, count, amount in levels:
+            ladder = book.bids if amount > 0 else book.asks
+            ladder.set(float(price), abs(float(amount)) if count else 0.0)
+
+        # bitfinex's book doesn't carry a timestamp, the receive time is used
+        self._update_top(key, book)
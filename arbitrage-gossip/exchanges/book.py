@@ -0,0 +1,112 @@
+from bisect import bisect_left, insort
+from collections import deque
+from typing import Iterable, Iterator, Sequence
+
+# a price level as sent by the exchanges - [price, size], optionally followed by
+# the sequence number of the change, the numbers either as strings or as floats
+Level = Sequence
+
+# diffs buffered while waiting for a snapshot, the oldest ones are dropped beyond it
+MAX_PENDING = 1000
+
+
+class Ladder:
+    """One side of an order book, the price levels kept sorted from the best one.
+
+    The prices are kept in a sorted list that's searched by bisection, and the
+    sizes in a dict. Changing the size of an existing level is O(1), adding or
+    removing a level is an O(log depth) search plus a memmove of the list.
+    """
+
+    __slots__ = ("sign", "keys", "sizes")
+
+    def __init__(self, descending: bool) -> None:
+        """Bids are sorted by the negated price, so that the best level always comes first"""
+        self.sign = -1.0 if descending else 1.0
+
+        """Sorted (signed) prices of the levels"""
+        self.keys: list[float] = []
+
+        """Size of each level, keyed by the signed price"""
+        self.sizes: dict[float, float] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __iter__(self) -> Iterator[tuple[float, float]]:
+        """(price, size) of each level, from the best one."""
+        sign, sizes = self.sign, self.sizes
+        for key in self.keys:
+            yield sign * key, sizes[key]
+
+    def set(self, price: float, size: float) -> None:
+        """Set the size of a level, a size of 0 removes it."""
+        key = self.sign * price
+        if size:
+            if key not in self.sizes:
+                insort(self.keys, key)
+            self.sizes[key] = size
+        elif key in self.sizes:
+            del self.sizes[key]
+            del self.keys[bisect_left(self.keys, key)]
+
+    def best(self) -> tuple[float, float]:
+        """(price, size) of the best level, (0, 0) when the side is empty."""
+        if not self.keys:
+            return 0.0, 0.0
+        key = self.keys[0]
+        return self.sign * key, self.sizes[key]
+
+    def clear(self) -> None:
+        self.keys.clear()
+        self.sizes.clear()
+
+
+class OrderBook:
+    """Local L2 order book of a pair, kept in sync from an exchange's depth stream.
+
+    The book holds the sequence number of the last applied change. Until a
+    snapshot is loaded the book isn't synced, and the received diffs are
+    buffered so that they can be applied on top of the snapshot.
+    """
+
+    __slots__ = ("bids", "asks", "sequence", "synced", "pending")
+
+    def __init__(self) -> None:
+        self.bids = Ladder(descending=True)
+        self.asks = Ladder(descending=False)
+
+        """Sequence number of the last change applied to the book"""
+        self.sequence: int = 0
+
+        """Whether the book was loaded from a snapshot & has no gaps since"""
+        self.synced = False
+
+        """Diffs received while waiting for the snapshot"""
+        self.pending: deque = deque(maxlen=MAX_PENDING)
+
+    def load(
+        self, bids: Iterable[Level], asks: Iterable[Level], sequence: int = 0
+    ) -> None:
+        """Replace the whole book with a snapshot."""
+        self.bids.clear()
+        self.asks.clear()
+        self.sequence = sequence
+        self.apply(bids, asks)
+        self.synced = True
+
+    def apply(self, bids: Iterable[Level], asks: Iterable[Level]) -> None:
+        """Apply changed levels, skipping the ones already included in the book."""
+        for ladder, levels in ((self.bids, bids), (self.asks, asks)):
+            for level in levels:
+                if len(level) > 2 and int(level[2]) <= self.sequence:
+                    continue
+                ladder.set(float(level[0]), float(level[1]))
+
+    def clear(self) -> None:
+        """Drop the book, until the next snapshot."""
+        self.bids.clear()
+        self.asks.clear()
+        self.sequence = 0
+        self.synced = False
+        self.pending.clear()
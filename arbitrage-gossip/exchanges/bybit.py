@@ -1,10 +1,23 @@
 import aiohttp
-import asyncio.exceptions
 import logging as log
-from datetime import datetime
-import json
+from typing import Any, Optional, TypedDict, Union
 
 from exchanges.base import BaseExchange
+from exchanges.catalog import SymbolCatalog
+from exchanges.connection import Connection
+
+
+class _BookTicker(TypedDict):
+    symbol: str
+    bidPrice: str
+    bidQty: str
+    askPrice: str
+    askQty: str
+    time: int
+
+
+class BookTickerMessage(TypedDict):
+    data: _BookTicker
 
 
 class ByBit(BaseExchange):
@@ -14,110 +27,77 @@ class ByBit(BaseExchange):
     api = "https://api.bybit.com"
 
     """ Bybit websocket api url """
-    api_ws = "wss://stream.bybit.com/spot/quote/ws/v1"
+    api_ws = "wss://stream.bybit.com/spot/quote/ws/v2"
 
-    def __init__(self, pair: str) -> None:
-        super().__init__(pair.upper())
-        log.info(f"{self.exchange} Initialized with {self.__dict__}")
+    """ Fields read from the book ticker messages """
+    schema = BookTickerMessage
 
-    async def _check_pair_exists(self) -> bool:
-        """Check if the pair is offered by ByBit."""
-
-        url = f"{self.api}/v2/public/tickers"
-        params = {"symbol": self.pair}
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, params=params) as resp:
-                log.debug({"{self.exchange} _check_pair_exists response": resp})
-                resp = await resp.json()
-                if resp["ret_code"] == 0:
-                    log.info(
-                        f'{self.exchange} pair "{self.pair}" is offered. MONITORING {self.exchange}'
-                    )
-                    return True
-
-                log.warning(
-                    f'{self.exchange} pair "{self.pair}" is NOT offered. NOT MONITORING {self.exchange}.'
-                )
-                return False
-
-    async def _subscribe(self, ws) -> bool:
-        await ws.send_str(
-            json.dumps(
-                {
-                    "event": "sub",
-                    "topic": "realtimes",
-                    "params": {"binary": "false"},
-                    "symbol": self.pair,
-                }
-            )
-        )
+    taker_fee = 0.001
 
-        resp = await ws.receive_json()
-        # bybit returns code only if there's a problem, else it directly returns the response
-        # examples for fail
-        # {'code': '-100010', 'desc': 'Invalid Symbols!'}
-        # {'code': '-10002', 'desc': 'Invalid event!'}
-        # example for success {'symbol': 'BTCUSDT', 'symbolName': 'BTCUSDT', 'topic': 'realtimes', 'params': {'realtimeInterval': '24h', 'binary': 'false'}, 'data': [{'t': 1654927909198, 's': 'BTCUSDT', 'sn': 'BTCUSDT', 'c': '29298.76', 'h': '30234.91', 'l': '28855.01', 'o': '30169.02', 'v': '3915.612362', 'qv': '115172990.1827463', 'm': '-0.0288', 'e': 301}], 'f': True, 'sendTime': 1654927911193}
-
-        if "code" not in resp:
-            log.debug(f"{self.exchange} Subscribed to websocket.")
-            return True
-
-        log.warning(f"{self.exchange} Unable to subscribe {resp}")
-        return False
-
-    async def run(self) -> None:
-        """Fetch the price from ByBit."""
+    def __init__(
+        self,
+        pairs: Union[str, list[str]],
+        session: Optional[aiohttp.ClientSession] = None,
+        catalog: Optional[SymbolCatalog] = None,
+        depth: bool = False,
+    ) -> None:
+        super().__init__(pairs, session, catalog, depth)
+        log.info(f"{self.exchange} Initialized with {self.__dict__}")
 
-        # don't monitor the exchange if the pair isn't listed
-        if not await self._check_pair_exists():
+    def _symbol(self, pair: str) -> str:
+        return pair.upper()
+
+    async def _fetch_symbols(self) -> dict[str, dict[str, Any]]:
+        """Download all the spot symbols listed by ByBit."""
+
+        url = f"{self.api}/spot/v1/symbols"
+        async with self.session.get(url) as resp:
+            log.debug(f"{self.exchange} _fetch_symbols response: {resp}")
+            resp = await resp.json()
+
+        # example symbol:
+        # {"name":"BTCUSDT","alias":"BTCUSDT","baseCurrency":"BTC","quoteCurrency":"USDT","showStatus":true,...}
+        return {
+            symbol["name"]: {
+                "base": symbol["baseCurrency"],
+                "quote": symbol["quoteCurrency"],
+                "active": symbol["showStatus"],
+            }
+            for symbol in resp["result"]
+        }
+
+    def _subscriptions(self, symbols: list[str]) -> list[Any]:
+        # all the symbols are subscribed to over the same connection
+        return [
+            {
+                "event": "sub",
+                "topic": "bookTicker",
+                "params": {"symbol": symbol, "binary": False},
+            }
+            for symbol in symbols
+        ]
+
+    def _acknowledge(self, msg: Any, connection: Connection) -> Optional[bool]:
+        # each subscription is acknowledged separately, a non-zero code means it failed
+        # example for fail
+        # {'code': '-100010', 'desc': 'Invalid Symbols!'}
+        # example for success {'topic': 'bookTicker', 'event': 'sub', 'params': {'symbol': 'BTCUSDT', 'binary': 'false', 'symbolName': 'BTCUSDT'}, 'code': '0', 'msg': 'Success'}
+        if "data" in msg:
+            return None
+        return msg.get("code") == "0"
+
+    def _on_message(self, msg: dict[str, Any], connection: Connection) -> None:
+        # example response:
+        # {'topic': 'bookTicker', 'params': {'symbol': 'BTCUSDT', 'binary': 'false', 'symbolName': 'BTCUSDT'}, 'data': {'symbol': 'BTCUSDT', 'bidPrice': '29259.03', 'bidQty': '0.412846', 'askPrice': '29259.04', 'askQty': '0.060722', 'time': 1654935180037}}
+        data = msg.get("data")
+        if data is None:
             return
 
-        sub_retries = 0
-        max_sub_retries = 3
-        async with aiohttp.ClientSession() as session:
-            log.debug(f"{self.exchange} Created new client session.")
-            while True:
-                try:
-                    ws = await session.ws_connect(self.api_ws)
-                    log.debug(
-                        f"{self.exchange} Established a websocket connection towards {self.api_ws}"
-                    )
-
-                    sub_status = await self._subscribe(ws)
-                    if not sub_status and sub_retries <= max_sub_retries:
-                        sub_retries += 1
-                        await asyncio.sleep(3)
-                        continue
-                    if not sub_status and sub_retries > max_sub_retries:
-                        log.error(f"{self.exchange} Aborting due to too many subscription failures.")
-                        return
-                    elif sub_status:
-                        sub_retries = 0
-                    
-                    while True:
-                        try:
-                            msg = await ws.receive_json()
-                            log.debug(f"{self.exchange} {msg}")
-
-                            # example response:
-                            # {'symbol': 'BTCUSDT', 'symbolName': 'BTCUSDT', 'topic': 'realtimes', 'params': {'realtimeInterval': '24h', 'binary': 'false'}, 'data': [{'t': 1654935180037, 's': 'BTCUSDT', 'sn': 'BTCUSDT', 'c': '29259.04', 'h': '30180.58', 'l': '28855.01', 'o': '30065.01', 'v': '3738.712793', 'qv': '109807074.56801432', 'm': '-0.0268', 'e': 301}], 'f': False, 'sendTime': 1654935180324}
-                            self.data = {
-                                "price": float(msg["data"][0]["c"]),
-                                "time": datetime.utcfromtimestamp(
-                                    msg["data"][0]["t"] / 1000
-                                ).strftime("%Y/%m/%dT%H:%M:%S.%f"),
-                            }
-                        except (TypeError, asyncio.exceptions.TimeoutError) as e:
-                            log.debug(str(e))
-                            break
-                        except (asyncio.exceptions.CancelledError, KeyboardInterrupt):
-                            log.warning(
-                                f"{self.exchange} Interruption occurred. Exiting."
-                            )
-                            return
-                except BaseException as e:
-                    log.exception(e)
-                    await asyncio.sleep(0.3)
-                    continue
+        self._update(
+            self.pairs[data["symbol"]],
+            float(data["bidPrice"]),
+            float(data["bidQty"]),
+            float(data["askPrice"]),
+            float(data["askQty"]),
+            data["time"] * 1_000_000,
+        )
@@ -0,0 +1,109 @@
+import gzip
+import json
+import os
+import struct
+import weakref
+from time import time_ns
+from typing import Any, Iterator, NamedTuple, Optional, Union
+
+# identifies the capture files, followed by the length of the metadata & the metadata as json
+MAGIC = b"AGF1"
+LENGTH = struct.Struct("<I")
+
+# receive time in nanoseconds since the epoch, connection number, whether the frame is binary & its length
+HEADER = struct.Struct("<qI?I")
+
+# extension of the capture files, one per exchange
+SUFFIX = ".frames.gz"
+
+
+class Frame(NamedTuple):
+    """A websocket frame as received from an exchange."""
+
+    receive_time: int
+    connection: int
+    data: Union[str, bytes]
+
+
+class Capture:
+    """Records the raw websocket frames received by an exchange.
+
+    The frames are appended to a gzip compressed file as they're received,
+    each one prefixed by its receive time & the number of the connection it was
+    received over, so that they can be replayed later on. The file starts with
+    the metadata needed to recreate the exchange, e.g. the monitored pairs.
+    """
+
+    def __init__(self, path: str, metadata: dict[str, Any]) -> None:
+        """Path of the capture file, overwritten if it exists"""
+        self.path = path
+
+        """Number of frames recorded so far"""
+        self.frames = 0
+
+        """Number of each connection frames were received over, in the order they were first seen"""
+        self.connections: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._next_connection = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file = gzip.open(path, "wb", compresslevel=6)
+        header = json.dumps(metadata).encode()
+        self.file.write(MAGIC + LENGTH.pack(len(header)) + header)
+
+    def write(
+        self, ws: Any, data: Union[str, bytes], receive_time: Optional[int] = None
+    ) -> None:
+        """Record a frame received over ws."""
+        connection = self.connections.get(ws)
+        if connection is None:
+            connection = self.connections[ws] = self._next_connection
+            self._next_connection += 1
+
+        binary = isinstance(data, bytes)
+        payload = data if binary else data.encode()
+        self.file.write(
+            HEADER.pack(receive_time or time_ns(), connection, binary, len(payload))
+        )
+        self.file.write(payload)
+        self.frames += 1
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def capture_path(directory: str, exchange: str) -> str:
+    """Path of an exchange's capture file within directory."""
+    return os.path.join(directory, f"{exchange}{SUFFIX}")
+
+
+def read_capture(path: str) -> tuple[dict[str, Any], Iterator[Frame]]:
+    """The metadata of a capture file & an iterator over its frames.
+
+    A capture cut short, e.g. by the program getting killed, is read up to its
+    last complete frame.
+    """
+    file = gzip.open(path, "rb")
+    if file.read(len(MAGIC)) != MAGIC:
+        file.close()
+        raise ValueError(f"{path} isn't a capture file")
+    (length,) = LENGTH.unpack(file.read(LENGTH.size))
+    metadata = json.loads(file.read(length))
+
+    def frames() -> Iterator[Frame]:
+        with file:
+            while True:
+                try:
+                    header = file.read(HEADER.size)
+                    if len(header) < HEADER.size:
+                        return
+                    receive_time, connection, binary, length = HEADER.unpack(header)
+                    payload = file.read(length)
+                except EOFError:
+                    return
+                if len(payload) < length:
+                    return
+                yield Frame(
+                    receive_time, connection, payload if binary else payload.decode()
+                )
+
+    return metadata, frames()
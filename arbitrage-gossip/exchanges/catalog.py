@@ -0,0 +1,141 @@
+import asyncio
+import json
+import logging as log
+import os
+import time
+from typing import Any, Iterable, Optional
+
+from utils.pairs import pair_key
+
+DEFAULT_CACHE = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+    "arbitrage-gossip",
+    "symbols.json",
+)
+
+
+class SymbolCatalog:
+    """The symbols listed by each exchange.
+
+    Each exchange's symbol list is downloaded once, all exchanges in parallel,
+    and persisted on disk for ttl seconds so that restarts don't have to download
+    them again. Existence checks are then simple dictionary lookups.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE, ttl: float = 3600) -> None:
+        """Location of the on-disk cache"""
+        self.path = path
+
+        """Seconds after which the cached symbols of an exchange are downloaded again, 0 disables the cache &
+        downloads them once per process"""
+        self.ttl = ttl
+
+        """ Symbols of each exchange, in the exchange's own notation
+        self.symbols = {
+            "Binance" : {
+                "ethusdt" : {"base": "ETH", "quote": "USDT", "active": True},
+                }
+            }
+        """
+        self.symbols: dict[str, dict[str, dict[str, Any]]] = {}
+
+        """ Symbols of each exchange by their pair key, shared by all the exchanges
+        self.index = {
+            "Binance" : {
+                "ETHUSDT" : "ethusdt",
+                }
+            }
+        """
+        self.index: dict[str, dict[str, str]] = {}
+
+        """When the symbols of each exchange were downloaded"""
+        self.fetched: dict[str, float] = {}
+
+        """Serializes concurrent loads, so that each exchange is downloaded once"""
+        self._lock = asyncio.Lock()
+
+    async def load(self, exchanges: Iterable[Any]) -> None:
+        """Make sure the symbols of all the exchanges are available, downloading the missing ones in parallel."""
+        async with self._lock:
+            if not self.fetched:
+                self._read_cache()
+
+            now = time.time()
+            missing = [
+                exchange
+                for exchange in exchanges
+                if exchange.exchange not in self.symbols
+                or (
+                    self.ttl > 0
+                    and now - self.fetched.get(exchange.exchange, 0) >= self.ttl
+                )
+            ]
+            if not missing:
+                return
+
+            results = await asyncio.gather(
+                *(exchange._fetch_symbols() for exchange in missing),
+                return_exceptions=True,
+            )
+            for exchange, symbols in zip(missing, results):
+                if isinstance(symbols, BaseException):
+                    log.error(
+                        f"{exchange.exchange} Unable to fetch the listed symbols: {symbols!r}"
+                    )
+                    continue
+                self._add(exchange.exchange, symbols, now)
+
+            self._write_cache()
+
+    def lookup(self, exchange: str, symbol: str) -> Optional[dict[str, Any]]:
+        """Get a symbol in the exchange's own notation."""
+        return self.symbols.get(exchange, {}).get(symbol)
+
+    def find(self, exchange: str, key: str) -> Optional[str]:
+        """Get the exchange's own notation of the pair key, e.g. "ETHUSDT"."""
+        return self.index.get(exchange, {}).get(key)
+
+    def _add(
+        self, exchange: str, symbols: dict[str, dict[str, Any]], fetched: float
+    ) -> None:
+        self.symbols[exchange] = symbols
+        self.index[exchange] = {
+            pair_key(entry["base"] + entry["quote"]): symbol
+            for symbol, entry in symbols.items()
+            if entry["base"] and entry["quote"]
+        }
+        self.fetched[exchange] = fetched
+
+    def _read_cache(self) -> None:
+        if self.ttl <= 0:
+            return
+
+        try:
+            with open(self.path) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        now = time.time()
+        for exchange, entry in cache.items():
+            if now - entry["fetched"] < self.ttl:
+                self._add(exchange, entry["symbols"], entry["fetched"])
+        log.debug(f"Loaded the cached symbols of {list(self.symbols)} from {self.path}")
+
+    def _write_cache(self) -> None:
+        if self.ttl <= 0:
+            return
+
+        cache = {
+            exchange: {"fetched": self.fetched[exchange], "symbols": symbols}
+            for exchange, symbols in self.symbols.items()
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # write to a temporary file first so that a crash never leaves a half written cache
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(cache, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            log.warning(f"Unable to cache the listed symbols in {self.path}: {e}")
@@ -0,0 +1,26 @@
+from typing import Any, Optional
+
+import aiohttp
+
+
+class StreamError(Exception):
+    """The messages of a connection can't be trusted anymore, e.g. some got lost, so it's reestablished."""
+
+
+class Connection:
+    """A websocket connection of an exchange & what the exchange keeps about it until it closes."""
+
+    __slots__ = ("ws", "symbols", "channels", "sequence")
+
+    def __init__(self, ws: aiohttp.ClientWebSocketResponse, symbols: list[str]) -> None:
+        """The websocket"""
+        self.ws = ws
+
+        """Symbols streamed over the connection, in the exchange's own notation"""
+        self.symbols = symbols
+
+        """Pair key of each channel id, for the exchanges numbering the streams of a connection"""
+        self.channels: dict[Any, str] = {}
+
+        """Number of the last message, for the exchanges numbering the messages of a connection"""
+        self.sequence: Optional[int] = None
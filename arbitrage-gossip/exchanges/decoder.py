@@ -0,0 +1,74 @@
+import json
+from typing import Any, Callable, Optional, Union
+
+# the faster decoders are optional, the standard library's json is always available
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+Loads = Callable[[Union[str, bytes]], Any]
+
+# available decoders, from the fastest to the slowest
+DECODERS: dict[str, Loads] = {}
+if msgspec is not None:
+    DECODERS["msgspec"] = msgspec.json.decode
+if orjson is not None:
+    DECODERS["orjson"] = orjson.loads
+if ujson is not None:
+    DECODERS["ujson"] = ujson.loads
+DECODERS["json"] = json.loads
+
+# errors raised by the decoders on a malformed frame, orjson's & ujson's derive from ValueError
+ERRORS: tuple[type[Exception], ...] = (ValueError,)
+if msgspec is not None:
+    ERRORS += (msgspec.DecodeError,)
+
+# name of the decoder used by the exchanges
+name: str = next(iter(DECODERS))
+
+
+def use(decoder: str) -> None:
+    """Select the decoder used by the exchanges created from now on, "auto" picks the fastest available one."""
+    global name
+    if decoder == "auto":
+        name = next(iter(DECODERS))
+    elif decoder in DECODERS:
+        name = decoder
+    else:
+        raise ValueError(
+            f"JSON decoder '{decoder}' isn't installed, available: {list(DECODERS)}"
+        )
+
+
+def loads_for(schema: Optional[type] = None) -> Loads:
+    """Get the function decoding the frames of an exchange.
+
+    With msgspec, messages are decoded into schema (a TypedDict describing only
+    the fields read by the exchange), skipping everything else. Messages not
+    matching the schema, e.g. acknowledgements or heartbeats, fall back to a full
+    decode. The other decoders always decode the whole message.
+    """
+    if name != "msgspec" or schema is None:
+        return DECODERS[name]
+
+    typed = msgspec.json.Decoder(schema).decode
+    untyped = msgspec.json.decode
+
+    def loads(data: Union[str, bytes]) -> Any:
+        try:
+            return typed(data)
+        except msgspec.ValidationError:
+            return untyped(data)
+
+    return loads
@@ -1,11 +1,23 @@
 import logging as log
 import aiohttp
-import asyncio.exceptions
-import json
-from datetime import datetime
-from typing import Any
+from typing import Any, Optional, TypedDict, Union
 
 from exchanges.base import BaseExchange
+from exchanges.catalog import SymbolCatalog
+from exchanges.connection import Connection
+
+
+class _Ticker(TypedDict):
+    bid: Optional[float]
+    bidSize: Optional[float]
+    ask: Optional[float]
+    askSize: Optional[float]
+    time: float
+
+
+class TickerMessage(TypedDict):
+    market: str
+    data: _Ticker
 
 
 class FTX(BaseExchange):
@@ -17,105 +29,75 @@ class FTX(BaseExchange):
     """ FTX websocket api url """
     api_ws = "ws://ftx.com/ws"
 
-    def __init__(self, pair: str) -> None:
-        super().__init__(pair.upper())
-        log.info(f"{self.exchange} Initialized with {self.__dict__}")
+    """ Fields read from the ticker messages """
+    schema = TickerMessage
 
-    # should always be called before self.run()
-    async def _check_pair_exists(self) -> bool:
-        """Check if the pair is listed by FTX."""
-
-        url = f"{self.api}/markets/{self.pair}"
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as resp:
-                log.debug({"{self.exchange} _check_pair_exists response": resp})
-                if resp.status == 200:
-                    log.info(
-                        f'{self.exchange} pair "{self.pair}" is offered. MONITORING {self.exchange}'
-                    )
-                    return True
-
-                log.warning(
-                    f'{self.exchange} pair "{self.pair}" is NOT offered. NOT MONITORING {self.exchange}.'
-                )
-                return False
-
-    async def _subscribe(self, ws) -> bool:
-        await ws.send_str(
-            json.dumps(
-                {
-                    "op": "subscribe",
-                    "channel": "ticker",
-                    "market": self.pair,
-                }
-            )
-        )
+    taker_fee = 0.0007
+
+    notation = "/"
 
-        # first response gives indication if we're subscribed
+    def __init__(
+        self,
+        pairs: Union[str, list[str]],
+        session: Optional[aiohttp.ClientSession] = None,
+        catalog: Optional[SymbolCatalog] = None,
+        depth: bool = False,
+    ) -> None:
+        super().__init__(pairs, session, catalog, depth)
+        log.info(f"{self.exchange} Initialized with {self.__dict__}")
+
+    def _symbol(self, pair: str) -> str:
+        return pair.upper()
+
+    async def _fetch_symbols(self) -> dict[str, dict[str, Any]]:
+        """Download all the markets listed by FTX."""
+
+        url = f"{self.api}/markets"
+        async with self.session.get(url) as resp:
+            log.debug(f"{self.exchange} _fetch_symbols response: {resp}")
+            resp = await resp.json()
+
+        # example market, futures have null base & quote currencies:
+        # {"name":"BTC/USDT","type":"spot","baseCurrency":"BTC","quoteCurrency":"USDT","enabled":true,...}
+        return {
+            market["name"]: {
+                "base": market["baseCurrency"],
+                "quote": market["quoteCurrency"],
+                "active": market["enabled"],
+            }
+            for market in resp["result"]
+        }
+
+    def _subscriptions(self, symbols: list[str]) -> list[Any]:
+        # all the markets are subscribed to over the same connection
+        return [
+            {"op": "subscribe", "channel": "ticker", "market": symbol}
+            for symbol in symbols
+        ]
+
+    def _acknowledge(self, msg: Any, connection: Connection) -> Optional[bool]:
+        # each subscription is acknowledged separately
         # error looks like {'type': 'error', 'code': 404, 'msg': 'No such market: BTCUSDT'}
         # success looks like {'type': 'subscribed', 'channel': 'ticker', 'market': 'BTC/USDT'}
-        resp = await ws.receive_json()
-        if isinstance(resp,dict) and resp["type"] == "subscribed":
-            log.debug(f"{self.exchange} Subscribed to {self.pair}")
+        if not isinstance(msg, dict) or msg["type"] == "error":
+            return False
+        if msg["type"] == "subscribed":
             return True
-
-        log.warning(f"{self.exchange} Unable to subscribe {resp}")
-        return False
-
-    async def run(self) -> None:
-        """Fetch the price from FTX."""
-
-        # don't monitor the exchange if the pair isn't listed
-        if not await self._check_pair_exists():
+        return None
+
+    def _on_message(self, msg: dict[str, Any], connection: Connection) -> None:
+        # example response:
+        # {'channel': 'ticker', 'market': 'BTC/USDT', 'type': 'update', 'data': {'bid': 29310.0, 'ask': 29311.0, 'bidSize': 0.7335, 'askSize': 0.2153, 'last': 29310.0, 'time': 1654929638.6974728}}
+        data = msg.get("data")
+        # a side of the book may be empty, e.g. right after a listing
+        if data is None or data["bid"] is None or data["ask"] is None:
             return
 
-        sub_retries = 0
-        max_sub_retries = 3
-        async with aiohttp.ClientSession() as session:
-            log.debug(f"{self.exchange} Created new client session.")
-            while True:
-                try:
-                    ws = await session.ws_connect(self.api_ws)
-                    log.debug(
-                        f"{self.exchange} Established a websocket connection towards {self.api_ws}"
-                    )
-
-                    sub_status = await self._subscribe(ws)
-                    if not sub_status and sub_retries <= max_sub_retries:
-                        sub_retries += 1
-                        await asyncio.sleep(3)
-                        continue
-                    if not sub_status and sub_retries > max_sub_retries:
-                        log.error(f"{self.exchange} Aborting due to too many subscription failures.")
-                        self.data = {}
-                        return
-                    elif sub_status:
-                        sub_retries = 0
-                    
-
-                    while True:
-                        try:
-                            msg = await ws.receive_json()
-                            log.debug(f"{self.exchange} {msg}")
-
-                            # example response:
-                            # {'channel': 'ticker', 'market': 'BTC/USDT', 'type': 'update', 'data': {'bid': 29310.0, 'ask': 29311.0, 'bidSize': 0.7335, 'askSize': 0.2153, 'last': 29310.0, 'time': 1654929638.6974728}}
-                            self.data = {
-                                "price": float(msg["data"]["last"]),
-                                "time": datetime.utcfromtimestamp(
-                                    msg["data"]["time"]
-                                ).strftime("%Y/%m/%dT%H:%M:%S.%f"),
-                            }
-                        except (TypeError, asyncio.exceptions.TimeoutError) as e:
-                            log.debug(str(e))
-                            break
-                        except (asyncio.exceptions.CancelledError, KeyboardInterrupt):
-                            log.warning(
-                                f"{self.exchange} Interruption occurred. Exiting."
-                            )
-                            return
-                except BaseException as e:
-                    log.exception(e)
-                    await asyncio.sleep(0.3)
-                    continue
+        self._update(
+            self.pairs[msg["market"]],
+            data["bid"],
+            data["bidSize"] or 0.0,
+            data["ask"],
+            data["askSize"] or 0.0,
+            int(data["time"] * 1e9),
+        )
@@ -0,0 +1,128 @@
+from time import monotonic_ns
+from typing import Optional
+
+from utils.metrics import Histogram
+
+# nanoseconds over which the message rate is measured
+RATE_WINDOW = 5_000_000_000
+
+# upper bounds, in seconds, of the buckets the connection lifetimes are counted in
+LIFETIME_BUCKETS = (10.0, 60.0, 600.0, 3600.0, 6 * 3600.0, 24 * 3600.0)
+
+
+class LifetimeHistogram(Histogram):
+    """How long the connections to an exchange stayed up.
+
+    A connection is counted in the first bucket whose bound its lifetime
+    doesn't exceed, the ones lasting longer than the last bound in an
+    overflow bucket.
+    """
+
+    __slots__ = ()
+
+    def __init__(self) -> None:
+        super().__init__(LIFETIME_BUCKETS)
+
+    def record(self, lifetime: float) -> None:
+        """Count a connection that stayed up for lifetime seconds."""
+        self.observe(lifetime)
+
+    def __repr__(self) -> str:
+        bounds = [f"<={_duration(bound)}" for bound in LIFETIME_BUCKETS]
+        bounds.append(f">{_duration(LIFETIME_BUCKETS[-1])}")
+        buckets = ", ".join(f"{b}: {c}" for b, c in zip(bounds, self.counts) if c)
+        return f"LifetimeHistogram({buckets})"
+
+
+def _duration(seconds: float) -> str:
+    for unit, length in (("h", 3600), ("m", 60)):
+        if seconds >= length:
+            return f"{seconds / length:g}{unit}"
+    return f"{seconds:g}s"
+
+
+class FeedHealth:
+    """Liveness of an exchange's feed.
+
+    Every message received from the exchange, heartbeats included, is counted.
+    The websocket pings & pongs aren't messages, but like them they show the
+    connection is alive, which is what the silence is measured against.
+    The times are monotonic nanoseconds, unaffected by wall clock adjustments.
+    """
+
+    __slots__ = (
+        "last_receive",
+        "last_alive",
+        "messages",
+        "_rate",
+        "_window_start",
+        "_window_messages",
+        "lifetimes",
+        "subscribe_failures",
+        "malformed",
+        "parse_time",
+    )
+
+    def __init__(self) -> None:
+        """When the last message was received, 0 before the first one"""
+        self.last_receive: int = 0
+
+        """When the feed last showed it's alive, through a message, a ping or a pong, 0 before that"""
+        self.last_alive: int = 0
+
+        """Number of messages received since the start"""
+        self.messages: int = 0
+
+        """Messages per second over the last complete window"""
+        self._rate: float = 0.0
+
+        self._window_start: int = monotonic_ns()
+        self._window_messages: int = 0
+
+        """Lifetimes of the connections that went down"""
+        self.lifetimes = LifetimeHistogram()
+
+        """Subscriptions the exchange refused or didn't acknowledge"""
+        self.subscribe_failures: int = 0
+
+        """Frames that couldn't be decoded & were skipped"""
+        self.malformed: int = 0
+
+        """Seconds spent decoding a sample of the messages"""
+        self.parse_time = Histogram()
+
+    def received(self, now: Optional[int] = None) -> None:
+        """Count a received message."""
+        if now is None:
+            now = monotonic_ns()
+        self.last_receive = now
+        self.last_alive = now
+        self.messages += 1
+        self._window_messages += 1
+
+        elapsed = now - self._window_start
+        if elapsed >= RATE_WINDOW:
+            self._rate = self._window_messages * 1e9 / elapsed
+            self._window_start = now
+            self._window_messages = 0
+
+    def alive(self, now: Optional[int] = None) -> None:
+        """Note that the connection is alive, without a message being received, e.g. on a pong."""
+        self.last_alive = monotonic_ns() if now is None else now
+
+    def silence(self, now: Optional[int] = None) -> int:
+        """Nanoseconds since the feed was last alive, or since the start if it never was."""
+        if now is None:
+            now = monotonic_ns()
+        return now - (self.last_alive or self._window_start)
+
+    def rate(self, now: Optional[int] = None) -> float:
+        """Messages per second, 0 once no message was received for a whole window."""
+        if now is None:
+            now = monotonic_ns()
+        if now - (self.last_receive or self._window_start) >= RATE_WINDOW:
+            return 0.0
+        return self._rate
+
+    def __repr__(self) -> str:
+        return f"FeedHealth(messages={self.messages}, rate={self.rate():.1f}/s, silence={self.silence() / 1e9:.1f}s, lifetimes={self.lifetimes})"
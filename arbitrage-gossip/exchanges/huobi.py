@@ -1,10 +1,42 @@
 import aiohttp
-import asyncio.exceptions
 import logging as log
-from datetime import datetime
-import json, gzip
+import json, zlib
+from typing import Any, Iterable, Optional, TypedDict, Union
 
 from exchanges.base import BaseExchange
+from exchanges.catalog import SymbolCatalog
+from exchanges.connection import Connection
+from exchanges.reconnect import Reconnect
+
+
+class _Tick(TypedDict):
+    bid: float
+    bidSize: float
+    ask: float
+    askSize: float
+
+
+class TickerMessage(TypedDict):
+    ch: str
+    ts: int
+    tick: _Tick
+
+
+class _Mbp(TypedDict):
+    seqNum: int
+    prevSeqNum: int
+    bids: list[list[float]]
+    asks: list[list[float]]
+
+
+class MbpMessage(TypedDict):
+    ch: str
+    ts: int
+    tick: _Mbp
+
+
+# window bits of zlib reading a gzip header & trailer
+GZIP_WBITS = 16 + zlib.MAX_WBITS
 
 
 class Huobi(BaseExchange):
@@ -16,117 +48,160 @@ class Huobi(BaseExchange):
     """ Huobi websocket api url """
     api_ws = "wss://api.huobi.pro/ws"
 
-    def __init__(self, pair: str) -> None:
-        super().__init__(pair.lower())
+    """ Huobi websocket api url of the incremental order book updates """
+    api_feed = "wss://api.huobi.pro/feed"
+
+    endpoints = ("api", "api_ws", "api_feed")
+
+    """ Fields read from the ticker messages """
+    schema = TickerMessage
+
+    """ Fields read from the order book update messages """
+    depth_schema = MbpMessage
+
+    supports_depth = True
+
+    taker_fee = 0.002
+
+    """ Huobi pings every 5 seconds & drops the connections not answering """
+    receive_deadline = 15.0
+
+    """ Number of order book levels streamed when streaming the depth """
+    depth_levels = 150
+
+    decode_errors = BaseExchange.decode_errors + (zlib.error,)
+
+    def __init__(
+        self,
+        pairs: Union[str, list[str]],
+        session: Optional[aiohttp.ClientSession] = None,
+        catalog: Optional[SymbolCatalog] = None,
+        depth: bool = False,
+    ) -> None:
+        super().__init__(pairs, session, catalog, depth)
+
+        """ Channel subscribed to for each symbol """
+        self.channel = f"mbp.{self.depth_levels}" if self.depth else "ticker"
+
+        """ Symbols whose order book snapshot was requested & not yet received """
+        self.requested: set[str] = set()
         log.info(f"{self.exchange} Initialized with {self.__dict__}")
 
-    async def _check_pair_exists(self) -> bool:
-        """Check if the pair is listed by Huobi."""
+    def _symbol(self, pair: str) -> str:
+        return pair.lower()
+
+    async def _fetch_symbols(self) -> dict[str, dict[str, Any]]:
+        """Download all the symbols listed by Huobi."""
 
         url = f"{self.api}/v2/settings/common/symbols/"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as resp:
-                log.debug({"{self.exchange} _check_pair_exists response": resp})
-                resp = await resp.json()
-                for symbol in resp["data"]:
-                    if symbol["sc"] == self.pair and symbol["state"] == "online":
-                        log.info(
-                            f'{self.exchange} pair "{self.pair}" is offered. MONITORING {self.exchange}'
-                        )
-                        return True
-
-                log.warning(
-                    f'{self.exchange} pair "{self.pair}" IS NOT offered. NOT MONITORING {self.exchange}.'
-                )
-                return False
-
-    async def _subscribe(self, ws):
-        await ws.send_str(json.dumps({"sub": f"market.{self.pair}.ticker"}))
-
-        # huobi sometimes returns {'ping': 1654931160555} as first response, so we have to try and filter
+        async with self.session.get(url) as resp:
+            log.debug(f"{self.exchange} _fetch_symbols response: {resp}")
+            resp = await resp.json()
+
+        # example symbol:
+        # {"sc":"btcusdt","bc":"btc","qc":"usdt","state":"online",...}
+        return {
+            symbol["sc"]: {
+                "base": symbol["bc"].upper(),
+                "quote": symbol["qc"].upper(),
+                "active": symbol["state"] == "online",
+            }
+            for symbol in resp["data"]
+        }
+
+    def _decode(self, data: Union[str, bytes]) -> Any:
+        # huobi's frames are gzip compressed, each one a complete gzip member that a
+        # decompressobj can't be reused past, so they're inflated in a single call
+        return self.loads(zlib.decompress(data, GZIP_WBITS))
+
+    async def _receive(
+        self,
+        ws: aiohttp.ClientWebSocketResponse,
+        reconnect: Optional[Reconnect] = None,
+    ) -> Any:
+        """Receive & decode the next message, answering Huobi's pings in between.
+
+        Huobi pings with {"ping": <ts>} messages rather than websocket pings, and
+        drops the connection unless they're answered with {"pong": <ts>}.
+        """
+        while True:
+            resp = await super()._receive(ws, reconnect)
+            if isinstance(resp, dict) and "ping" in resp:
+                await ws.send_str(json.dumps({"pong": resp["ping"]}))
+                continue
+            return resp
+
+    async def _url(self, symbols: list[str]) -> str:
+        # the incremental order book updates are served from a separate endpoint
+        return self.api_feed if self.depth else self.api_ws
+
+    def _reset_books(self, symbols: Iterable[str]) -> None:
+        super()._reset_books(symbols)
+        self.requested.clear()
+
+    def _subscriptions(self, symbols: list[str]) -> list[Any]:
+        # all the pairs are subscribed to over the same connection
+        return [{"sub": f"market.{symbol}.{self.channel}"} for symbol in symbols]
+
+    def _acknowledge(self, msg: Any, connection: Connection) -> Optional[bool]:
         # example for fail {'status': 'error', 'ts': 1654930506284, 'err-code': 'bad-request', 'err-msg': 'invalid symbol btcusd'}
         # example for success {'id': None, 'status': 'ok', 'subbed': 'market.btcusdt.ticker', 'ts': 1654930486190}
-        raw_resp = await ws.receive_bytes()
-        resp = json.loads(gzip.decompress(raw_resp).decode())
-
-        # if {'ping': <ts>} is the response, try again
-        if "ping" in resp.keys():
-            raw_resp = await ws.receive_bytes()
-            resp = json.loads(gzip.decompress(raw_resp).decode())
-
-        if isinstance(resp, dict) and resp["status"] == "ok":
-            log.debug(f"{self.exchange} Subscribed to {self.pair}")
-            return True
-
-        log.warning(f"{self.exchange} Unable to Subscribe {resp}")
-        return False
-
-    async def run(self) -> None:
-        """Fetch the price from Huobi."""
-
-        # don't monitor the exchange if the pair isn't listed
-        if not await self._check_pair_exists():
-            return
-
-        sub_retries = 0
-        max_sub_retries = 3
-        async with aiohttp.ClientSession() as session:
-            while True:
-                try:
-                    ws = await session.ws_connect(self.api_ws)
-                    log.debug(
-                        f"{self.exchange} Created new Client session and Established a websocket connection towards {self.api_ws}"
-                    )
-
-                    sub_status = await self._subscribe(ws)
-                    if not sub_status and sub_retries <= max_sub_retries:
-                        sub_retries += 1
-                        await asyncio.sleep(3)
-                        continue
-                    if not sub_status and sub_retries > max_sub_retries:
-                        log.error(f"{self.exchange} Aborting due to too many subscription failures.")
-                        self.data = {}
-                        return
-                    elif sub_status:
-                        sub_retries = 0
-                    while True:
-                        # https://huobiapi.github.io/docs/spot/v1/en/#q4-why-the-websocket-is-often-disconnected
-                        # Q4：Why the WebSocket is often disconnected?
-                        # Please check below possible reasons:
-
-                        # The client didn't respond 'Pong'. It is requird to respond 'Pong' after receive 'Ping' from server.
-                        # The server didn't receive 'Pong' successfully due to network issue.
-                        # The connection is broken due to network issue.
-                        # It is suggested to implement WebSocket re-connect mechanism. If Ping/Pong works well but the connection is broken, the application should be able to re-connect automatically.
-
-                        # The aiohttp ws connection should send a pong response to each received ping, yet we get disconnected every 5 seconds or so, so we restart the connection
-
-                        # example responses:
-                        # {'ch': 'market.btcusdt.ticker', 'ts': 1654932129289, 'tick': {'open': 30082.59, 'high': 30186.19, 'low': 28841.12, 'close': 29342.99, 'amount': 16438.237897971736, 'vol': 483399849.8806693, 'count': 521649, 'bid': 29342.98, 'bidSize': 6.133091, 'ask': 29342.99, 'askSize': 2.129672, 'lastPrice': 29342.99, 'lastSize': 0.00737}}
-                        # {'ping': 1654932128921}
-                        try:
-                            raw_resp = await ws.receive_bytes()
-                            resp = json.loads(gzip.decompress(raw_resp).decode())
-                            log.debug(f"{self.exchange} {resp}")
-
-                            if "tick" in resp:
-                                self.data = {
-                                    "price": float(resp["tick"]["lastPrice"]),
-                                    "time": datetime.utcfromtimestamp(
-                                        resp["ts"] / 1000
-                                    ).strftime("%Y/%m/%dT%H:%M:%S.%f"),
-                                }
-                        # Huobi disconnects & reconnects every few seconds, so we dont flood the log
-                        except (asyncio.exceptions.TimeoutError, TypeError) as e:
-                            log.debug(str(e))
-                            break
-                        except (asyncio.exceptions.CancelledError, KeyboardInterrupt):
-                            log.warning(
-                                f"{self.exchange} Interruption occurred. Exiting."
-                            )
-                            self.data = {}
-                            return
-                except BaseException as e:
-                    log.exception(e)
-                    await asyncio.sleep(0.3)
-                    continue
+        if "subbed" in msg:
+            return msg["status"] == "ok"
+        if msg.get("status") == "error":
+            return False
+        return None
+
+    def _on_message(self, msg: dict[str, Any], connection: Connection) -> Any:
+        if self.depth:
+            return self._on_depth(msg)
+
+        # example response:
+        # {'ch': 'market.btcusdt.ticker', 'ts': 1654932129289, 'tick': {'open': 30082.59, 'high': 30186.19, 'low': 28841.12, 'close': 29342.99, 'amount': 16438.237897971736, 'vol': 483399849.8806693, 'count': 521649, 'bid': 29342.98, 'bidSize': 6.133091, 'ask': 29342.99, 'askSize': 2.129672, 'lastPrice': 29342.99, 'lastSize': 0.00737}}
+        tick = msg.get("tick")
+        if tick is None:
+            return None
+
+        # "market.btcusdt.ticker"
+        self._update(
+            self.pairs[msg["ch"].split(".")[1]],
+            float(tick["bid"]),
+            float(tick["bidSize"]),
+            float(tick["ask"]),
+            float(tick["askSize"]),
+            msg["ts"] * 1_000_000,
+        )
+        return None
+
+    def _on_depth(self, resp: dict[str, Any]) -> Optional[dict[str, str]]:
+        """Apply an order book update or snapshot, returning the request of a snapshot when out of sync."""
+        # example responses, the snapshot is requested over the same connection:
+        # {'ch': 'market.btcusdt.mbp.150', 'ts': 1654932129289, 'tick': {'seqNum': 100020146795, 'prevSeqNum': 100020146794, 'bids': [], 'asks': [[29342.99, 2.129672]]}}
+        # {'id': 'btcusdt', 'rep': 'market.btcusdt.mbp.150', 'status': 'ok', 'data': {'seqNum': 100020146794, 'bids': [[29342.98, 6.133091]], 'asks': [[29342.99, 0.5]]}}
+        if "tick" in resp:
+            symbol = resp["ch"].split(".")[1]
+            key = self.pairs[symbol]
+            tick = resp["tick"]
+            synced = self._apply_diff(
+                key,
+                tick["prevSeqNum"] + 1,
+                tick["seqNum"],
+                tick.get("bids", ()),
+                tick.get("asks", ()),
+                resp["ts"] * 1_000_000,
+            )
+        elif "rep" in resp:
+            symbol = resp["rep"].split(".")[1]
+            key = self.pairs[symbol]
+            self.requested.discard(symbol)
+            data = resp["data"]
+            synced = self._load_snapshot(
+                key, data["seqNum"], data["bids"], data["asks"]
+            )
+        else:
+            return None
+
+        if (not synced or not self.books[key].synced) and symbol not in self.requested:
+            self.requested.add(symbol)
+            return {"req": f"market.{symbol}.{self.channel}", "id": symbol}
+        return None
@@ -1,11 +1,43 @@
 import aiohttp
-import asyncio.exceptions
 import logging as log
-from datetime import datetime
-import json
 import time
+from typing import Any, Optional, TypedDict, Union
 
 from exchanges.base import BaseExchange
+from exchanges.catalog import SymbolCatalog
+from exchanges.connection import Connection, StreamError
+
+
+class _Ticker(TypedDict):
+    bestBid: str
+    bestBidSize: str
+    bestAsk: str
+    bestAskSize: str
+    time: int
+
+
+class TickerMessage(TypedDict):
+    type: str
+    topic: str
+    data: _Ticker
+
+
+class _Changes(TypedDict):
+    bids: list[list[str]]
+    asks: list[list[str]]
+
+
+class _Level2(TypedDict):
+    symbol: str
+    sequenceStart: int
+    sequenceEnd: int
+    changes: _Changes
+    time: int
+
+
+class Level2Message(TypedDict):
+    type: str
+    data: _Level2
 
 
 class KuCoin(BaseExchange):
@@ -14,134 +46,154 @@ class KuCoin(BaseExchange):
     """ Kucoin http api url  """
     api = "https://api.kucoin.com"
 
-    def __init__(self, pair: str) -> None:
-        super().__init__(pair.upper())
+    """ Fields read from the ticker messages """
+    schema = TickerMessage
+
+    """ Fields read from the level2 messages """
+    depth_schema = Level2Message
+
+    supports_depth = True
+
+    rest_snapshots = True
+
+    taker_fee = 0.001
+
+    notation = "-"
+
+    """ Maximum number of symbols kucoin accepts in a single topic """
+    max_topic_symbols = 100
+
+    """ KuCoin's first response is a welcome message {'id': 'YTlBdGSzpo', 'type': 'welcome'} """
+    welcome = True
+
+    def __init__(
+        self,
+        pairs: Union[str, list[str]],
+        session: Optional[aiohttp.ClientSession] = None,
+        catalog: Optional[SymbolCatalog] = None,
+        depth: bool = False,
+    ) -> None:
+        super().__init__(pairs, session, catalog, depth)
         log.info(f"{self.exchange} Initialized with {self.__dict__}")
 
-    async def _check_pair_exists(self) -> bool:
-        """Check if the pair is offered by KuCoin."""
-        url = f"{self.api}/api/v1/symbols"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as resp:
-                log.debug({"{self.exchange} _check_pair_exists response": resp})
-                resp = await resp.json()
-                for pairs in resp["data"]:
-                    if pairs["symbol"] == self.pair and pairs["enableTrading"] == True:
-                        log.info(
-                            f'{self.exchange} pair "{self.pair}" is offered. MONITORING {self.exchange}'
-                        )
-                        return True
-
-                    if pairs["symbol"] == self.pair and pairs["enableTrading"] == False:
-                        log.warning(
-                            f'{self.exchange} pair "{self.pair}" is currently disabled. NOT MONITORING {self.exchange}'
-                        )
-                        return False
-
-                log.warning(
-                    f'{self.exchange} pair "{self.pair}" is NOT offered. NOT MONITORING {self.exchange}'
-                )
-                return False
-
-    async def _subscribe(self, ws) -> bool:
-        await ws.send_str(
-            json.dumps(
-                {
-                    "id": time.time(),
-                    "type": "subscribe",
-                    "topic": f"/market/ticker:{self.pair}",
-                    "privateChannel": False,
-                    "response": True,
-                }
-            )
-        )
+    def _symbol(self, pair: str) -> str:
+        return pair.upper()
 
-        # kucoin's first response is a welcome message, the second response one gives indication if the connection is successful
-        # first response {'id': 'YTlBdGSzpo', 'type': 'welcome'}
-        # second response success {'id': '1654933542.5331', 'type': 'ack'}
-        # second response failure {'id': '1654933524.5110245', 'type': 'error', 'code': 404, 'data': 'topic /market/ticker:BTC-USD is not found'}
-        await ws.receive_json()
-        resp = await ws.receive_json()
-        if resp["type"] == "ack":
-            log.debug(f"{self.exchange} Subscribed to {self.pair}")
-            return True
+    async def _fetch_symbols(self) -> dict[str, dict[str, Any]]:
+        """Download all the symbols listed by KuCoin."""
 
-        log.warning(f"{self.exchange} Unable to subscribe {resp}")
-        return False
+        url = f"{self.api}/api/v1/symbols"
+        async with self.session.get(url) as resp:
+            log.debug(f"{self.exchange} _fetch_symbols response: {resp}")
+            resp = await resp.json()
+
+        # example symbol:
+        # {"symbol":"BTC-USDT","baseCurrency":"BTC","quoteCurrency":"USDT","enableTrading":true,...}
+        return {
+            symbol["symbol"]: {
+                "base": symbol["baseCurrency"],
+                "quote": symbol["quoteCurrency"],
+                "active": symbol["enableTrading"],
+            }
+            for symbol in resp["data"]
+        }
+
+    async def _fetch_snapshot(self, symbol: str) -> tuple[int, list, list]:
+        """Download the top 100 levels of the order book of symbol."""
+
+        url = f"{self.api}/api/v1/market/orderbook/level2_100"
+        async with self.session.get(url, params={"symbol": symbol}) as resp:
+            resp = await resp.json()
+
+        # example response:
+        # {"code":"200000","data":{"time":1663747970273,"sequence":"14103843","bids":[["18906","0.05"]],"asks":[["18906.1","0.1"]]}}
+        data = resp["data"]
+        return int(data["sequence"]), data["bids"], data["asks"]
+
+    def _subscriptions(self, symbols: list[str]) -> list[Any]:
+        # a single topic carries the tickers, or the order book changes, of up to max_topic_symbols symbols
+        topic = "/market/level2" if self.depth else "/market/ticker"
+        return [
+            {
+                "id": time.time(),
+                "type": "subscribe",
+                "topic": f"{topic}:{','.join(symbols[i : i + self.max_topic_symbols])}",
+                "privateChannel": False,
+                "response": True,
+            }
+            for i in range(0, len(symbols), self.max_topic_symbols)
+        ]
+
+    def _acknowledge(self, msg: Any, connection: Connection) -> Optional[bool]:
+        # each subscription's response gives indication if it's successful
+        # success {'id': '1654933542.5331', 'type': 'ack'}
+        # failure {'id': '1654933524.5110245', 'type': 'error', 'code': 404, 'data': 'topic /market/ticker:BTC-USD is not found'}
+        if msg["type"] == "ack":
+            return True
+        if msg["type"] == "error":
+            return False
+        return None
 
     # https://docs.kucoin.com/#apply-connect-token
     # 'make request as follows to obtain the server list and temporary public token'
     async def _get_api_ws_and_token(self):
         """Get the websocket url and the ping interval."""
         url = f"{self.api}/api/v1/bullet-public"
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url) as resp:
-                resp = await resp.json()
+        async with self.session.post(url) as resp:
+            resp = await resp.json()
 
-                if isinstance(resp, dict) and int(resp["code"]) == 200000:
-                    api_ws = resp["data"]["instanceServers"][0]["endpoint"]
-                    token = resp["data"]["token"]
+            if isinstance(resp, dict) and int(resp["code"]) == 200000:
+                api_ws = resp["data"]["instanceServers"][0]["endpoint"]
+                token = resp["data"]["token"]
 
-                    log.debug(f"{self.exchange} Kucoin ws url: {api_ws}?token={token}")
+                log.debug(f"{self.exchange} Kucoin ws url: {api_ws}?token={token}")
 
-                    return f"{api_ws}?token={token}"
+                return f"{api_ws}?token={token}"
 
-                log.warning(
-                    f"{self.exchange} Unable to get ws url and token. NOT MONITORING {self.exchange}"
-                )
-                return False
-
-    async def run(self) -> None:
-        """Fetch the price from KuCoin."""
-
-        # don't monitor the exchange if the pair isn't listed
-        if not await self._check_pair_exists():
+            log.warning(
+                f"{self.exchange} Unable to get ws url and token. NOT MONITORING {self.exchange}"
+            )
+            return False
+
+    async def _url(self, symbols: list[str]) -> str:
+        # every connection needs a fresh token
+        api_ws = await self._get_api_ws_and_token()
+        if not api_ws:
+            raise StreamError("No websocket url & token")
+        return api_ws
+
+    def _on_message(self, msg: dict[str, Any], connection: Connection) -> None:
+        # example response:
+        # {'type': 'message', 'topic': '/market/ticker:ETH-USDT', 'subject': 'trade.ticker', 'data': {'bestAsk': '1669.15', 'bestAskSize': '16.0276667', 'bestBid': '1669.14', 'bestBidSize': '5.1395149', 'price': '1669.15', 'sequence': '1629182000135', 'size': '0.0017103', 'time': 1654934466343}}
+        if msg["type"] != "message":
+            return
+        if self.depth:
+            self._on_depth(msg["data"])
             return
 
-        sub_retries = 0
-        max_sub_retries = 3
-        async with aiohttp.ClientSession() as session:
-            log.debug(f"{self.exchange} Created new client session.")
-            while True:
-                api_ws = await self._get_api_ws_and_token()
-
-                try:
-                    ws = await session.ws_connect(api_ws)
-                    log.debug(
-                        f"{self.exchange} Established a websocket connection towards {api_ws}"
-                    )
-                    sub_status = await self._subscribe(ws)
-                    if not sub_status and sub_retries <= max_sub_retries:
-                        sub_retries += 1
-                        await asyncio.sleep(3)
-                        continue
-                    if not sub_status and sub_retries > max_sub_retries:
-                        log.error(f"{self.exchange} Aborting due to too many subscription failures.")
-                        self.data = {}
-                        return
-                    elif sub_status:
-                        sub_retries = 0
-                    while True:
-                        try:
-                            # example response:
-                            # {'type': 'message', 'topic': '/market/ticker:ETH-USDT', 'subject': 'trade.ticker', 'data': {'bestAsk': '1669.15', 'bestAskSize': '16.0276667', 'bestBid': '1669.14', 'bestBidSize': '5.1395149', 'price': '1669.15', 'sequence': '1629182000135', 'size': '0.0017103', 'time': 1654934466343}}
-                            msg = await ws.receive_json()
-                            log.debug(f"{self.exchange} {msg}")
-                            self.data = {
-                                "price": float(msg["data"]["price"]),
-                                "time": datetime.utcfromtimestamp(
-                                    msg["data"]["time"] / 1000
-                                ).strftime("%Y/%m/%dT%H:%M:%S.%f"),
-                            }
-                        except (TypeError, asyncio.exceptions.TimeoutError) as e:
-                            log.debug(str(e))
-                            break
-                        except (asyncio.exceptions.CancelledError, KeyboardInterrupt):
-                            log.warning(
-                                f"{self.exchange} Interruption occurred. Exiting."
-                            )
-                            return
-                except BaseException as e:
-                    log.exception(e)
-                    await asyncio.sleep(0.3)
-                    continue
+        data = msg["data"]
+        self._update(
+            self.pairs[msg["topic"].split(":")[1]],
+            float(data["bestBid"]),
+            float(data["bestBidSize"]),
+            float(data["bestAsk"]),
+            float(data["bestAskSize"]),
+            data["time"] * 1_000_000,
+        )
+
+    def _on_depth(self, data: dict[str, Any]) -> None:
+        # example response, each change is [price, size, sequence] & a size of 0 removes the level:
+        # {'type': 'message', 'topic': '/market/level2:BTC-USDT', 'subject': 'trade.l2update', 'data': {'changes': {'asks': [['18906', '0.00331', '14103845']], 'bids': []}, 'sequenceEnd': 14103845, 'sequenceStart': 14103845, 'symbol': 'BTC-USDT', 'time': 1663747970273}}
+        symbol = data["symbol"]
+        key = self.pairs[symbol]
+        changes = data["changes"]
+        synced = self._apply_diff(
+            key,
+            data["sequenceStart"],
+            data["sequenceEnd"],
+            changes["bids"],
+            changes["asks"],
+            data["time"] * 1_000_000,
+        )
+        if not synced or not self.books[key].synced:
+            self._resync(symbol)
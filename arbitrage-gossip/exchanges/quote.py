@@ -0,0 +1,69 @@
+from datetime import datetime, timezone
+from time import time_ns
+from typing import Optional
+
+TIME_FORMAT = "%Y/%m/%dT%H:%M:%S.%f"
+
+
+def format_time(ns: int) -> str:
+    """Format a nanosecond unix timestamp as %Y/%m/%dT%H:%M:%S.%f (UTC)."""
+    return datetime.fromtimestamp(ns / 1e9, tz=timezone.utc).strftime(TIME_FORMAT)
+
+
+class Quote:
+    """Latest top of the book of a pair on an exchange.
+
+    A single record per pair is updated in place on every tick, the timestamps are
+    kept as integer nanoseconds and only formatted when displayed.
+    """
+
+    __slots__ = (
+        "bid",
+        "bid_size",
+        "ask",
+        "ask_size",
+        "exchange_time",
+        "receive_time",
+        "sequence",
+    )
+
+    def __init__(self) -> None:
+        """Best bid, the price the pair can be sold at right away"""
+        self.bid: float = 0.0
+
+        """Quantity available at the best bid, 0 when the exchange doesn't send it"""
+        self.bid_size: float = 0.0
+
+        """Best ask, the price the pair can be bought at right away"""
+        self.ask: float = 0.0
+
+        """Quantity available at the best ask, 0 when the exchange doesn't send it"""
+        self.ask_size: float = 0.0
+
+        """Update id of the quote, 0 when the exchange doesn't send one"""
+        self.sequence: int = 0
+
+        """When the exchange produced the price, nanoseconds since the epoch"""
+        self.exchange_time: int = 0
+
+        """When the price was received, nanoseconds since the epoch"""
+        self.receive_time: int = 0
+
+    @property
+    def mid(self) -> float:
+        """Halfway between the best bid and the best ask."""
+        return (self.bid + self.ask) / 2
+
+    @property
+    def time(self) -> str:
+        """The exchange time, formatted."""
+        return format_time(self.exchange_time)
+
+    def age(self, now: Optional[int] = None) -> int:
+        """Nanoseconds since the price was received."""
+        if now is None:
+            now = time_ns()
+        return now - self.receive_time
+
+    def __repr__(self) -> str:
+        return f"Quote(bid={self.bid}@{self.bid_size}, ask={self.ask}@{self.ask_size}, time={self.time})"
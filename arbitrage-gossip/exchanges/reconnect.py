@@ -0,0 +1,72 @@
+import asyncio
+import random
+from time import monotonic
+from typing import Optional
+
+from exchanges.health import LifetimeHistogram
+
+
+class Reconnect:
+    """Paces the (re)connections of a single websocket connection.
+
+    Failed attempts are retried after an exponential backoff with full jitter,
+    so that the connections of all the exchanges don't retry in lockstep. Once
+    subscribed, the backoff is reset and the connection is rotated before
+    max_lifetime seconds pass, ahead of the exchange dropping it.
+    """
+
+    def __init__(
+        self,
+        base: float = 0.3,
+        cap: float = 30.0,
+        max_lifetime: Optional[float] = None,
+        lifetimes: Optional[LifetimeHistogram] = None,
+    ) -> None:
+        """Upper bound of the first delay, in seconds"""
+        self.base = base
+
+        """Upper bound of any delay, in seconds"""
+        self.cap = cap
+
+        """Seconds after which an established connection gets rotated, None never rotates it"""
+        self.max_lifetime = max_lifetime
+
+        """Histogram the lifetime of each established connection is recorded in"""
+        self.lifetimes = lifetimes
+
+        """Attempts since the connection was last established"""
+        self.attempts = 0
+
+        """Monotonic time at which the connection was established"""
+        self.established_at: Optional[float] = None
+
+    def clone(self) -> "Reconnect":
+        """A pacer with the same settings, for another connection."""
+        return Reconnect(self.base, self.cap, self.max_lifetime, self.lifetimes)
+
+    def delay(self) -> float:
+        """Seconds to wait before the next attempt, 0 for the first one."""
+        if not self.attempts:
+            return 0.0
+        return random.uniform(0, min(self.cap, self.base * 2 ** (self.attempts - 1)))
+
+    async def wait(self) -> None:
+        """Wait before (re)connecting, recording how long the previous connection stayed up."""
+        if self.established_at is not None and self.lifetimes is not None:
+            self.lifetimes.record(monotonic() - self.established_at)
+        delay = self.delay()
+        self.attempts += 1
+        self.established_at = None
+        if delay:
+            await asyncio.sleep(delay)
+
+    def established(self) -> None:
+        """The connection is up & subscribed."""
+        self.attempts = 0
+        self.established_at = monotonic()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds until the connection has to be rotated, None if never."""
+        if self.max_lifetime is None or self.established_at is None:
+            return None
+        return max(0.0, self.established_at + self.max_lifetime - monotonic())
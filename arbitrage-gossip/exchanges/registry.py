@@ -0,0 +1,119 @@
+import aiohttp
+import argparse
+import importlib
+import logging as log
+from importlib.metadata import entry_points
+from typing import Any, Iterable, Optional
+
+from exchanges.base import BaseExchange
+from exchanges.catalog import SymbolCatalog
+
+# group of the entry points under which other packages register their exchanges, e.g. in their pyproject.toml
+#   [project.entry-points."arbitrage_gossip.exchanges"]
+#   kraken = "arbitrage_kraken:Kraken"
+ENTRY_POINTS = "arbitrage_gossip.exchanges"
+
+""" Exchanges shipped with the program, by name, as module:class so that only the enabled ones get imported
+ADAPTERS = {
+    "binance": "exchanges.binance:Binance",
+    }
+"""
+ADAPTERS: dict[str, str] = {
+    "binance": "exchanges.binance:Binance",
+    "ftx": "exchanges.ftx:FTX",
+    "bybit": "exchanges.bybit:ByBit",
+    "huobi": "exchanges.huobi:Huobi",
+    "kucoin": "exchanges.kucoin:KuCoin",
+    "bitfinex": "exchanges.bitfinex:Bitfinex",
+}
+
+""" Exchange classes imported so far, by name """
+_loaded: dict[str, type] = {}
+
+""" Whether the installed entry points were added to ADAPTERS """
+_discovered = False
+
+
+def register(name: str, target: str) -> None:
+    """Make an exchange available under name, target being the module:class implementing it."""
+    ADAPTERS[name.lower()] = target
+    _loaded.pop(name.lower(), None)
+
+
+def discover() -> None:
+    """Add the exchanges registered by the installed packages, without importing them.
+
+    The shipped exchanges keep their names, a package can't replace them.
+    """
+    global _discovered
+    if _discovered:
+        return
+    _discovered = True
+
+    for entry in entry_points(group=ENTRY_POINTS):
+        name = entry.name.lower()
+        if name in ADAPTERS:
+            log.warning(
+                f'Ignoring the exchange "{name}" of {entry.value}, already taken'
+            )
+            continue
+        ADAPTERS[name] = entry.value
+
+
+def names() -> list[str]:
+    """Names of all the available exchanges."""
+    discover()
+    return list(ADAPTERS)
+
+
+def load(name: str) -> Any:
+    """Import the class implementing the exchange called name, once.
+
+    Raises KeyError for an unknown exchange & ImportError when its module
+    can't be imported.
+    """
+    cls = _loaded.get(name)
+    if cls is not None:
+        return cls
+
+    discover()
+    module, _, attribute = ADAPTERS[name].partition(":")
+    try:
+        cls = getattr(importlib.import_module(module), attribute)
+    except AttributeError:
+        raise ImportError(f"{module} has no exchange {attribute}") from None
+    _loaded[name] = cls
+    return cls
+
+
+def create_exchanges(
+    pairs: dict[str, dict[str, Any]],
+    session: Optional[aiohttp.ClientSession],
+    catalog: SymbolCatalog,
+    args: argparse.Namespace,
+    names: Optional[Iterable[str]] = None,
+) -> dict[str, BaseExchange]:
+    """Initialize the enabled exchanges monitoring pairs, all of them unless only some are named.
+
+    Only the modules of these exchanges get imported, an exchange that can't
+    be imported is left out.
+    """
+    exchanges: dict[str, BaseExchange] = {}
+    for name in names or args.exchanges:
+        try:
+            cls = load(name)
+        except ImportError as e:
+            log.error(f"Unable to import the exchange {name}: {e}")
+            continue
+        exchanges[name] = cls(
+            [pair[cls.notation] for pair in pairs.values()],
+            session,
+            catalog,
+            args.depth,
+        )
+        exchanges[name].taker_fee = args.taker_fee.get(name, cls.taker_fee)
+        if name in args.endpoint:
+            exchanges[name].use_base_url(args.endpoint[name])
+        exchanges[name].standby = args.standby
+        exchanges[name].capture_dir = args.capture or None
+    return exchanges
@@ -0,0 +1,225 @@
+import aiohttp
+import asyncio
+from collections import deque
+from typing import Any, Iterable, Optional
+
+from exchanges.base import BaseExchange
+from exchanges.capture import Frame
+from exchanges.reconnect import Reconnect
+
+# rest responses the exchanges need before connecting, served by every replay session
+RESPONSES: dict[str, Any] = {
+    # kucoin hands out the websocket url & a token
+    "/api/v1/bullet-public": {
+        "code": "200000",
+        "data": {"instanceServers": [{"endpoint": "replay://kucoin"}], "token": ""},
+    },
+}
+
+
+class ReplayClock:
+    """Paces the replayed frames, shared by all the replayed exchanges.
+
+    At speed 1 the frames are delivered as far apart as they were received,
+    at speed 2 twice as fast, and so on. Speed 0 delivers them as fast as
+    possible, still yielding to the event loop between the frames.
+    """
+
+    def __init__(self, origin: int, speed: float = 0.0) -> None:
+        """Receive time of the first recorded frame, in nanoseconds"""
+        self.origin = origin
+
+        """Playback speed relative to the recording, 0 for as fast as possible"""
+        self.speed = speed
+
+        """Loop time at which the replay started"""
+        self.start: Optional[float] = None
+
+    async def wait(self, receive_time: int) -> None:
+        """Wait until a frame received at receive_time is due."""
+        if not self.speed:
+            await asyncio.sleep(0)
+            return
+
+        now = asyncio.get_running_loop().time()
+        if self.start is None:
+            self.start = now
+        delay = (receive_time - self.origin) / 1e9 / self.speed - (now - self.start)
+        await asyncio.sleep(max(delay, 0.0))
+
+
+class ReplayWebSocket:
+    """Delivers the recorded frames of a single connection."""
+
+    def __init__(
+        self, session: "ReplaySession", frames: list[Frame], clock: ReplayClock
+    ) -> None:
+        self.session = session
+        self.frames = frames
+        self.clock = clock
+
+        """Index of the next frame to deliver"""
+        self.position = 0
+
+        """Whatever the exchange sent, e.g. the subscriptions"""
+        self.sent: list[str] = []
+
+        self.closed = False
+
+    async def __aenter__(self) -> "ReplayWebSocket":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+
+    async def receive(self, timeout: Optional[float] = None) -> aiohttp.WSMessage:
+        """The next recorded frame, never returns once all of them were delivered."""
+        if self.position >= len(self.frames):
+            await self.close()
+            await asyncio.Event().wait()
+
+        frame = self.frames[self.position]
+        self.position += 1
+        await self.clock.wait(frame.receive_time)
+        self.session.delivered += 1
+        if isinstance(frame.data, bytes):
+            return aiohttp.WSMessage(aiohttp.WSMsgType.BINARY, frame.data, None)
+        return aiohttp.WSMessage(aiohttp.WSMsgType.TEXT, frame.data, None)
+
+    async def send_str(self, data: str) -> None:
+        self.sent.append(data)
+
+    async def close(self) -> bool:
+        if not self.closed:
+            self.closed = True
+            self.session._closed()
+        return True
+
+
+class ReplayResponse:
+    """A recorded rest response."""
+
+    def __init__(self, data: Any) -> None:
+        self.data = data
+
+    async def __aenter__(self) -> "ReplayResponse":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        ...
+
+    async def json(self) -> Any:
+        return self.data
+
+
+class ReplaySession:
+    """Stands in for an exchange's client session, serving a capture instead of connecting.
+
+    Each websocket connection the exchange opens gets the frames of the next
+    recorded connection, in the order they were recorded. The rest calls are
+    answered from RESPONSES, the others, e.g. order book snapshots, aren't
+    recorded and fail with a ClientError.
+    """
+
+    def __init__(self, frames: Iterable[Frame], clock: ReplayClock) -> None:
+        connections: dict[int, list[Frame]] = {}
+        for frame in frames:
+            connections.setdefault(frame.connection, []).append(frame)
+
+        """Recorded connections not yet opened"""
+        self.sockets = deque(
+            ReplayWebSocket(self, frames, clock) for frames in connections.values()
+        )
+
+        """Connections opened by the exchange"""
+        self.opened: list[ReplayWebSocket] = []
+
+        """Number of recorded frames"""
+        self.frames = sum(len(frames) for frames in connections.values())
+
+        """Number of frames delivered so far"""
+        self.delivered = 0
+
+        """Set once every recorded connection was closed, or ran out of frames"""
+        self.finished = asyncio.Event()
+        self._open = len(self.sockets)
+        if not self._open:
+            self.finished.set()
+
+        self.clock = clock
+
+    def _closed(self) -> None:
+        self._open -= 1
+        if self._open <= 0:
+            self.finished.set()
+
+    def ws_connect(self, url: str, **kwargs: Any) -> ReplayWebSocket:
+        if self.sockets:
+            ws = self.sockets.popleft()
+        else:
+            # nothing left to replay, the connection stays silent
+            ws = ReplayWebSocket(self, [], self.clock)
+            ws.closed = True
+        self.opened.append(ws)
+        return ws
+
+    def _request(self, url: str) -> ReplayResponse:
+        for path, data in RESPONSES.items():
+            if url.endswith(path):
+                return ReplayResponse(data)
+        raise aiohttp.ClientError(f"{url} wasn't recorded")
+
+    def get(self, url: str, **kwargs: Any) -> ReplayResponse:
+        return self._request(url)
+
+    def post(self, url: str, **kwargs: Any) -> ReplayResponse:
+        return self._request(url)
+
+    async def close(self) -> None:
+        ...
+
+
+def restore(cls: type[BaseExchange], metadata: dict[str, Any]) -> BaseExchange:
+    """Recreate the exchange a capture was recorded from, monitoring the same pairs."""
+    exchange = cls(list(metadata["pairs"].values()), depth=metadata["depth"])
+    exchange.pairs = dict(metadata["pairs"])
+    return exchange
+
+
+async def replay(
+    captures: dict[BaseExchange, Iterable[Frame]], speed: float = 0.0
+) -> dict[BaseExchange, ReplaySession]:
+    """Replay the captured frames through the exchanges' own connection loops.
+
+    The exchanges decode & handle the frames just like the ones received
+    live, pushing the ticks to their callbacks. Returns once every frame was
+    delivered, with the sessions the exchanges were replayed from.
+    """
+    frames = {exchange: list(captured) for exchange, captured in captures.items()}
+    origin = min(
+        (captured[0].receive_time for captured in frames.values() if captured),
+        default=0,
+    )
+    clock = ReplayClock(origin, speed)
+
+    sessions = {}
+    for exchange, captured in frames.items():
+        sessions[exchange] = exchange._session = ReplaySession(captured, clock)
+
+    tasks = [
+        asyncio.create_task(exchange._run_connection(Reconnect()))
+        for exchange in sessions
+    ]
+    try:
+        await asyncio.gather(
+            *(session.finished.wait() for session in sessions.values())
+        )
+    finally:
+        pending = tasks + [
+            task for exchange in sessions for task in exchange._snapshots.values()
+        ]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    return sessions
@@ -0,0 +1,72 @@
+from typing import Any
+
+import aiohttp
+
+
+class Session:
+    """Client session capping the rest calls per host, but not the websockets.
+
+    Each websocket holds a connection of its connector for as long as it
+    stays open, so on a capped connector the connections beyond the cap, e.g.
+    Bitfinex's once more than limit_per_host * max_channels pairs are
+    monitored, would wait forever in ws_connect & stall the rest calls to the
+    same host. The websockets get a session of their own, uncapped, instead.
+    """
+
+    def __init__(
+        self, rest: aiohttp.ClientSession, websockets: aiohttp.ClientSession
+    ) -> None:
+        """Session the rest calls are made with"""
+        self.rest = rest
+
+        """Session the websocket connections are opened with"""
+        self.websockets = websockets
+
+    def get(self, url: Any, **kwargs: Any) -> Any:
+        return self.rest.get(url, **kwargs)
+
+    def post(self, url: Any, **kwargs: Any) -> Any:
+        return self.rest.post(url, **kwargs)
+
+    def ws_connect(self, url: Any, **kwargs: Any) -> Any:
+        return self.websockets.ws_connect(url, **kwargs)
+
+    @property
+    def closed(self) -> bool:
+        return self.rest.closed
+
+    async def close(self) -> None:
+        await self.websockets.close()
+        await self.rest.close()
+
+
+def create_session(
+    limit: int = 100,
+    limit_per_host: int = 10,
+    keepalive_timeout: float = 60,
+    dns_cache_ttl: int = 300,
+) -> Session:
+    """Create the client session shared by all the exchanges.
+
+    Keeping the connections alive & caching the dns lookups saves the TLS
+    handshakes and the resolving on every rest call and websocket reconnect.
+    limit & limit_per_host only cap the rest calls, not the websockets.
+    Has to be called from within a running event loop.
+    """
+    rest = aiohttp.TCPConnector(
+        limit=limit,
+        limit_per_host=limit_per_host,
+        keepalive_timeout=keepalive_timeout,
+        ttl_dns_cache=dns_cache_ttl,
+        enable_cleanup_closed=True,
+    )
+    websockets = aiohttp.TCPConnector(
+        limit=0,
+        limit_per_host=0,
+        ttl_dns_cache=dns_cache_ttl,
+        enable_cleanup_closed=True,
+    )
+    return Session(
+        aiohttp.ClientSession(connector=rest),
+        aiohttp.ClientSession(connector=websockets),
+    )
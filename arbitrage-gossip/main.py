@@ -1,40 +1,67 @@
+import argparse
 import asyncio
 import sys
 import os
 import logging
 import dotenv
 from datetime import datetime
-from typing import Any
 
 # custom
 from utils.parser import parse_args
-from exchanges.base import BaseExchange
-from exchanges.binance import Binance
-from exchanges.ftx import FTX
-from exchanges.bybit import ByBit
-from exchanges.huobi import Huobi
-from exchanges.kucoin import KuCoin
-from exchanges.bitfinex import Bitfinex
+from utils.pairs import make_pair
+from utils import asynclog, hotlog, loop
+from utils.loop import LoopLag
+from utils.metrics import MetricsServer
+from exchanges import decoder, registry
+from exchanges.catalog import SymbolCatalog
+from exchanges.session import create_session
 
 from platforms.base import BasePlatform
 from platforms.twitter import Twitter
 
 from calculate import Calculate
 from notify import Notify
+from shard import Coordinator
+from store import TickStore
+from triangular import Triangular
+
+
+def setup_logging(args: argparse.Namespace) -> None:
+    """Log into the log file & the console through a background writer, so that a slow disk never blocks the prices."""
+    asynclog.start(
+        [
+            asynclog.file_handler(
+                args.log_file, args.log_max_size, args.log_rotate, args.log_backups
+            ),
+            asynclog.BatchedStreamHandler(),
+        ],
+        level=args.log_level,
+        fmt=args.log_format,
+        shared=bool(args.workers),
+    )
+    hotlog.sample_every = args.log_sample
 
 
 async def main() -> None:
     """Initialize each exchange's infinite loop."""
 
-    # initialize each exchange's class
-    exchanges: dict[str, BaseExchange] = {
-        "binance": Binance(pair=pair["merged"]),
-        "ftx": FTX(pair=pair["/"]),
-        "bybit": ByBit(pair=pair["merged"]),
-        "huobi": Huobi(pair=pair["merged"]),
-        "kucoin": KuCoin(pair=pair["-"]),
-        "bitfinex": Bitfinex(pair=pair["-"]),
-    }
+    decoder.use(args.json_decoder)
+    logging.info(f"Decoding the websocket messages with {decoder.name}")
+    logging.info(f"Running on the {loop.name} event loop")
+
+    # a single pooled client session & symbol catalog are shared by all the exchanges
+    session = create_session()
+    # the symbols listed by other servers aren't cached, so that they don't stand in for the real ones later on
+    catalog = SymbolCatalog(
+        path=args.symbols_cache, ttl=0 if args.endpoint else args.symbols_ttl
+    )
+
+    # initialize each exchange's class, a single instance monitors all the pairs
+    exchanges = registry.create_exchanges(pairs, session, catalog, args)
+    if not exchanges:
+        logging.error("None of the exchanges could be imported")
+        await session.close()
+        return
 
     # initialize each platform's class
     platforms: dict[str, BasePlatform] = {}
@@ -42,22 +69,65 @@ async def main() -> None:
         platforms["twitter"] = Twitter(args.cooldown)
 
     # initialize the class calculating the price differences
-    calculate: Calculate = Calculate(exchanges=exchanges)
+    calculate: Calculate = Calculate(exchanges=exchanges, max_age=args.max_age)
 
     # initialize the class responsible for notifying the platforms
     notify: Notify = Notify(
-        pair=pair, platforms=platforms, calculate=calculate, threshold=args.threshold
+        pairs=pairs,
+        platforms=platforms,
+        calculate=calculate,
+        threshold=args.threshold,
+        coalesce=args.coalesce,
     )
 
-    await asyncio.gather(
-        exchanges["binance"].run(),
-        exchanges["ftx"].run(),
-        exchanges["bybit"].run(),
-        exchanges["huobi"].run(),
-        exchanges["kucoin"].run(),
-        exchanges["bitfinex"].run(),
-        notify.run(),
-    )
+    # reports how long the feeds are stalled by blocking calls
+    lag = LoopLag()
+
+    # the optional services, running alongside the feeds
+    tasks = []
+
+    # searches the cycles of conversions across the quote assets, as the exchanges push their quotes
+    if args.cross_quotes:
+        triangular = Triangular(
+            pairs, exchanges, threshold=args.threshold, max_age=args.max_age
+        )
+        tasks.append(triangular.run())
+
+    # stores the quotes & the spreads, as the exchanges & notify push them
+    if args.store:
+        store = TickStore(args.store)
+        for exchange in exchanges.values():
+            exchange.register_callback(store.on_tick)
+        notify.register_callback(store.on_evaluation)
+        tasks.append(store.run())
+
+    # serves the metrics of the exchanges, notify & the event loop
+    if args.metrics_port:
+        server = MetricsServer(exchanges, notify, lag)
+        tasks.append(server.run(args.metrics_host, args.metrics_port))
+
+    try:
+        # download the symbols of all the exchanges at once, instead of one by one as each exchange starts,
+        # the workers then find them cached
+        await catalog.load(exchanges.values())
+
+        if args.workers:
+            # the feeds run in the worker processes, the exchanges of this one only hold the quotes they publish
+            feeds = [Coordinator(exchanges, pairs, args).run()]
+        else:
+            feeds = [exchange.run() for exchange in exchanges.values()]
+
+        await asyncio.gather(
+            *feeds,
+            notify.run(),
+            lag.run(),
+            *tasks,
+            *(platform.run() for platform in platforms.values()),
+        )
+    finally:
+        for exchange in exchanges.values():
+            await exchange.close()
+        await session.close()
 
 
 if __name__ == "__main__":
@@ -75,26 +145,16 @@ if __name__ == "__main__":
 
     # Different exchanges use different notations, for example
     # FTX uses ETH/USDT while Binance uses ETHUSDT
-    pair = {
-        "base": args.base.lower(),
-        "quote": args.quote.lower(),
-        "-": f"{args.base}-{args.quote}",
-        "/": f"{args.base}/{args.quote}",
-        "merged": f"{args.base}{args.quote}",
-    }
-
-    logging.basicConfig(
-        level=args.log_level,
-        format="%(asctime)s %(levelname)s %(message)s",
-        datefmt="%Y/%m/%dT%H:%M:%S",
-        handlers=[
-            logging.FileHandler(f"{args.log_file}"),
-            logging.StreamHandler(),
-        ],
-    )
+    pairs = {}
+    for base, quote in args.pairs:
+        pair = make_pair(base, quote)
+        pairs[pair["key"]] = pair
+
+    setup_logging(args)
 
     logging.info(f'STARTING. CMD: {" ".join(sys.argv)}')
     start = datetime.now()
+    loop.use(args.loop)
     try:
         asyncio.run(main())
     except (KeyboardInterrupt, asyncio.exceptions.CancelledError) as e:
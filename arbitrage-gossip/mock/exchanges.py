@@ -0,0 +1,680 @@
+import asyncio
+import gzip
+import json
+import logging as log
+import random
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Iterable, Optional, Union
+
+from aiohttp import WSMsgType, web
+
+Frame = Union[str, bytes]
+
+
+class MockExchange(ABC):
+    """A fake exchange streaming synthetic top of the book ticks.
+
+    Serves the rest calls & speaks the websocket handshake of the exchange
+    it mocks, so that the exchange's class can be pointed at it. Each
+    connection gets rate ticks per second, spread over its subscriptions.
+    The connections can be made to misbehave: dropped after disconnect_after
+    ticks, pinged every ping_interval seconds and sent a malformed frame
+    every malformed_every ticks. 0 disables each of them.
+    """
+
+    """ Name of the exchange class the server mocks """
+    name = ""
+
+    """ Paths of the websocket endpoints """
+    ws_paths: tuple[str, ...] = ()
+
+    def __init__(
+        self,
+        pairs: Iterable[tuple[str, str]],
+        rate: float = 10.0,
+        disconnect_after: int = 0,
+        ping_interval: float = 0.0,
+        malformed_every: int = 0,
+        seed: Optional[int] = None,
+    ) -> None:
+        """Listed symbols, in the exchange's notation, & their (base, quote) assets"""
+        self.symbols = {
+            self.symbol(base.upper(), quote.upper()): (base.upper(), quote.upper())
+            for base, quote in pairs
+        }
+
+        """Ticks sent per second over each connection"""
+        self.rate = rate
+
+        """Ticks after which a connection is dropped"""
+        self.disconnect_after = disconnect_after
+
+        """Seconds between the pings"""
+        self.ping_interval = ping_interval
+
+        """One in every malformed_every ticks is replaced by a malformed frame"""
+        self.malformed_every = malformed_every
+
+        """Mid price of each symbol, moving at random"""
+        self.random = random.Random(seed)
+        self.prices = {symbol: 100.0 for symbol in self.symbols}
+
+        """Connections accepted so far"""
+        self.connections = 0
+
+        """Ticks sent so far, over all the connections"""
+        self.ticks = 0
+
+        """Pongs received so far"""
+        self.pongs = 0
+
+        self._runner: Optional[web.AppRunner] = None
+
+    def symbol(self, base: str, quote: str) -> str:
+        """Notation of a pair on the exchange."""
+        return f"{base}{quote}".upper()
+
+    @abstractmethod
+    def listing(self) -> Any:
+        """Response of the rest call listing the symbols."""
+        ...
+
+    @abstractmethod
+    def routes(self) -> list[web.RouteDef]:
+        """The rest endpoints, the symbol listing at least."""
+        ...
+
+    def connected(self, request: web.Request, channels: list) -> list[Any]:
+        """Messages sent as soon as a connection is accepted, channels may be filled from the url."""
+        return []
+
+    def on_message(self, msg: Any, channels: list) -> list[Any]:
+        """Handle a message received from the client, returning the responses.
+
+        The subscriptions add their channel to channels, ticks are streamed
+        over the channels in a round robin.
+        """
+        return []
+
+    @abstractmethod
+    def tick(self, channel: Any, sequence: int) -> Any:
+        """A tick of channel."""
+        ...
+
+    def ping(self, channels: list) -> list[Any]:
+        """Application level pings, the exchanges without them get a websocket ping."""
+        return []
+
+    def encode(self, msg: Any) -> Frame:
+        return json.dumps(msg)
+
+    def malformed(self) -> Frame:
+        return '{"malformed": '
+
+    def quote(self, symbol: str) -> tuple[float, float, float, float]:
+        """Move the price of symbol, returning the (bid, bid size, ask, ask size) around it."""
+        price = self.prices[symbol] = self.prices[symbol] * (
+            1 + self.random.gauss(0, 1e-4)
+        )
+        spread = price * 5e-5
+        return (
+            round(price - spread, 6),
+            round(self.random.uniform(0.1, 10), 6),
+            round(price + spread, 6),
+            round(self.random.uniform(0.1, 10), 6),
+        )
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.add_routes(self.routes())
+        app.add_routes([web.get(path, self.websocket) for path in self.ws_paths])
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving, returns the base url, a free port is picked when port is 0."""
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        return f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def websocket(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(autoping=True)
+        await ws.prepare(request)
+        self.connections += 1
+
+        channels: list = []
+        for msg in self.connected(request, channels):
+            await self._send(ws, self.encode(msg))
+
+        streaming = asyncio.create_task(self._stream(ws, channels))
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                for response in self.on_message(json.loads(msg.data), channels):
+                    await self._send(ws, self.encode(response))
+        finally:
+            streaming.cancel()
+        return ws
+
+    async def _send(self, ws: web.WebSocketResponse, frame: Frame) -> None:
+        if isinstance(frame, bytes):
+            await ws.send_bytes(frame)
+        else:
+            await ws.send_str(frame)
+
+    async def _stream(
+        self, ws: web.WebSocketResponse, channels: list, pings: bool = True
+    ) -> None:
+        """Send the ticks at the configured rate, catching up in bursts when behind."""
+        loop = asyncio.get_running_loop()
+        interval = max(1 / self.rate, 0.001)
+        start = last_ping = loop.time()
+        sent = 0
+        try:
+            while not ws.closed:
+                now = loop.time()
+                if (
+                    pings
+                    and self.ping_interval
+                    and now - last_ping >= self.ping_interval
+                ):
+                    last_ping = now
+                    messages = self.ping(channels)
+                    if not messages:
+                        await ws.ping()
+                    for msg in messages:
+                        await self._send(ws, self.encode(msg))
+
+                if not channels:
+                    start = now
+                due = int((now - start) * self.rate) - sent if channels else 0
+                for _ in range(due):
+                    sent += 1
+                    self.ticks += 1
+                    if self.malformed_every and sent % self.malformed_every == 0:
+                        frame = self.malformed()
+                    else:
+                        # the sequence keeps increasing across the connections, like an update id
+                        frame = self.encode(
+                            self.tick(channels[sent % len(channels)], self.ticks)
+                        )
+                    await self._send(ws, frame)
+
+                    if self.disconnect_after and sent >= self.disconnect_after:
+                        log.info(f"Mock {self.name} dropping the connection")
+                        await ws.close()
+                        return
+                await asyncio.sleep(interval)
+        except ConnectionResetError:
+            return
+
+    def _pong(self, msg: Any) -> None:
+        self.pongs += 1
+
+
+def _ms() -> int:
+    return int(time.time() * 1000)
+
+
+class MockBinance(MockExchange):
+    """Combined book ticker streams, selected by the url, without any subscription."""
+
+    name = "Binance"
+    ws_paths = ("/stream",)
+
+    def symbol(self, base: str, quote: str) -> str:
+        return f"{base}{quote}".lower()
+
+    def routes(self) -> list[web.RouteDef]:
+        return [web.get("/api/v3/exchangeInfo", self._listing)]
+
+    async def _listing(self, request: web.Request) -> web.Response:
+        return web.json_response(self.listing())
+
+    def listing(self) -> Any:
+        return {
+            "symbols": [
+                {
+                    "symbol": symbol.upper(),
+                    "status": "TRADING",
+                    "baseAsset": base,
+                    "quoteAsset": quote,
+                }
+                for symbol, (base, quote) in self.symbols.items()
+            ]
+        }
+
+    def connected(self, request: web.Request, channels: list) -> list[Any]:
+        # ?streams=ethusdt@bookTicker/btcusdt@bookTicker
+        for stream in request.query.get("streams", "").split("/"):
+            symbol, _, kind = stream.partition("@")
+            if symbol in self.symbols and kind == "bookTicker":
+                channels.append(symbol)
+        return []
+
+    def tick(self, channel: str, sequence: int) -> Any:
+        bid, bid_size, ask, ask_size = self.quote(channel)
+        return {
+            "stream": f"{channel}@bookTicker",
+            "data": {
+                "u": sequence,
+                "s": channel.upper(),
+                "b": str(bid),
+                "B": str(bid_size),
+                "a": str(ask),
+                "A": str(ask_size),
+            },
+        }
+
+
+class MockFTX(MockExchange):
+    """Ticker channels, each subscription acknowledged separately."""
+
+    name = "FTX"
+    ws_paths = ("/ws",)
+
+    def symbol(self, base: str, quote: str) -> str:
+        return f"{base}/{quote}".upper()
+
+    def routes(self) -> list[web.RouteDef]:
+        return [web.get("/api/markets", self._listing)]
+
+    async def _listing(self, request: web.Request) -> web.Response:
+        return web.json_response(self.listing())
+
+    def listing(self) -> Any:
+        return {
+            "success": True,
+            "result": [
+                {
+                    "name": symbol,
+                    "type": "spot",
+                    "baseCurrency": base,
+                    "quoteCurrency": quote,
+                    "enabled": True,
+                }
+                for symbol, (base, quote) in self.symbols.items()
+            ],
+        }
+
+    def on_message(self, msg: Any, channels: list) -> list[Any]:
+        if msg.get("op") == "ping":
+            self._pong(msg)
+            return [{"type": "pong"}]
+        if msg.get("op") != "subscribe":
+            return []
+        market = msg.get("market")
+        if msg.get("channel") != "ticker" or market not in self.symbols:
+            return [{"type": "error", "code": 404, "msg": f"No such market: {market}"}]
+        channels.append(market)
+        return [{"type": "subscribed", "channel": "ticker", "market": market}]
+
+    def tick(self, channel: str, sequence: int) -> Any:
+        bid, bid_size, ask, ask_size = self.quote(channel)
+        return {
+            "channel": "ticker",
+            "market": channel,
+            "type": "update",
+            "data": {
+                "bid": bid,
+                "ask": ask,
+                "bidSize": bid_size,
+                "askSize": ask_size,
+                "last": bid,
+                "time": time.time(),
+            },
+        }
+
+
+class MockByBit(MockExchange):
+    """Spot book tickers, each subscription acknowledged separately."""
+
+    name = "ByBit"
+    ws_paths = ("/spot/quote/ws/v2",)
+
+    def routes(self) -> list[web.RouteDef]:
+        return [web.get("/spot/v1/symbols", self._listing)]
+
+    async def _listing(self, request: web.Request) -> web.Response:
+        return web.json_response(self.listing())
+
+    def listing(self) -> Any:
+        return {
+            "ret_code": 0,
+            "result": [
+                {
+                    "name": symbol,
+                    "alias": symbol,
+                    "baseCurrency": base,
+                    "quoteCurrency": quote,
+                    "showStatus": True,
+                }
+                for symbol, (base, quote) in self.symbols.items()
+            ],
+        }
+
+    def on_message(self, msg: Any, channels: list) -> list[Any]:
+        if "ping" in msg:
+            self._pong(msg)
+            return [{"pong": msg["ping"]}]
+        if msg.get("event") != "sub":
+            return []
+        symbol = msg.get("params", {}).get("symbol")
+        if msg.get("topic") != "bookTicker" or symbol not in self.symbols:
+            return [{"code": "-100010", "desc": "Invalid Symbols!"}]
+        channels.append(symbol)
+        return [
+            {
+                "topic": "bookTicker",
+                "event": "sub",
+                "params": {"symbol": symbol, "binary": "false", "symbolName": symbol},
+                "code": "0",
+                "msg": "Success",
+            }
+        ]
+
+    def tick(self, channel: str, sequence: int) -> Any:
+        bid, bid_size, ask, ask_size = self.quote(channel)
+        return {
+            "topic": "bookTicker",
+            "params": {"symbol": channel, "binary": "false", "symbolName": channel},
+            "data": {
+                "symbol": channel,
+                "bidPrice": str(bid),
+                "bidQty": str(bid_size),
+                "askPrice": str(ask),
+                "askQty": str(ask_size),
+                "time": _ms(),
+            },
+        }
+
+
+class MockHuobi(MockExchange):
+    """Gzip compressed tickers, with {"ping": ts} messages that have to be answered.
+
+    Like Huobi, the connections that leave two pings in a row unanswered are
+    dropped.
+    """
+
+    name = "Huobi"
+    ws_paths = ("/ws", "/feed")
+
+    """ Unanswered pings after which a connection is dropped """
+    max_unanswered = 2
+
+    def symbol(self, base: str, quote: str) -> str:
+        return f"{base}{quote}".lower()
+
+    def routes(self) -> list[web.RouteDef]:
+        return [web.get("/v2/settings/common/symbols/", self._listing)]
+
+    async def _listing(self, request: web.Request) -> web.Response:
+        return web.json_response(self.listing())
+
+    def listing(self) -> Any:
+        return {
+            "status": "ok",
+            "data": [
+                {
+                    "sc": symbol,
+                    "bc": base.lower(),
+                    "qc": quote.lower(),
+                    "state": "online",
+                }
+                for symbol, (base, quote) in self.symbols.items()
+            ],
+        }
+
+    async def websocket(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections += 1
+
+        channels: list = []
+        unanswered = 0
+
+        async def ping() -> None:
+            nonlocal unanswered
+            while not ws.closed:
+                await asyncio.sleep(self.ping_interval)
+                if unanswered >= self.max_unanswered:
+                    log.info(
+                        f"Mock {self.name} dropping a connection not answering pings"
+                    )
+                    await ws.close()
+                    return
+                unanswered += 1
+                await self._send(ws, self.encode({"ping": _ms()}))
+
+        tasks = [asyncio.create_task(self._stream(ws, channels, pings=False))]
+        if self.ping_interval:
+            tasks.append(asyncio.create_task(ping()))
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                msg = json.loads(msg.data)
+                if "pong" in msg:
+                    unanswered = 0
+                    self._pong(msg)
+                    continue
+                for response in self.on_message(msg, channels):
+                    await self._send(ws, self.encode(response))
+        finally:
+            for task in tasks:
+                task.cancel()
+        return ws
+
+    def encode(self, msg: Any) -> Frame:
+        return gzip.compress(json.dumps(msg).encode(), compresslevel=1)
+
+    def malformed(self) -> Frame:
+        return b"\x1f\x8b not quite gzip"
+
+    def on_message(self, msg: Any, channels: list) -> list[Any]:
+        channel = msg.get("sub")
+        if channel is None:
+            return []
+        _, symbol, kind = (channel.split(".", 2) + ["", ""])[:3]
+        if symbol not in self.symbols or kind != "ticker":
+            return [
+                {
+                    "status": "error",
+                    "ts": _ms(),
+                    "err-code": "bad-request",
+                    "err-msg": f"invalid topic {channel}",
+                }
+            ]
+        channels.append(symbol)
+        return [{"id": None, "status": "ok", "subbed": channel, "ts": _ms()}]
+
+    def tick(self, channel: str, sequence: int) -> Any:
+        bid, bid_size, ask, ask_size = self.quote(channel)
+        return {
+            "ch": f"market.{channel}.ticker",
+            "ts": _ms(),
+            "tick": {"bid": bid, "bidSize": bid_size, "ask": ask, "askSize": ask_size},
+        }
+
+
+class MockKuCoin(MockExchange):
+    """Ticker topics, reached through the public token handed out over rest."""
+
+    name = "KuCoin"
+    ws_paths = ("/endpoint",)
+
+    def symbol(self, base: str, quote: str) -> str:
+        return f"{base}-{quote}".upper()
+
+    def routes(self) -> list[web.RouteDef]:
+        return [
+            web.get("/api/v1/symbols", self._listing),
+            web.post("/api/v1/bullet-public", self._bullet),
+        ]
+
+    async def _listing(self, request: web.Request) -> web.Response:
+        return web.json_response(self.listing())
+
+    def listing(self) -> Any:
+        return {
+            "code": "200000",
+            "data": [
+                {
+                    "symbol": symbol,
+                    "baseCurrency": base,
+                    "quoteCurrency": quote,
+                    "enableTrading": True,
+                }
+                for symbol, (base, quote) in self.symbols.items()
+            ],
+        }
+
+    async def _bullet(self, request: web.Request) -> web.Response:
+        endpoint = request.url.with_scheme("ws").with_path("/endpoint").with_query({})
+        return web.json_response(
+            {
+                "code": "200000",
+                "data": {
+                    "token": "mock",
+                    "instanceServers": [
+                        {
+                            "endpoint": str(endpoint),
+                            "protocol": "websocket",
+                            "pingInterval": 18000,
+                            "pingTimeout": 10000,
+                        }
+                    ],
+                },
+            }
+        )
+
+    def connected(self, request: web.Request, channels: list) -> list[Any]:
+        return [{"id": "mock", "type": "welcome"}]
+
+    def on_message(self, msg: Any, channels: list) -> list[Any]:
+        if msg.get("type") == "ping":
+            self._pong(msg)
+            return [{"id": msg.get("id"), "type": "pong"}]
+        if msg.get("type") != "subscribe":
+            return []
+        topic, _, symbols = msg.get("topic", "").partition(":")
+        symbols = symbols.split(",")
+        if topic != "/market/ticker" or not all(s in self.symbols for s in symbols):
+            return [
+                {
+                    "id": msg.get("id"),
+                    "type": "error",
+                    "code": 404,
+                    "data": f"topic {msg.get('topic')} is not found",
+                }
+            ]
+        channels.extend(symbols)
+        return [{"id": msg.get("id"), "type": "ack"}]
+
+    def tick(self, channel: str, sequence: int) -> Any:
+        bid, bid_size, ask, ask_size = self.quote(channel)
+        return {
+            "type": "message",
+            "topic": f"/market/ticker:{channel}",
+            "subject": "trade.ticker",
+            "data": {
+                "bestAsk": str(ask),
+                "bestAskSize": str(ask_size),
+                "bestBid": str(bid),
+                "bestBidSize": str(bid_size),
+                "price": str(bid),
+                "sequence": str(sequence),
+                "size": "0.1",
+                "time": _ms(),
+            },
+        }
+
+
+class MockBitfinex(MockExchange):
+    """Ticker channels, identified by the chanId prefixing each array."""
+
+    name = "Bitfinex"
+    ws_paths = ("/ws/2",)
+
+    def symbol(self, base: str, quote: str) -> str:
+        # bitfinex notes USDT as UST
+        base, quote = (
+            "UST" if asset.upper() == "USDT" else asset.upper()
+            for asset in (base, quote)
+        )
+        if len(base) == 3 and len(quote) == 3:
+            return f"{base}{quote}"
+        return f"{base}:{quote}"
+
+    def routes(self) -> list[web.RouteDef]:
+        return [web.get("/v2/conf/pub:list:pair:exchange", self._listing)]
+
+    async def _listing(self, request: web.Request) -> web.Response:
+        return web.json_response(self.listing())
+
+    def listing(self) -> Any:
+        return [list(self.symbols)]
+
+    def connected(self, request: web.Request, channels: list) -> list[Any]:
+        return [{"event": "info", "version": 2, "platform": {"status": 1}}]
+
+    def on_message(self, msg: Any, channels: list) -> list[Any]:
+        if msg.get("event") == "ping":
+            self._pong(msg)
+            return [{"event": "pong", "cid": msg.get("cid")}]
+        if msg.get("event") == "conf":
+            return [{"event": "conf", "status": "OK", "flags": msg.get("flags")}]
+        if msg.get("event") != "subscribe":
+            return []
+        pair = msg.get("symbol", "").removeprefix("t")
+        if msg.get("channel") != "ticker" or pair not in self.symbols:
+            return [
+                {
+                    "event": "error",
+                    "channel": msg.get("channel"),
+                    "symbol": msg.get("symbol"),
+                    "msg": "symbol: invalid",
+                    "code": 10300,
+                    "pair": pair,
+                }
+            ]
+        chan_id = 100000 + self.connections * 1000 + len(channels)
+        channels.append((chan_id, pair))
+        return [
+            {
+                "event": "subscribed",
+                "channel": "ticker",
+                "chanId": chan_id,
+                "symbol": f"t{pair}",
+                "pair": pair,
+            }
+        ]
+
+    def ping(self, channels: list) -> list[Any]:
+        # heartbeats on every channel
+        return [[chan_id, "hb"] for chan_id, _ in channels]
+
+    def tick(self, channel: tuple[int, str], sequence: int) -> Any:
+        chan_id, pair = channel
+        bid, bid_size, ask, ask_size = self.quote(pair)
+        return [chan_id, [bid, bid_size, ask, ask_size, 0, 0, bid, 1000, ask, bid]]
+
+
+"""Mock of each exchange, by the name used on the command line"""
+MOCKS: dict[str, type[MockExchange]] = {
+    "binance": MockBinance,
+    "ftx": MockFTX,
+    "bybit": MockByBit,
+    "huobi": MockHuobi,
+    "kucoin": MockKuCoin,
+    "bitfinex": MockBitfinex,
+}
@@ -0,0 +1,101 @@
+"""Serves mock exchanges streaming synthetic ticks, for testing without the network.
+
+Usage: python mock/server.py [--exchanges binance,huobi,...] [--pairs btc/usdt,eth/usdt] [--rate 10000]
+
+Prints the --endpoint argument pointing main.py at the mock exchanges.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from mock.exchanges import MOCKS, MockExchange
+from utils.pairs import parse_pair
+
+
+async def serve(mocks: dict[str, MockExchange], host: str, port: int) -> None:
+    """Serve each mock exchange on its own port, from port onwards."""
+    urls = {}
+    for i, (name, mock) in enumerate(mocks.items()):
+        urls[name] = await mock.start(host, port + i if port else 0)
+        logging.info(f"Mock {mock.name} listening on {urls[name]}")
+
+    print("--endpoint " + ",".join(f"{name}={url}" for name, url in urls.items()))
+    try:
+        while True:
+            await asyncio.sleep(10)
+            logging.info(
+                ", ".join(
+                    f"{mock.name}: {mock.connections} connections, {mock.ticks} ticks, {mock.pongs} pongs"
+                    for mock in mocks.values()
+                )
+            )
+    finally:
+        for mock in mocks.values():
+            await mock.stop()
+
+
+if __name__ == "__main__":
+    argsparse = argparse.ArgumentParser("Mock exchanges")
+    argsparse.add_argument(
+        "--exchanges",
+        type=str,
+        default=",".join(MOCKS),
+        help="Comma separated list of the exchanges to mock, defaults to all of them",
+    )
+    argsparse.add_argument("--pairs", type=str, default="btc/usdt,eth/usdt")
+    argsparse.add_argument("--host", type=str, default="127.0.0.1")
+    argsparse.add_argument(
+        "--port",
+        type=int,
+        default=0,
+        help="Port of the first exchange, the next ones are served on the following ports. Defaults to 0, free ports",
+    )
+    argsparse.add_argument(
+        "--rate", type=float, default=10.0, help="Ticks per second per connection"
+    )
+    argsparse.add_argument(
+        "--disconnect-after",
+        type=int,
+        default=0,
+        help="Drop each connection after this many ticks, 0 never does",
+    )
+    argsparse.add_argument(
+        "--ping-interval",
+        type=float,
+        default=0.0,
+        help="Seconds between the pings, 0 never pings",
+    )
+    argsparse.add_argument(
+        "--malformed-every",
+        type=int,
+        default=0,
+        help="Replace one in every this many ticks by a malformed frame, 0 never does",
+    )
+    argsparse.add_argument("--seed", type=int, default=None)
+    args = argsparse.parse_args()
+
+    pairs = [parse_pair(pair) for pair in args.pairs.split(",") if pair.strip()]
+    mocks = {}
+    for name in args.exchanges.split(","):
+        name = name.strip().lower()
+        if name not in MOCKS:
+            sys.exit(f"Unknown exchange '{name}', available: {list(MOCKS)}")
+        mocks[name] = MOCKS[name](
+            pairs,
+            rate=args.rate,
+            disconnect_after=args.disconnect_after,
+            ping_interval=args.ping_interval,
+            malformed_every=args.malformed_every,
+            seed=args.seed,
+        )
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    try:
+        asyncio.run(serve(mocks, args.host, args.port))
+    except KeyboardInterrupt:
+        ...
@@ -3,9 +3,11 @@ import logging as log
 import os
 import signal
 import time
-from typing import Any
+from typing import Any, Callable
 
+from exchanges.quote import format_time
 from platforms.base import BasePlatform
+from utils.metrics import Histogram
 from calculate import Calculate
 
 
@@ -14,13 +16,15 @@ class Notify:
 
     def __init__(
         self,
-        pair: dict[str, Any],
+        pairs: dict[str, dict[str, Any]],
         calculate: Calculate,
         platforms: dict[str, BasePlatform],
         threshold: float,
+        coalesce: float = 0,
+        log_interval: float = 1.0,
     ) -> None:
-        """The monitored pair"""
-        self.pair = pair
+        """The monitored pairs, keyed by pair key"""
+        self.pairs = pairs
 
         """Object through which the arbitrage opportunity is calculated"""
         self.calculate = calculate
@@ -31,45 +35,135 @@ class Notify:
         """Threshold for the arbitrage monitor"""
         self.threshold = threshold
 
+        """Seconds during which consecutive ticks are evaluated together"""
+        self.coalesce = coalesce
+
+        """Seconds between the logged evaluations of a pair, spreads crossing the threshold are logged right away"""
+        self.log_interval = log_interval
+
+        """When the evaluation of each pair was last logged, its prices then & whether they were over the threshold"""
+        self.last_logged: dict[str, tuple[float, tuple, bool]] = {}
+
+        """Seconds spent evaluating a pair, from its prices to notifying the platforms"""
+        self.evaluation = Histogram()
+
+        """Latest price difference in % of each pair"""
+        self.spreads: dict[str, float] = {}
+
+        """Functions called with the pair key, its best prices & the price difference in % on every evaluation"""
+        self.callbacks: list[Callable[[str, dict[str, Any], float], None]] = []
+
+    def register_callback(
+        self, callback: Callable[[str, dict[str, Any], float], None]
+    ) -> None:
+        """Register a function to be called on every evaluation."""
+        self.callbacks.append(callback)
+
     async def run(self) -> None:
         # give the other concurrent functions time to fetch initial websocket data,
         # then begin calculating prices & notifying platforms
         await asyncio.sleep(10)
 
-        prices = await self.calculate.latest_prices()
+        monitored = 0
+        for key in self.pairs:
+            if await self.calculate.latest_prices(key) == False:
+                log.warning(f"Less than two exchanges are offering {key}.")
+            else:
+                monitored += 1
 
-        if prices == False:
+        if not monitored:
             log.error("No prices found")
             os.kill(os.getpid(), signal.SIGTERM)
 
         while True:
-            prices = await self.calculate.latest_prices()
-            price_diff = prices["max"]["price"] - prices["min"]["price"]
-            price_diff_perc = await self.calculate.percentage_change(
-                prices["max"]["price"], prices["min"]["price"]
+            # re-evaluate the spreads only when an exchange pushes a new price,
+            # and only for the pairs whose prices changed
+            for key in await self.calculate.wait_for_tick(self.coalesce):
+                await self.evaluate(key)
+
+    async def evaluate(self, key: str) -> None:
+        """Evaluate the latest price difference of a pair and notify the platforms."""
+        start = time.perf_counter()
+        try:
+            await self._evaluate(key)
+        finally:
+            self.evaluation.observe(time.perf_counter() - start)
+
+    async def _evaluate(self, key: str) -> None:
+        prices = await self.calculate.latest_prices(key)
+        if prices == False:
+            return
+
+        price_diff = prices["max"]["price"] - prices["min"]["price"]
+        price_diff_perc = await self.calculate.percentage_change(
+            prices["max"]["price"], prices["min"]["price"]
+        )
+        self.spreads[key] = price_diff_perc
+        for callback in self.callbacks:
+            callback(key, prices, price_diff_perc)
+
+        current = (
+            prices["max"]["exchange"],
+            prices["max"]["price"],
+            prices["min"]["exchange"],
+            prices["min"]["price"],
+        )
+        changed = log.getLogger().isEnabledFor(log.INFO) and self._log_due(
+            key, current, price_diff_perc >= self.threshold
+        )
+        if changed:
+            log.info("Highest bid %s", self._readable(prices["max"]))
+            log.info("Lowest ask %s", self._readable(prices["min"]))
+            log.info("Price difference %s", price_diff)
+            log.info("Price difference in %% %s", price_diff_perc)
+
+        # walking the order books is only worth it when it gets logged or reported
+        current_time = time.time()
+        due = []
+        for obj in self.platforms.values():
+            if obj.cooldown + obj.last_reported < current_time:
+                due.append(obj)
+            elif price_diff_perc >= self.threshold:
+                obj.suppressed += 1
+        if not changed and not due:
+            return
+
+        opportunity = await self.calculate.executable(key)
+        if opportunity == False:
+            return
+        if changed:
+            log.info(
+                "Executable size %s, buying at %s & selling at %s, profit after fees %s (%s%%)",
+                opportunity["size"],
+                opportunity["buy_vwap"],
+                opportunity["sell_vwap"],
+                opportunity["profit"],
+                opportunity["price_diff_perc"],
             )
 
-            log.info(f"Highest price {prices['max']}")
-            log.info(f"Lowest price {prices['min']}")
-            log.info(f"Price difference {price_diff}")
-            log.info(f"Price difference in % {price_diff_perc}")
-
-            # notify the platforms
-            for platform, obj in self.platforms.items():
-                current_time = time.time()
-
-                if (
-                    obj.cooldown + obj.last_reported < current_time
-                    and price_diff_perc >= self.threshold
-                ):
-                    await obj.notify(
-                        self.pair,
-                        {
-                            "max": prices["max"],
-                            "min": prices["min"],
-                            "price_diff": price_diff,
-                            "price_diff_perc": price_diff_perc,
-                        },
-                    )
-
-            await asyncio.sleep(1)
+        # notify the platforms about the size that can be traded at a profit, rather than the headline spread
+        if opportunity["price_diff_perc"] >= self.threshold:
+            for obj in due:
+                # only queued here, the platform delivers it in the background
+                obj.notify(self.pairs[key], opportunity)
+
+    def _log_due(self, key: str, current: tuple, above: bool) -> bool:
+        """Whether to log the evaluation of a pair, at most every log_interval seconds unless it crossed the threshold."""
+        now = time.monotonic()
+        last = self.last_logged.get(key)
+        if last is not None:
+            logged_at, logged, was_above = last
+            if current == logged:
+                return False
+            if above == was_above and now - logged_at < self.log_interval:
+                return False
+        self.last_logged[key] = (now, current, above)
+        return True
+
+    def _readable(self, price: dict[str, Any]) -> dict[str, Any]:
+        """Format the nanosecond timestamps of a price."""
+        return {
+            **price,
+            "time": format_time(price["time"]),
+            "received": format_time(price["received"]),
+        }
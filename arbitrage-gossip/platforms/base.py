@@ -1,6 +1,13 @@
+import asyncio
+import logging as log
 import os
+import time
 import dotenv
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from utils.metrics import DELIVERY_BUCKETS, Histogram
 
 
 class BasePlatform(ABC):
@@ -8,11 +15,14 @@ class BasePlatform(ABC):
 
     Abstract class representing all the methods that
     have to be implemented by each notified platform(subclass).
+
+    Notifications are queued and delivered by run() in a worker thread, so that a
+    slow or rate limited platform never blocks the event loop and the price feeds.
     """
 
-    def __init__(self, cooldown: float) -> None:
+    def __init__(self, cooldown: float, queue_size: int = 16) -> None:
         """The time of the last report"""
-        self.last_reported: int = 0
+        self.last_reported: float = 0
 
         """Report to the platform every cooldown seconds"""
         self.cooldown = cooldown
@@ -20,7 +30,58 @@ class BasePlatform(ABC):
         """ The platform's name """
         self.platform = self.__class__.__name__
 
+        """ Notifications waiting to be delivered, the oldest is dropped when full """
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+        """ Number of notifications dropped because the queue was full """
+        self.dropped = 0
+
+        """ Seconds between queueing & delivering the notifications, counted since the start """
+        self.delivery = Histogram(DELIVERY_BUCKETS)
+
+        """ Number of notifications queued """
+        self.notified = 0
+
+        """ Number of evaluations over the threshold left out because of the cooldown """
+        self.suppressed = 0
+
+        """ Single worker thread delivering the notifications in order """
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=self.platform
+        )
+
+    def notify(self, pair: dict[str, Any], prices: dict[str, Any]) -> None:
+        """Queue a notification about a discrepancy, never blocks."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            log.warning(
+                f"{self.platform} Delivery is falling behind, dropped the oldest notification. {self.dropped} dropped so far."
+            )
+
+        self.queue.put_nowait((time.monotonic(), pair, prices))
+        self.notified += 1
+        # the cooldown starts once queued, so that the following ticks don't queue the same discrepancy again
+        self.last_reported = time.time()
+
+    async def run(self) -> None:
+        """Deliver the queued notifications, one at a time, off the event loop."""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                queued, pair, prices = await self.queue.get()
+                try:
+                    await loop.run_in_executor(self.executor, self.send, pair, prices)
+                except Exception as e:
+                    log.exception(e)
+
+                latency = time.monotonic() - queued
+                self.delivery.observe(latency)
+                log.debug(f"{self.platform} Delivered a notification in {latency:.3f}s")
+        finally:
+            self.executor.shutdown(wait=False)
+
     @abstractmethod
-    async def notify(self) -> bool:
-        """Notify the platform when discrepancy occurs."""
+    def send(self, pair: dict[str, Any], prices: dict[str, Any]) -> bool:
+        """Notify the platform when discrepancy occurs, blocking - called from a worker thread."""
         ...
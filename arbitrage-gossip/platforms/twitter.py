@@ -3,7 +3,6 @@ import tweepy.errors
 import os
 import sys
 import logging
-import time
 from typing import Any
 
 from platforms.base import BasePlatform
@@ -49,14 +48,15 @@ class Twitter(BasePlatform):
             logging.error(e)
             sys.exit(1)
 
-    async def notify(self, pair: str, prices: dict[str, Any]) -> bool:
+    def send(self, pair: dict[str, Any], prices: dict[str, Any]) -> bool:
         """Notify the twitter platform."""
 
         tweet = f"""🏃🏃🏃🏃🏃
 PAIR: #{pair['merged'].upper()}\n
-Exchange with lowest price(#{prices['min']['exchange']}):  {prices['min']['price']}
-Exchange with highest price(#{prices['max']['exchange']}): {prices['max']['price']}
-Price Difference: {prices['price_diff']} 
+Buy on #{prices['min']['exchange']} at:  {prices['buy_vwap']}
+Sell on #{prices['max']['exchange']} at: {prices['sell_vwap']}
+Executable Size: {prices['size']} {pair['base'].upper()}
+Profit After Fees: {prices['profit']} {pair['quote'].upper()}
 Price Difference In %: {prices['price_diff_perc']}
 🏃🏃🏃🏃🏃
 
@@ -69,7 +69,7 @@ Price Difference In %: {prices['price_diff_perc']}
             logging.info(
                 f"Notified Twitter App with the following data:\nHighest: {prices['max']}\nLowest:{[prices['min']]}"
             )
-            self.last_reported = time.time()
             return True
         except tweepy.errors.TweepyException as e:
             logging.error(f"{self.platform} {str(e)}")
+            return False
@@ -0,0 +1,261 @@
+import argparse
+import asyncio
+import logging as log
+import multiprocessing
+from time import monotonic_ns
+from typing import Any
+
+from exchanges import decoder
+from exchanges.base import BaseExchange
+from exchanges.catalog import SymbolCatalog
+from exchanges.registry import create_exchanges
+from exchanges.session import create_session
+from utils import asynclog, hotlog, loop
+from utils.loop import LoopLag
+from utils.ring import HEARTBEAT, QUOTE, QuoteRing
+
+# seconds between the heartbeats of the workers, keeping the exchanges live in the coordinator while no quote changes
+HEARTBEAT_INTERVAL = 0.5
+
+# seconds the coordinator sleeps once all the rings are drained, doubled while they stay empty up to IDLE_SLEEP_MAX
+IDLE_SLEEP = 0.0005
+IDLE_SLEEP_MAX = 0.02
+
+# records drained from a ring at once, before yielding to the event loop
+DRAIN_LIMIT = 4096
+
+
+def shards(
+    names: list[str], keys: list[str], workers: int
+) -> list[dict[str, list[str]]]:
+    """Deal the (exchange, pair) subscriptions round robin to the workers.
+
+    Returns the pair keys each worker subscribes to, per exchange name. Each
+    pair of an exchange goes to the next worker, so that the busy exchanges
+    are spread across all of them.
+    """
+    assigned: list[dict[str, list[str]]] = [{} for _ in range(workers)]
+    subscriptions = [(name, key) for name in names for key in keys]
+    for i, (name, key) in enumerate(subscriptions):
+        assigned[i % workers].setdefault(name, []).append(key)
+    return [shard for shard in assigned if shard]
+
+
+def run_worker(
+    index: int,
+    ring_name: str,
+    shard: dict[str, list[str]],
+    names: list[str],
+    keys: list[str],
+    pairs: dict[str, dict[str, Any]],
+    args: argparse.Namespace,
+    log_queue: Any = None,
+) -> None:
+    """Entry point of a worker process, streaming its shard of the subscriptions into the ring."""
+    # the records are written by the coordinator, which owns the log file
+    if log_queue is not None:
+        asynclog.forward(log_queue, args.log_level)
+    hotlog.sample_every = args.log_sample
+    decoder.use(args.json_decoder)
+    loop.use(args.loop)
+    try:
+        asyncio.run(_work(index, ring_name, shard, names, keys, pairs, args))
+    except KeyboardInterrupt:
+        ...
+
+
+async def _work(
+    index: int,
+    ring_name: str,
+    shard: dict[str, list[str]],
+    names: list[str],
+    keys: list[str],
+    pairs: dict[str, dict[str, Any]],
+    args: argparse.Namespace,
+) -> None:
+    ring = QuoteRing.attach(ring_name)
+    session = create_session()
+    catalog = SymbolCatalog(
+        path=args.symbols_cache, ttl=0 if args.endpoint else args.symbols_ttl
+    )
+
+    exchanges: dict[str, BaseExchange] = {}
+    for name, shard_keys in shard.items():
+        exchanges.update(
+            create_exchanges(
+                {key: pairs[key] for key in shard_keys}, session, catalog, args, [name]
+            )
+        )
+    exchange_index = {exchanges[name]: names.index(name) for name in exchanges}
+    key_index = {key: i for i, key in enumerate(keys)}
+
+    def publish(exchange: BaseExchange, key: str) -> None:
+        quote = exchange.data[key]
+        ring.push(
+            QUOTE,
+            exchange_index[exchange],
+            key_index[key],
+            quote.bid,
+            quote.bid_size,
+            quote.ask,
+            quote.ask_size,
+            quote.exchange_time,
+            quote.receive_time,
+            quote.sequence,
+        )
+
+    async def heartbeat() -> None:
+        """Tell the coordinator the exchanges are still alive, even when no quote changes."""
+        alive = {exchange: 0 for exchange in exchange_index}
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            for exchange, i in exchange_index.items():
+                if exchange.health.last_alive != alive[exchange]:
+                    alive[exchange] = exchange.health.last_alive
+                    ring.push(HEARTBEAT, i, 0)
+
+    for exchange in exchanges.values():
+        exchange.register_callback(publish)
+
+    log.info(
+        f"Worker {index} streaming "
+        + ", ".join(f"{name} {keys}" for name, keys in shard.items())
+    )
+    try:
+        await catalog.load(exchanges.values())
+        await asyncio.gather(
+            heartbeat(),
+            LoopLag(label=f"Worker {index} event loop").run(),
+            *(exchange.run() for exchange in exchanges.values()),
+        )
+    finally:
+        for exchange in exchanges.values():
+            await exchange.close()
+        await session.close()
+        if ring.dropped:
+            log.warning(
+                f"Worker {index} dropped {ring.dropped} quotes, the ring was full"
+            )
+        ring.close()
+
+
+class Coordinator:
+    """Streams the exchanges in worker processes, storing their quotes in this process' exchanges.
+
+    Each worker owns a shard of the (exchange, pair) subscriptions & publishes
+    the quotes it receives as fixed size records into its own shared memory
+    ring. The coordinator drains the rings into the exchanges it was given,
+    whose callbacks, e.g. Calculate's, then run as if the quotes were
+    received here.
+    """
+
+    def __init__(
+        self,
+        exchanges: dict[str, BaseExchange],
+        pairs: dict[str, dict[str, Any]],
+        args: argparse.Namespace,
+    ) -> None:
+        """Exchanges the quotes are stored in, by name"""
+        self.exchanges = exchanges
+
+        self.pairs = pairs
+        self.args = args
+
+        self._names = list(exchanges)
+        self._keys = list(pairs)
+
+        """Subscriptions of each worker, per exchange name"""
+        self.shards = shards(self._names, self._keys, args.workers)
+
+        """Ring each worker publishes into, created & unlinked by the coordinator"""
+        self.rings: list[QuoteRing] = []
+
+        self.processes: list[multiprocessing.Process] = []
+
+        # the workers start from a fresh interpreter rather than a copy of this process' event loop
+        self._context = multiprocessing.get_context("spawn")
+
+    def _spawn(self, index: int) -> multiprocessing.Process:
+        process = self._context.Process(
+            target=run_worker,
+            args=(
+                index,
+                self.rings[index].name,
+                self.shards[index],
+                self._names,
+                self._keys,
+                self.pairs,
+                self.args,
+                asynclog.log_queue,
+            ),
+            name=f"arbitrage-gossip-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def drain(self, ring: QuoteRing) -> int:
+        """Store the records published into ring, returns how many there were."""
+        records = ring.pop(DRAIN_LIMIT)
+        now = monotonic_ns()
+        for (
+            kind,
+            exchange_index,
+            key_index,
+            bid,
+            bid_size,
+            ask,
+            ask_size,
+            exchange_time,
+            receive_time,
+            sequence,
+        ) in records:
+            exchange = self.exchanges[self._names[exchange_index]]
+            if kind == QUOTE:
+                exchange.health.received(now)
+                exchange._update(
+                    self._keys[key_index],
+                    bid,
+                    bid_size,
+                    ask,
+                    ask_size,
+                    exchange_time,
+                    sequence,
+                    receive_time,
+                )
+            else:
+                exchange.health.alive(now)
+        return len(records)
+
+    async def run(self) -> None:
+        """Start the workers & drain their rings until cancelled, restarting the workers that die."""
+        for index in range(len(self.shards)):
+            self.rings.append(QuoteRing.create())
+            self.processes.append(self._spawn(index))
+        log.info(f"Streaming the exchanges in {len(self.processes)} worker processes")
+
+        try:
+            idle = IDLE_SLEEP
+            while True:
+                drained = sum(self.drain(ring) for ring in self.rings)
+                if drained:
+                    idle = IDLE_SLEEP
+                    await asyncio.sleep(0)
+                    continue
+
+                for index, process in enumerate(self.processes):
+                    if not process.is_alive():
+                        log.warning(
+                            f"Worker {index} exited with {process.exitcode}, restarting it"
+                        )
+                        self.processes[index] = self._spawn(index)
+                await asyncio.sleep(idle)
+                idle = min(idle * 2, IDLE_SLEEP_MAX)
+        finally:
+            for process in self.processes:
+                process.terminate()
+            for process in self.processes:
+                process.join(timeout=5)
+            for ring in self.rings:
+                ring.close()
+                ring.unlink()
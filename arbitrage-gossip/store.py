@@ -0,0 +1,225 @@
+import asyncio
+import logging as log
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from exchanges.base import BaseExchange
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quotes (
+    receive_time INTEGER NOT NULL,
+    exchange TEXT NOT NULL,
+    pair TEXT NOT NULL,
+    bid REAL NOT NULL,
+    bid_size REAL NOT NULL,
+    ask REAL NOT NULL,
+    ask_size REAL NOT NULL,
+    exchange_time INTEGER NOT NULL,
+    sequence INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS quotes_pair_time ON quotes (pair, receive_time);
+CREATE INDEX IF NOT EXISTS quotes_time ON quotes (receive_time);
+
+CREATE TABLE IF NOT EXISTS opportunities (
+    time INTEGER NOT NULL,
+    pair TEXT NOT NULL,
+    sell_exchange TEXT NOT NULL,
+    bid REAL NOT NULL,
+    buy_exchange TEXT NOT NULL,
+    ask REAL NOT NULL,
+    spread REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS opportunities_pair_time ON opportunities (pair, time);
+CREATE INDEX IF NOT EXISTS opportunities_time ON opportunities (time);
+"""
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Open the store at path, creating the tables if it's new."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    db = sqlite3.connect(path)
+    # the readers don't block the writer & a crash loses at most the last batches
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(SCHEMA)
+    return db
+
+
+class TickStore:
+    """Appends every quote & every evaluated spread to an SQLite database.
+
+    The rows are only appended to a list on the event loop, a single worker
+    thread inserts them in batches, each one in a single transaction. When the
+    writer falls max_pending rows behind, the new rows are dropped rather than
+    held in memory.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        flush_interval: float = 1.0,
+        max_pending: int = 1_000_000,
+    ) -> None:
+        """Path of the SQLite database"""
+        self.path = path
+
+        """Seconds between the batches"""
+        self.flush_interval = flush_interval
+
+        """Rows waiting to be written, past which the new ones are dropped"""
+        self.max_pending = max_pending
+
+        """Rows waiting for the next batch"""
+        self._quotes: list[tuple] = []
+        self._opportunities: list[tuple] = []
+
+        """Rows handed to the writer & not written yet"""
+        self._writing = 0
+
+        """Number of rows written & dropped so far"""
+        self.written = 0
+        self.dropped = 0
+
+        """Single worker thread owning the connection"""
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="TickStore"
+        )
+        self._db: Optional[sqlite3.Connection] = None
+
+    def _full(self) -> bool:
+        pending = len(self._quotes) + len(self._opportunities) + self._writing
+        if pending < self.max_pending:
+            return False
+        self.dropped += 1
+        return True
+
+    def on_tick(self, exchange: BaseExchange, key: str) -> None:
+        """Called by the exchanges on every top of the book update."""
+        if self._full():
+            return
+        quote = exchange.data[key]
+        self._quotes.append(
+            (
+                quote.receive_time,
+                exchange.exchange,
+                key,
+                quote.bid,
+                quote.bid_size,
+                quote.ask,
+                quote.ask_size,
+                quote.exchange_time,
+                quote.sequence,
+            )
+        )
+
+    def on_evaluation(self, key: str, prices: dict[str, Any], spread: float) -> None:
+        """Called by Notify with the best prices of a pair & the spread between them, in %."""
+        if self._full():
+            return
+        self._opportunities.append(
+            (
+                max(prices["max"]["received"], prices["min"]["received"]),
+                key,
+                prices["max"]["exchange"],
+                prices["max"]["price"],
+                prices["min"]["exchange"],
+                prices["min"]["price"],
+                spread,
+            )
+        )
+
+    def _write(self, quotes: list[tuple], opportunities: list[tuple]) -> None:
+        """Insert a batch, in the worker thread."""
+        if self._db is None:
+            self._db = connect(self.path)
+        with self._db:
+            self._db.executemany(
+                "INSERT INTO quotes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", quotes
+            )
+            self._db.executemany(
+                "INSERT INTO opportunities VALUES (?, ?, ?, ?, ?, ?, ?)", opportunities
+            )
+
+    async def flush(self) -> None:
+        """Write the rows gathered so far."""
+        quotes, self._quotes = self._quotes, []
+        opportunities, self._opportunities = self._opportunities, []
+        rows = len(quotes) + len(opportunities)
+        if not rows:
+            return
+
+        self._writing += rows
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                self.executor, self._write, quotes, opportunities
+            )
+            self.written += rows
+        except sqlite3.Error as e:
+            log.error(f"Unable to store {rows} rows into {self.path}: {e}")
+        finally:
+            self._writing -= rows
+
+    async def run(self) -> None:
+        """Write the rows every flush_interval seconds, until cancelled."""
+        log.info(f"Storing the quotes & the spreads into {self.path}")
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+        finally:
+            # the last rows are written on the way out, without the event loop
+            quotes, opportunities = self._quotes, self._opportunities
+            self._quotes, self._opportunities = [], []
+            self.executor.submit(self._write, quotes, opportunities)
+            self.executor.submit(self.close)
+            self.executor.shutdown(wait=True)
+            if self.dropped:
+                log.warning(f"Dropped {self.dropped} rows, the store fell behind")
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+def query_quotes(
+    path: str,
+    pair: str,
+    start: int,
+    end: int,
+    exchange: Optional[str] = None,
+) -> list[tuple]:
+    """The stored quotes of pair received from start until end, nanoseconds since the epoch, oldest first.
+
+    Each row is (receive_time, exchange, pair, bid, bid_size, ask, ask_size,
+    exchange_time, sequence), of every exchange unless one is named.
+    """
+    sql = (
+        "SELECT * FROM quotes WHERE pair = ? AND receive_time >= ? AND receive_time < ?"
+    )
+    params: list[Any] = [pair, start, end]
+    if exchange is not None:
+        sql += " AND exchange = ?"
+        params.append(exchange)
+    db = connect(path)
+    try:
+        return db.execute(sql + " ORDER BY receive_time", params).fetchall()
+    finally:
+        db.close()
+
+
+def query_opportunities(path: str, pair: str, start: int, end: int) -> list[tuple]:
+    """The stored spreads of pair evaluated from start until end, nanoseconds since the epoch, oldest first.
+
+    Each row is (time, pair, sell_exchange, bid, buy_exchange, ask, spread in %).
+    """
+    db = connect(path)
+    try:
+        return db.execute(
+            "SELECT * FROM opportunities WHERE pair = ? AND time >= ? AND time < ? ORDER BY time",
+            (pair, start, end),
+        ).fetchall()
+    finally:
+        db.close()
@@ -0,0 +1,85 @@
+import json
+import logging
+import os
+import queue
+import tempfile
+import unittest
+
+from utils import asynclog
+
+
+class TestAsyncLog(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "ethusdt.log")
+
+        root = logging.getLogger()
+        handlers, level = root.handlers[:], root.level
+
+        def restore():
+            asynclog.stop()
+            for handler in root.handlers[:]:
+                root.removeHandler(handler)
+            for handler in handlers:
+                root.addHandler(handler)
+            root.setLevel(level)
+
+        self.addCleanup(restore)
+
+    def read(self):
+        with open(self.path) as f:
+            return f.read().splitlines()
+
+    def test_records_are_written_by_the_listener(self):
+        asynclog.start([asynclog.file_handler(self.path)], logging.INFO)
+        logging.info("Binance ETHUSDT 1795.5")
+        logging.debug("left out")
+        asynclog.stop()
+
+        lines = self.read()
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].endswith("INFO Binance ETHUSDT 1795.5"))
+
+    def test_json_lines(self):
+        asynclog.start([asynclog.file_handler(self.path)], logging.INFO, fmt="json")
+        try:
+            raise ValueError("bad frame")
+        except ValueError:
+            logging.exception("Huobi")
+        asynclog.stop()
+
+        entry = json.loads(self.read()[0])
+        self.assertEqual(entry["level"], "ERROR")
+        self.assertEqual(entry["process"], "MainProcess")
+        self.assertTrue(entry["message"].startswith("Huobi"))
+        self.assertIn("ValueError: bad frame", entry["message"])
+
+    def test_size_rotation(self):
+        handler = asynclog.file_handler(self.path, max_size=0.001, backups=2)
+        asynclog.start([handler], logging.INFO)
+        for i in range(100):
+            logging.info(f"tick {i}")
+        asynclog.stop()
+
+        self.assertTrue(os.path.exists(self.path + ".1"))
+        self.assertTrue(os.path.exists(self.path + ".2"))
+        self.assertFalse(os.path.exists(self.path + ".3"))
+        self.assertTrue(self.read()[-1].endswith("tick 99"))
+
+    def test_full_queue_drops_the_records(self):
+        records = queue.Queue(2)
+        handler = asynclog.DroppingQueueHandler(records)
+        logger = logging.getLogger("test_asynclog")
+        logger.propagate = False
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+
+        for i in range(3):
+            logger.warning(f"stalled {i}")
+        self.assertEqual(records.qsize(), 2)
+        self.assertEqual(handler.dropped, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
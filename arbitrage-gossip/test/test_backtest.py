@@ -0,0 +1,126 @@
+import argparse
+import os
+import tempfile
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from store import connect
+
+SECOND = 1_000_000_000
+
+
+@unittest.skipIf(numpy is None, "numpy isn't installed")
+class TestBacktest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "ticks.db")
+
+        # Binance's bid crosses FTX's ask by 2% at 1s, 3% at 2s & 5% at 100s, FTX goes silent afterwards
+        rows = [
+            (0, "FTX", 100.0, 1.0, 100.0, 1.0),
+            (0, "Binance", 100.0, 1.0, 100.0, 1.0),
+            (1 * SECOND, "Binance", 102.0, 1.0, 103.0, 1.0),
+            (2 * SECOND, "Binance", 103.0, 1.0, 104.0, 1.0),
+            (3 * SECOND, "Binance", 100.0, 1.0, 101.0, 1.0),
+            (99 * SECOND, "FTX", 99.0, 1.0, 100.0, 1.0),
+            (100 * SECOND, "Binance", 105.0, 1.0, 106.0, 1.0),
+            (200 * SECOND, "Binance", 110.0, 1.0, 111.0, 1.0),
+        ]
+        db = connect(self.path)
+        with db:
+            db.executemany(
+                "INSERT INTO quotes VALUES (?, ?, 'ETHUSDT', ?, ?, ?, ?, 0, 0)", rows
+            )
+        db.close()
+
+    def test_spreads(self):
+        import backtest
+
+        ticks = backtest.load(self.path, "ETHUSDT")
+        self.assertEqual(ticks.names, ["Binance", "FTX"])
+        self.assertEqual(len(ticks.time), 8)
+
+        latest = backtest.align(ticks)
+        self.assertEqual(latest[:, 1].tolist(), [0, 0, 0, 0, 0, 5, 5, 5])
+
+        headline, executable = backtest.evaluate(ticks, [0.0, 0.0], max_age=30)
+        self.assertAlmostEqual(headline[2], 2.0)
+        self.assertAlmostEqual(headline[3], 3.0)
+        self.assertAlmostEqual(headline[6], 5.0)
+        self.assertAlmostEqual(headline[4], 0.0)
+        # Binance's then FTX's quotes are older than max_age
+        self.assertTrue(numpy.isnan(headline[5]))
+        self.assertTrue(numpy.isnan(headline[7]))
+        # nothing to trade at a profit between equal prices
+        self.assertTrue(numpy.isnan(executable[1]))
+        self.assertAlmostEqual(executable[3], 3.0)
+
+        # the fees come off the executable spread only
+        headline, executable = backtest.evaluate(ticks, [0.001, 0.001], max_age=0)
+        self.assertAlmostEqual(headline[7], 10.0)
+        self.assertAlmostEqual(executable[3], (103 * 0.999 - 100.1) * 100 / 100.1)
+
+    def test_sweep(self):
+        import backtest
+
+        ticks = backtest.load(self.path, "ETHUSDT")
+        _, executable = backtest.evaluate(ticks, [0.0, 0.0], max_age=30)
+        results = backtest.sweep(ticks.time, executable, [1.0, 4.0], [0.0, 60.0])
+        self.assertEqual(
+            [(r["threshold"], r["cooldown"], r["alerts"]) for r in results],
+            [(1.0, 0.0, 3), (1.0, 60.0, 2), (4.0, 0.0, 1), (4.0, 60.0, 1)],
+        )
+        self.assertAlmostEqual(results[1]["spreads"][-1], 5.0)
+
+    def test_grid(self):
+        import backtest
+
+        pair, ticks, distribution, grid = backtest.backtest(
+            self.path,
+            "ETHUSDT",
+            {"Binance": 0.0, "FTX": 0.0},
+            [1.0, 4.0],
+            [0.0, 60.0],
+            30,
+            0,
+            2**63 - 1,
+        )
+        self.assertEqual((pair, ticks), ("ETHUSDT", 8))
+        self.assertAlmostEqual(distribution[-1], 5.0)
+        self.assertEqual(
+            [(r["threshold"], r["cooldown"], r["alerts"]) for r in grid],
+            [(1.0, 0.0, 3), (1.0, 60.0, 2), (4.0, 0.0, 1), (4.0, 60.0, 1)],
+        )
+
+    def test_taker_fees(self):
+        import backtest
+        from exchanges.binance import Binance
+
+        fees = backtest.taker_fees(["Binance", "Kraken"])
+        self.assertEqual(
+            fees, {"Binance": Binance.taker_fee, "Kraken": backtest.DEFAULT_TAKER_FEE}
+        )
+
+        overrides = backtest.fee_overrides("binance=0.00075, kraken=0.0026")
+        fees = backtest.taker_fees(["Binance", "Kraken"], overrides)
+        self.assertEqual(fees, {"Binance": 0.00075, "Kraken": 0.0026})
+
+        for value in ("binance", "binance=1", "=0.001"):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                backtest.fee_overrides(value)
+
+    def test_cooldown_is_strict(self):
+        import backtest
+
+        times = numpy.array([0, 60, 61, 121, 122]) * SECOND
+        self.assertEqual(backtest.fire(times, 60).tolist(), [0, 2, 4])
+        self.assertEqual(backtest.fire(times, 0).tolist(), [0, 1, 2, 3, 4])
+
+
+if __name__ == "__main__":
+    unittest.main()
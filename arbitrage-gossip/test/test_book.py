@@ -0,0 +1,111 @@
+import unittest
+from unittest import mock
+
+from exchanges.base import BaseExchange
+from exchanges.book import OrderBook
+
+
+class FakeExchange(BaseExchange):
+    """Exchange whose depth diffs are applied by hand."""
+
+    supports_depth = True
+
+    async def _fetch_symbols(self) -> dict:
+        return {}
+
+    def _on_message(self, msg, connection) -> None:
+        ...
+
+
+class TestOrderBook(unittest.TestCase):
+    def test_levels_are_sorted_from_the_best(self):
+        book = OrderBook()
+        book.load(
+            bids=[["100", "1"], ["102", "2"], ["101", "3"]],
+            asks=[["105", "1"], ["103", "2"]],
+            sequence=10,
+        )
+        self.assertEqual(list(book.bids), [(102.0, 2.0), (101.0, 3.0), (100.0, 1.0)])
+        self.assertEqual(book.asks.best(), (103.0, 2.0))
+
+        book.apply(bids=[["102", "0"], ["100", "5"]], asks=[["104", "1"]])
+        self.assertEqual(list(book.bids), [(101.0, 3.0), (100.0, 5.0)])
+        self.assertEqual([price for price, _ in book.asks], [103.0, 104.0, 105.0])
+
+        # removing a missing level is a no-op
+        book.apply(bids=[["99", "0"]], asks=[])
+        self.assertEqual(len(book.bids), 2)
+
+    def test_changes_older_than_the_book_are_skipped(self):
+        book = OrderBook()
+        book.load(bids=[["100", "1"]], asks=[], sequence=10)
+        book.apply(bids=[["100", "7", "9"], ["99", "2", "11"]], asks=[])
+        self.assertEqual(list(book.bids), [(100.0, 1.0), (99.0, 2.0)])
+
+
+class TestDepthSync(unittest.TestCase):
+    def test_diffs_are_buffered_until_the_snapshot(self):
+        exchange = FakeExchange("ethusdt", depth=True)
+        self.assertTrue(exchange._apply_diff("ETHUSDT", 9, 10, [["100", "1"]], []))
+        self.assertTrue(exchange._apply_diff("ETHUSDT", 11, 12, [["101", "1"]], []))
+        self.assertNotIn("ETHUSDT", exchange.data)
+
+        # the first diff is already included in the snapshot
+        self.assertTrue(
+            exchange._load_snapshot("ETHUSDT", 10, [["100", "4"]], [["102", "1"]])
+        )
+        book = exchange.books["ETHUSDT"]
+        self.assertEqual(book.sequence, 12)
+        self.assertEqual(list(book.bids), [(101.0, 1.0), (100.0, 4.0)])
+        self.assertEqual(exchange.data["ETHUSDT"].bid, 101.0)
+        self.assertEqual(list(exchange.levels("ETHUSDT", "ask")), [(102.0, 1.0)])
+
+    def test_gap_drops_the_book(self):
+        exchange = FakeExchange("ethusdt", depth=True)
+        exchange._load_snapshot("ETHUSDT", 10, [["100", "1"]], [["102", "1"]])
+
+        self.assertFalse(exchange._apply_diff("ETHUSDT", 12, 13, [["101", "1"]], []))
+        self.assertFalse(exchange.books["ETHUSDT"].synced)
+
+        # without a synced book only the top of the book is known
+        self.assertEqual(list(exchange.levels("ETHUSDT", "bid")), [(100.0, 1.0)])
+
+
+class StaleSnapshots(FakeExchange):
+    """Exchange whose snapshots are always older than the diffs received meanwhile."""
+
+    rest_snapshots = True
+
+    max_snapshot_attempts = 4
+
+    fetched = 0
+
+    async def _fetch_snapshot(self, symbol: str) -> tuple[int, list, list]:
+        self.fetched += 1
+        self._apply_diff("ETHUSDT", 9, 10, [["100", "1"]], [])
+        return 5, [["100", "1"]], [["102", "1"]]
+
+
+class TestSnapshots(unittest.IsolatedAsyncioTestCase):
+    async def test_snapshots_are_retried_with_backoff(self):
+        exchange = StaleSnapshots("ethusdt", depth=True)
+
+        with mock.patch("exchanges.reconnect.asyncio.sleep") as sleep:
+            exchange._resync("ethusdt")
+            await exchange._snapshots["ethusdt"]
+
+        self.assertEqual(exchange.fetched, 4)
+        # every attempt but the first waits
+        self.assertEqual(sleep.await_count, 3)
+
+    def test_snapshots_have_to_be_downloadable(self):
+        class Undownloadable(FakeExchange):
+            rest_snapshots = True
+
+        with self.assertRaises(TypeError):
+            Undownloadable("ethusdt", depth=True)
+        Undownloadable("ethusdt")
+
+
+if __name__ == "__main__":
+    unittest.main()
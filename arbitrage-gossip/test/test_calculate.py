@@ -0,0 +1,214 @@
+import asyncio
+import unittest
+from typing import Optional
+
+from exchanges.base import BaseExchange
+from calculate import Calculate, match
+
+
+class FakeExchange(BaseExchange):
+    """Exchange fed by hand instead of a websocket."""
+
+    async def _fetch_symbols(self) -> dict:
+        return {}
+
+    def _on_message(self, msg, connection) -> None:
+        ...
+
+    def tick(
+        self, bid: float, ask: Optional[float] = None, key: str = "ETHUSDT"
+    ) -> None:
+        """Push a book whose ask defaults to the bid, i.e. a zero width spread."""
+        self._update(key, bid, 1.0, bid if ask is None else ask, 1.0)
+
+
+class TestCalculate(unittest.IsolatedAsyncioTestCase):
+    async def test_tick_wakes_up_waiter(self):
+        exchanges = {"a": FakeExchange("ethusdt"), "b": FakeExchange("ethusdt")}
+        calculate = Calculate(exchanges=exchanges)
+
+        waiter = asyncio.create_task(calculate.wait_for_tick())
+        await asyncio.sleep(0)
+        self.assertFalse(waiter.done())
+
+        exchanges["a"].tick(100.0)
+        await asyncio.wait_for(waiter, 1)
+        self.assertFalse(calculate.updated.is_set())
+
+    async def test_coalesce_groups_ticks(self):
+        exchanges = {"a": FakeExchange("ethusdt"), "b": FakeExchange("ethusdt")}
+        calculate = Calculate(exchanges=exchanges)
+
+        exchanges["a"].tick(100.0)
+        waiter = asyncio.create_task(calculate.wait_for_tick(coalesce=0.05))
+        await asyncio.sleep(0.01)
+        exchanges["b"].tick(101.0)
+        self.assertEqual(await asyncio.wait_for(waiter, 1), {"ETHUSDT"})
+
+        # both ticks were consumed by a single evaluation
+        self.assertFalse(calculate.updated.is_set())
+        prices = await calculate.latest_prices("ETHUSDT")
+        self.assertEqual(prices["max"]["price"], 101.0)
+        self.assertEqual(prices["min"]["price"], 100.0)
+
+    async def test_equal_prices_pick_distinct_exchanges(self):
+        exchanges = {"a": FakeExchange("ethusdt"), "b": FakeExchange("ethusdt")}
+        calculate = Calculate(exchanges=exchanges)
+        exchanges["a"].tick(100.0)
+        exchanges["b"].tick(100.0)
+
+        prices = await calculate.latest_prices("ETHUSDT")
+        self.assertEqual(prices["min"]["price"], prices["max"]["price"])
+        self.assertIsNot(prices["min"], prices["max"])
+
+    async def test_pairs_are_tracked_separately(self):
+        exchanges = {"a": FakeExchange("ethusdt"), "b": FakeExchange("ethusdt")}
+        calculate = Calculate(exchanges=exchanges)
+        exchanges["a"].tick(100.0, key="ETHUSDT")
+        exchanges["b"].tick(101.0, key="ETHUSDT")
+        exchanges["a"].tick(20000.0, key="BTCUSDT")
+
+        self.assertEqual(await calculate.wait_for_tick(), {"ETHUSDT", "BTCUSDT"})
+        self.assertEqual(
+            (await calculate.latest_prices("ETHUSDT"))["max"]["price"], 101.0
+        )
+        # a single exchange is offering BTCUSDT
+        self.assertEqual(await calculate.latest_prices("BTCUSDT"), False)
+        self.assertEqual(await calculate.percentage_change(100.0, 100.0), 0)
+
+    async def test_buy_at_ask_sell_at_bid(self):
+        exchanges = {"a": FakeExchange("ethusdt"), "b": FakeExchange("ethusdt")}
+        calculate = Calculate(exchanges=exchanges)
+        exchanges["a"].tick(99.0, 100.0)
+        exchanges["b"].tick(102.0, 103.0)
+
+        prices = await calculate.latest_prices("ETHUSDT")
+        self.assertEqual(
+            (prices["min"]["exchange"], prices["min"]["side"], prices["min"]["price"]),
+            ("FakeExchange", "ask", 100.0),
+        )
+        self.assertEqual(
+            (prices["max"]["side"], prices["max"]["price"]), ("bid", 102.0)
+        )
+
+    async def test_best_bid_and_ask_on_the_same_exchange(self):
+        exchanges = {
+            "a": FakeExchange("ethusdt"),
+            "b": FakeExchange("ethusdt"),
+            "c": FakeExchange("ethusdt"),
+        }
+        calculate = Calculate(exchanges=exchanges)
+        exchanges["a"].tick(101.0, 101.5)
+        exchanges["b"].tick(99.0, 103.0)
+        exchanges["c"].tick(100.5, 102.5)
+
+        # a has both the best bid and the best ask, it's bought on a & sold on c
+        prices = await calculate.latest_prices("ETHUSDT")
+        self.assertEqual(prices["min"]["price"], 101.5)
+        self.assertEqual(prices["max"]["price"], 100.5)
+
+    async def test_match_stops_when_unprofitable(self):
+        asks = [(100.0, 1.0), (101.0, 2.0), (103.0, 5.0)]
+        bids = [(104.0, 1.5), (102.0, 3.0)]
+        # without fees, 1 @ 100 & 2 @ 101 are bought, 1.5 @ 104 & 1.5 @ 102 sold
+        self.assertEqual(match(asks, bids, 0, 0), (3.0, 302.0, 309.0))
+
+        # the fees make the 101 -> 102 level unprofitable
+        size, cost, proceeds = match(asks, bids, 0.005, 0.005)
+        self.assertEqual(size, 1.5)
+        self.assertAlmostEqual(cost, 100.5 + 0.5 * 101 * 1.005)
+        self.assertAlmostEqual(proceeds, 1.5 * 104 * 0.995)
+
+    async def test_executable_opportunity(self):
+        exchanges = {
+            "a": FakeExchange("ethusdt"),
+            "b": FakeExchange("ethusdt"),
+            "c": FakeExchange("ethusdt"),
+        }
+        exchanges["c"].taker_fee = 0.05
+        calculate = Calculate(exchanges=exchanges)
+        exchanges["a"].tick(99.0, 100.0)
+        exchanges["b"].tick(101.0, 102.0)
+        # the best bid, yet its fee eats the spread
+        exchanges["c"].tick(103.0, 104.0)
+
+        opportunity = await calculate.executable("ETHUSDT")
+        self.assertEqual(opportunity["size"], 1.0)
+        self.assertAlmostEqual(opportunity["buy_vwap"], 100.1)
+        self.assertAlmostEqual(opportunity["sell_vwap"], 100.899)
+        self.assertAlmostEqual(opportunity["profit"], 0.799)
+        self.assertEqual(opportunity["max"]["price"], 101.0)
+
+        exchanges["b"].tick(100.0, 102.0)
+        self.assertEqual(await calculate.executable("ETHUSDT"), False)
+
+    async def test_stale_quotes_are_left_out(self):
+        exchanges = {
+            "a": FakeExchange("ethusdt"),
+            "b": FakeExchange("ethusdt"),
+            "c": FakeExchange("ethusdt"),
+        }
+        calculate = Calculate(exchanges=exchanges, max_age=5)
+        for exchange, price in zip(exchanges.values(), (100.0, 101.0, 110.0)):
+            exchange.tick(price)
+            exchange.health.received()
+
+        # c went silent a minute ago
+        exchanges["c"].health.last_alive -= 60 * 10**9
+        prices = await calculate.latest_prices("ETHUSDT")
+        self.assertEqual(prices["max"]["price"], 101.0)
+        self.assertNotIn("c", calculate.bids["ETHUSDT"])
+
+        # b sent nothing for a minute either, but its connection answers the pings
+        exchanges["b"].health.last_receive -= 60 * 10**9
+        prices = await calculate.latest_prices("ETHUSDT")
+        self.assertEqual(prices["max"]["price"], 101.0)
+
+        exchanges["b"].health.last_alive -= 60 * 10**9
+        self.assertEqual(await calculate.latest_prices("ETHUSDT"), False)
+
+        # c is back
+        exchanges["c"].health.received()
+        exchanges["c"].tick(111.0)
+        exchanges["a"].tick(100.0)
+        self.assertEqual(
+            (await calculate.latest_prices("ETHUSDT"))["max"]["price"], 111.0
+        )
+
+    async def test_duplicate_updates_are_pushed_once(self):
+        exchange = FakeExchange("ethusdt")
+        ticks = []
+        exchange.register_callback(lambda exchange, key: ticks.append(key))
+
+        # the same update received over both connections, identified by
+        # its timestamp, its update id, or by nothing at all
+        for _ in range(2):
+            exchange._update("ETHUSDT", 100.0, 1.0, 101.0, 1.0, 2_000)
+            exchange._update("BTCUSDT", 100.0, 1.0, 101.0, 2.0, sequence=7)
+            exchange._update("DOGEUSDT", 100.0, 1.0, 101.0, 3.0)
+        self.assertEqual(ticks, ["ETHUSDT", "BTCUSDT", "DOGEUSDT"])
+
+        # older updates are dropped
+        exchange._update("ETHUSDT", 98.0, 1.0, 101.0, 1.0, 1_000)
+        exchange._update("BTCUSDT", 99.0, 1.0, 101.0, 1.0, sequence=6)
+        exchange._update("BTCUSDT", 99.0, 1.0, 101.0, 1.0, sequence=8)
+        self.assertEqual(len(ticks), 4)
+        self.assertEqual(exchange.data["BTCUSDT"].bid, 99.0)
+
+    async def test_quote_is_updated_in_place(self):
+        exchange = FakeExchange("ethusdt")
+        exchange._update("ETHUSDT", 100.0, 2.0, 100.5, 3.0, 1654932552785 * 1_000_000)
+        quote = exchange.data["ETHUSDT"]
+        self.assertEqual(quote.time, "2022/06/11T07:29:12.785000")
+        self.assertEqual(quote.mid, 100.25)
+
+        exchange._update("ETHUSDT", 101.0, 1.0, 101.5, 1.0)
+        self.assertIs(exchange.data["ETHUSDT"], quote)
+        self.assertEqual((quote.bid, quote.ask), (101.0, 101.5))
+        # without an exchange timestamp the receive time is used
+        self.assertEqual(quote.exchange_time, quote.receive_time)
+        self.assertGreaterEqual(quote.age(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+from exchanges.binance import Binance
+from exchanges.capture import Capture, Frame, capture_path, read_capture
+from exchanges.huobi import Huobi
+from exchanges.replay import replay, restore
+
+
+class Connection:
+    """Stands for the websocket a frame was received over."""
+
+
+def book_ticker(u, bid, ask):
+    return json.dumps(
+        {
+            "stream": "ethusdt@bookTicker",
+            "data": {"u": u, "s": "ETHUSDT", "b": bid, "B": "1", "a": ask, "A": "2"},
+        }
+    )
+
+
+class TestCapture(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_frames_are_read_back(self):
+        path = capture_path(self.directory.name, "Huobi")
+        capture = Capture(path, {"exchange": "Huobi", "pairs": {"ethusdt": "ETHUSDT"}})
+        first, second = Connection(), Connection()
+        capture.write(first, "text", 1_000)
+        capture.write(second, b"\x1f\x8b binary", 2_000)
+        capture.write(first, "more text", 3_000)
+        capture.close()
+
+        metadata, frames = read_capture(path)
+        self.assertEqual(metadata["pairs"], {"ethusdt": "ETHUSDT"})
+        self.assertEqual(
+            [tuple(frame) for frame in frames],
+            [
+                (1_000, 0, "text"),
+                (2_000, 1, b"\x1f\x8b binary"),
+                (3_000, 0, "more text"),
+            ],
+        )
+
+    def test_cut_short_capture(self):
+        path = capture_path(self.directory.name, "Binance")
+        capture = Capture(path, {})
+        for i in range(3):
+            capture.write(Connection(), book_ticker(i, "100", "101"))
+        capture.close()
+
+        # drop the end of the last frame
+        with gzip.open(path) as f:
+            data = f.read()
+        with gzip.open(path, "wb") as f:
+            f.write(data[:-5])
+
+        _, frames = read_capture(path)
+        self.assertEqual(len(list(frames)), 2)
+
+    def test_not_a_capture(self):
+        path = os.path.join(self.directory.name, "other.gz")
+        with gzip.open(path, "wb") as f:
+            f.write(b"something else")
+        self.assertRaises(ValueError, read_capture, path)
+
+    async def test_replay(self):
+        binance = Binance("ethusdt")
+        binance.capture = Capture(
+            capture_path(self.directory.name, "Binance"),
+            {"exchange": "Binance", "pairs": binance.pairs, "depth": False},
+        )
+        connection = Connection()
+        frames = [book_ticker(1, "100", "101"), book_ticker(2, "100.5", "101")]
+        for data in frames:
+            binance.capture.write(connection, data)
+        await binance.close()
+
+        metadata, frames = read_capture(capture_path(self.directory.name, "Binance"))
+        exchange = restore(Binance, metadata)
+        ticks = []
+        exchange.register_callback(lambda exchange, key: ticks.append(key))
+
+        sessions = await replay({exchange: frames})
+        self.assertEqual(ticks, ["ETHUSDT", "ETHUSDT"])
+        self.assertEqual(exchange.data["ETHUSDT"].bid, 100.5)
+        self.assertEqual(exchange.data["ETHUSDT"].sequence, 2)
+        self.assertEqual(sessions[exchange].delivered, 2)
+
+    async def test_replay_answers_the_handshake(self):
+        ping = gzip.compress(b'{"ping": 1654931160555}')
+        subbed = gzip.compress(
+            b'{"id": null, "status": "ok", "subbed": "market.ethusdt.ticker"}'
+        )
+        tick = gzip.compress(
+            b'{"ch": "market.ethusdt.ticker", "ts": 1654932129289, "tick": {"bid": 100, "bidSize": 1, "ask": 101, "askSize": 2}}'
+        )
+        huobi = Huobi("ethusdt")
+        ticks = []
+        huobi.register_callback(lambda exchange, key: ticks.append(huobi.data[key].ask))
+
+        sessions = await replay(
+            {huobi: [Frame(i, 0, data) for i, data in enumerate((ping, subbed, tick))]}
+        )
+        self.assertEqual(ticks, [101.0])
+        self.assertEqual(
+            [json.loads(data) for data in sessions[huobi].opened[0].sent],
+            [{"sub": "market.ethusdt.ticker"}, {"pong": 1654931160555}],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import time
+import unittest
+
+from exchanges.bitfinex import Bitfinex
+from exchanges.catalog import SymbolCatalog
+
+
+class FakeExchange:
+    """Counts how many times its symbols are downloaded."""
+
+    def __init__(self, name: str, symbols: dict) -> None:
+        self.exchange = name
+        self.symbols = symbols
+        self.fetches = 0
+
+    async def _fetch_symbols(self) -> dict:
+        self.fetches += 1
+        return self.symbols
+
+
+class TestSymbolCatalog(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "symbols.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def test_load_and_cache(self):
+        exchange = FakeExchange(
+            "Binance",
+            {"ethusdt": {"base": "ETH", "quote": "USDT", "active": True}},
+        )
+        catalog = SymbolCatalog(path=self.path, ttl=60)
+        await catalog.load([exchange])
+        await catalog.load([exchange])
+
+        self.assertEqual(exchange.fetches, 1)
+        self.assertEqual(catalog.lookup("Binance", "ethusdt")["quote"], "USDT")
+        self.assertEqual(catalog.find("Binance", "ETHUSDT"), "ethusdt")
+        self.assertIsNone(catalog.lookup("Binance", "eth-usdt"))
+
+        # a warm restart doesn't download anything
+        restarted = SymbolCatalog(path=self.path, ttl=60)
+        await restarted.load([exchange])
+        self.assertEqual(exchange.fetches, 1)
+        self.assertEqual(restarted.find("Binance", "ETHUSDT"), "ethusdt")
+
+    async def test_expired_cache_is_refreshed(self):
+        exchange = FakeExchange("Huobi", {})
+        catalog = SymbolCatalog(path=self.path, ttl=60)
+        await catalog.load([exchange])
+        catalog.fetched["Huobi"] = time.time() - 61
+        await catalog.load([exchange])
+
+        self.assertEqual(exchange.fetches, 2)
+
+    async def test_downloaded_once_without_cache(self):
+        exchange = FakeExchange("Binance", {})
+        catalog = SymbolCatalog(path=self.path, ttl=0)
+        await catalog.load([exchange])
+        await catalog.load([exchange])
+
+        self.assertEqual(exchange.fetches, 1)
+        self.assertFalse(os.path.exists(self.path))
+
+    async def test_failed_download(self):
+        class Broken(FakeExchange):
+            async def _fetch_symbols(self) -> dict:
+                raise ConnectionError("unreachable")
+
+        healthy = FakeExchange("KuCoin", {})
+        catalog = SymbolCatalog(path=self.path, ttl=0)
+        await catalog.load([Broken("FTX", {}), healthy])
+
+        self.assertNotIn("FTX", catalog.symbols)
+        self.assertIn("KuCoin", catalog.symbols)
+        self.assertFalse(os.path.exists(self.path))
+
+    async def test_check_pair_exists(self):
+        catalog = SymbolCatalog(path=self.path, ttl=60)
+        catalog._add(
+            "Bitfinex",
+            {
+                "ETHUST": {"base": "ETH", "quote": "USDT", "active": True},
+                "DOGE:USD": {"base": "DOGE", "quote": "USD", "active": True},
+            },
+            time.time(),
+        )
+        bitfinex = Bitfinex(["Eth-UsdT", "doge-usd", "xyz-usd"], catalog=catalog)
+
+        self.assertTrue(await bitfinex._check_pair_exists())
+        self.assertEqual(bitfinex.pairs, {"ETHUST": "ETHUSDT", "DOGE:USD": "DOGEUSD"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+
+from exchanges import decoder
+from exchanges.binance import BookTickerMessage
+
+
+class TestDecoder(unittest.TestCase):
+    def tearDown(self):
+        decoder.use("auto")
+
+    def test_every_decoder_reads_the_same_fields(self):
+        raw = '{"stream":"btcusdt@bookTicker","data":{"u":21434712390,"s":"BTCUSDT","b":"29313.49","B":"1.2","a":"29313.5","A":"0.3"}}'
+        for name in decoder.DECODERS:
+            decoder.use(name)
+            msg = decoder.loads_for(BookTickerMessage)(raw)
+            self.assertEqual(msg["data"]["a"], "29313.5")
+            self.assertEqual(msg["data"]["B"], "1.2")
+
+    def test_unexpected_messages_are_fully_decoded(self):
+        for name in decoder.DECODERS:
+            decoder.use(name)
+            loads = decoder.loads_for(BookTickerMessage)
+            self.assertEqual(loads('{"result":null,"id":1}'), {"result": None, "id": 1})
+            self.assertEqual(loads("[1, 2]"), [1, 2])
+
+    def test_unknown_decoder(self):
+        self.assertRaises(ValueError, decoder.use, "simdjson")
+
+
+if __name__ == "__main__":
+    unittest.main()
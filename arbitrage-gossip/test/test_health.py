@@ -0,0 +1,91 @@
+import unittest
+from unittest import mock
+
+from aiohttp import web
+
+from exchanges.base import BaseExchange
+from exchanges.health import RATE_WINDOW, FeedHealth, LifetimeHistogram
+from exchanges.session import create_session
+
+
+class FakeExchange(BaseExchange):
+    async def _fetch_symbols(self) -> dict:
+        return {}
+
+    def _on_message(self, msg, connection) -> None: ...
+
+
+class TestFeedHealth(unittest.TestCase):
+    def test_rate_and_silence(self):
+        health = FeedHealth()
+        start = health._window_start
+        for i in range(1, 11):
+            health.received(start + i * RATE_WINDOW // 10)
+
+        self.assertEqual(health.messages, 10)
+        self.assertAlmostEqual(health.rate(health.last_receive), 2.0)
+        self.assertEqual(health.silence(health.last_receive + 5), 5)
+
+        # a silent feed has no rate
+        self.assertEqual(health.rate(health.last_receive + RATE_WINDOW), 0.0)
+
+    def test_pongs_keep_the_feed_alive(self):
+        health = FeedHealth()
+        start = health._window_start
+        health.received(start + 1)
+        health.alive(start + RATE_WINDOW)
+
+        self.assertEqual(health.messages, 1)
+        self.assertEqual(health.silence(start + RATE_WINDOW + 5), 5)
+        # but they aren't messages
+        self.assertEqual(health.rate(start + RATE_WINDOW + 5), 0.0)
+
+    def test_lifetimes(self):
+        lifetimes = LifetimeHistogram()
+        for lifetime in (4.0, 5.0, 60.0, 7200.0, 3 * 86400.0):
+            lifetimes.record(lifetime)
+
+        self.assertEqual(lifetimes.counts, [2, 1, 0, 0, 1, 0, 1])
+        self.assertEqual(len(lifetimes), 5)
+        self.assertEqual(
+            repr(lifetimes), "LifetimeHistogram(<=10s: 2, <=1m: 1, <=6h: 1, >24h: 1)"
+        )
+
+
+class TestReceive(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        async def websocket(request):
+            ws = web.WebSocketResponse(autoping=False)
+            await ws.prepare(request)
+            await ws.ping()
+            await ws.pong()
+            # tell what the ping was answered with
+            answer = await ws.receive()
+            await ws.send_str(answer.type.name)
+            await ws.receive()
+            return ws
+
+        app = web.Application()
+        app.add_routes([web.get("/ws", websocket)])
+        runner = web.AppRunner(app)
+        await runner.setup()
+        self.addAsyncCleanup(runner.cleanup)
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{runner.addresses[0][1]}/ws"
+
+    async def test_pings_and_pongs_are_alive(self):
+        session = create_session()
+        self.addAsyncCleanup(session.close)
+        exchange = FakeExchange("ethusdt", session=session)
+
+        with mock.patch.object(FeedHealth, "alive", autospec=True) as alive:
+            async with session.ws_connect(self.url, autoping=False) as ws:
+                self.assertEqual(await exchange._receive_frame(ws, None), "PONG")
+
+        self.assertEqual(alive.call_count, 2)
+        self.assertEqual(exchange.health.messages, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+import logging
+import unittest
+
+from utils import hotlog
+from utils.hotlog import DebugSampler
+
+
+class TestDebugSampler(unittest.TestCase):
+    def setUp(self):
+        self.logger = logging.getLogger("test_hotlog")
+
+    def tearDown(self):
+        hotlog.sample_every = 1
+
+    def test_disabled(self):
+        self.logger.setLevel(logging.INFO)
+        debug = DebugSampler(self.logger)
+        self.assertFalse(any(debug() for _ in range(10)))
+
+    def test_sampled(self):
+        self.logger.setLevel(logging.DEBUG)
+        hotlog.sample_every = 4
+        debug = DebugSampler(self.logger)
+        self.assertEqual([debug() for _ in range(8)], [True, False, False, False] * 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
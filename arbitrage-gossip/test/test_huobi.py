@@ -0,0 +1,63 @@
+import gzip
+import json
+import unittest
+
+import aiohttp
+
+from exchanges.connection import Connection
+from exchanges.huobi import Huobi
+
+
+class FakeWebSocket:
+    """Replays gzip compressed frames & records what's sent back."""
+
+    def __init__(self, *messages):
+        self.frames = [gzip.compress(json.dumps(msg).encode()) for msg in messages]
+        self.sent = []
+
+    async def receive(self, timeout=None):
+        return aiohttp.WSMessage(aiohttp.WSMsgType.BINARY, self.frames.pop(0), None)
+
+    async def send_str(self, data):
+        self.sent.append(json.loads(data))
+
+
+class TestHuobi(unittest.IsolatedAsyncioTestCase):
+    async def test_pings_are_answered(self):
+        huobi = Huobi("ethusdt")
+        ws = FakeWebSocket(
+            {"ping": 1654932128921},
+            {"ping": 1654932133921},
+            {"ch": "market.ethusdt.ticker", "ts": 1654932129289, "tick": {}},
+        )
+
+        resp = await huobi._receive(ws)
+        self.assertEqual(resp["ch"], "market.ethusdt.ticker")
+        self.assertEqual(ws.sent, [{"pong": 1654932128921}, {"pong": 1654932133921}])
+        self.assertEqual(huobi.health.messages, 3)
+
+    async def test_malformed_frames_are_skipped(self):
+        huobi = Huobi("ethusdt")
+        ws = FakeWebSocket(
+            {"ch": "market.ethusdt.ticker", "ts": 1654932129289, "tick": {}},
+        )
+        ws.frames[:0] = [b"\x1f\x8b not quite gzip", gzip.compress(b'{"tick": ')]
+
+        resp = await huobi._receive(ws)
+        self.assertEqual(resp["ch"], "market.ethusdt.ticker")
+        self.assertEqual(huobi.health.malformed, 2)
+        self.assertEqual(huobi.health.messages, 3)
+
+    async def test_subscribe_answers_pings(self):
+        huobi = Huobi("ethusdt")
+        ws = FakeWebSocket(
+            {"ping": 1654931160555},
+            {"id": None, "status": "ok", "subbed": "market.ethusdt.ticker"},
+        )
+
+        self.assertTrue(await huobi._subscribe(Connection(ws, list(huobi.pairs))))
+        self.assertEqual(ws.sent[-1], {"pong": 1654931160555})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import asyncio
+import time
+import unittest
+
+from utils import loop
+from utils.loop import LoopLag
+
+
+class TestLoop(unittest.TestCase):
+    def tearDown(self):
+        loop.use("asyncio")
+
+    def test_uvloop_falls_back_when_missing(self):
+        used = loop.use("uvloop")
+        if loop.uvloop is None:
+            self.assertEqual(used, "asyncio")
+        else:
+            self.assertEqual(used, "uvloop")
+        self.assertEqual(loop.name, used)
+        asyncio.run(asyncio.sleep(0))
+
+    def test_unknown_loop(self):
+        self.assertRaises(ValueError, loop.use, "tokio")
+
+
+class TestLoopLag(unittest.IsolatedAsyncioTestCase):
+    def test_percentiles(self):
+        lag = LoopLag(window=4)
+        self.assertEqual(lag.percentiles(50, 99), [0.0, 0.0])
+        for value in (0.5, 0.001, 0.002, 0.003, 0.004, -0.001):
+            lag.record(value)
+        # only the last window lags are kept, the early wakeups count as no lag
+        self.assertEqual(lag.percentiles(50, 99), [0.003, 0.004])
+        self.assertEqual(lag.max, 0.5)
+
+    async def test_blocking_call_is_measured(self):
+        lag = LoopLag(interval=0.01, report_every=0, warn_above=0.02)
+        task = asyncio.create_task(lag.run())
+        await asyncio.sleep(0.03)
+
+        with self.assertLogs(level="WARNING") as logs:
+            time.sleep(0.05)
+            await asyncio.sleep(0.03)
+        task.cancel()
+
+        self.assertGreaterEqual(lag.max, 0.04)
+        self.assertIn("blocked for", logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import aiohttp
+import unittest
+
+from exchanges.binance import Binance
+from exchanges.ftx import FTX
+from platforms.base import BasePlatform
+from utils.loop import LoopLag
+from utils.metrics import Histogram, MetricsServer
+
+from calculate import Calculate
+from notify import Notify
+
+
+class Platform(BasePlatform):
+    def send(self, pair, prices):
+        return True
+
+
+class TestMetrics(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.exchanges = {"binance": Binance("ETH/USDT"), "ftx": FTX("ETH/USDT")}
+        self.platform = Platform(cooldown=60)
+        self.notify = Notify(
+            pairs={"ETHUSDT": {"key": "ETHUSDT"}},
+            calculate=Calculate(self.exchanges),
+            platforms={"platform": self.platform},
+            threshold=1.0,
+        )
+        self.server = MetricsServer(self.exchanges, self.notify, LoopLag())
+
+    def test_histogram(self):
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 5.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual(len(histogram), 4)
+
+    async def test_evaluations_and_cooldown(self):
+        self.exchanges["binance"]._update("ETHUSDT", 102.0, 1.0, 103.0, 1.0)
+        self.exchanges["ftx"]._update("ETHUSDT", 99.0, 1.0, 100.0, 1.0)
+        await self.notify.evaluate("ETHUSDT")
+        await self.notify.evaluate("ETHUSDT")
+
+        self.assertEqual(self.platform.notified, 1)
+        self.assertEqual(self.platform.suppressed, 1)
+        self.assertEqual(len(self.notify.evaluation), 2)
+        self.assertAlmostEqual(self.notify.spreads["ETHUSDT"], 2.0)
+
+        text = self.server.render()
+        self.assertIn('arbitrage_spread_percent{pair="ETHUSDT"} 2', text)
+        self.assertIn('arbitrage_notifications_total{platform="Platform"} 1', text)
+        self.assertIn(
+            'arbitrage_notifications_suppressed_total{platform="Platform"} 1', text
+        )
+        self.assertIn("arbitrage_evaluation_seconds_count 2", text)
+        self.assertIn(
+            'arbitrage_quote_age_seconds{exchange="FTX",pair="ETHUSDT"}', text
+        )
+
+    async def test_feeds(self):
+        health = self.exchanges["binance"].health
+        health.received()
+        health.subscribe_failures += 1
+        health.lifetimes.record(30.0)
+        health.parse_time.observe(2e-5)
+
+        text = self.server.render()
+        self.assertIn("# TYPE arbitrage_messages_total counter", text)
+        self.assertIn('arbitrage_messages_total{exchange="Binance"} 1', text)
+        self.assertIn('arbitrage_messages_total{exchange="FTX"} 0', text)
+        self.assertIn('arbitrage_subscribe_failures_total{exchange="Binance"} 1', text)
+        self.assertIn('arbitrage_reconnects_total{exchange="Binance"} 1', text)
+        self.assertIn(
+            'arbitrage_connection_lifetime_seconds_bucket{exchange="Binance",le="60"} 1',
+            text,
+        )
+        self.assertIn(
+            'arbitrage_parse_seconds_bucket{exchange="Binance",le="1e-05"} 0', text
+        )
+        self.assertIn(
+            'arbitrage_parse_seconds_bucket{exchange="Binance",le="+Inf"} 1', text
+        )
+        self.assertIn("# TYPE arbitrage_loop_lag_seconds summary", text)
+        self.assertIn('arbitrage_loop_lag_seconds{quantile="0.99"}', text)
+        self.assertIn("arbitrage_loop_lag_seconds_count ", text)
+        self.assertIn("arbitrage_loop_lag_max_seconds ", text)
+
+    async def test_served(self):
+        url = await self.server.start()
+        self.addAsyncCleanup(self.server.stop)
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url) as resp:
+                self.assertEqual(resp.status, 200)
+                self.assertIn("arbitrage_messages_total", await resp.text())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from exchanges.binance import Binance
+from exchanges.bitfinex import Bitfinex
+from exchanges.bybit import ByBit
+from exchanges.catalog import SymbolCatalog
+from exchanges.ftx import FTX
+from exchanges.huobi import Huobi
+from exchanges.kucoin import KuCoin
+from mock.exchanges import MOCKS
+
+PAIRS = [("BTC", "USDT"), ("ETH", "USDT")]
+
+# the pairs in the notation main.py passes to each exchange
+EXCHANGES = {
+    "binance": (Binance, ["BTCUSDT", "ETHUSDT"]),
+    "ftx": (FTX, ["BTC/USDT", "ETH/USDT"]),
+    "bybit": (ByBit, ["BTCUSDT", "ETHUSDT"]),
+    "huobi": (Huobi, ["BTCUSDT", "ETHUSDT"]),
+    "kucoin": (KuCoin, ["BTC-USDT", "ETH-USDT"]),
+    "bitfinex": (Bitfinex, ["BTC-USDT", "ETH-USDT"]),
+}
+
+
+class TestMockExchanges(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.catalog = SymbolCatalog(os.path.join(directory.name, "symbols.json"), 0)
+
+    async def stream(self, name, ticks=20, **kwargs):
+        """Run the exchange against its mock until it received ticks of every pair."""
+        mock = MOCKS[name](PAIRS, rate=200, seed=1, **kwargs)
+        url = await mock.start()
+        self.addAsyncCleanup(mock.stop)
+
+        cls, pairs = EXCHANGES[name]
+        exchange = cls(pairs, catalog=self.catalog)
+        exchange.use_base_url(url)
+        self.addAsyncCleanup(exchange.close)
+
+        received = []
+        exchange.register_callback(lambda exchange, key: received.append(key))
+
+        async def receive():
+            while len(received) < ticks or len(set(received)) < 2:
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(exchange.run())
+        try:
+            await asyncio.wait_for(receive(), 10)
+        finally:
+            task.cancel()
+            await asyncio.wait([task], timeout=1)
+
+        # the cancellation reaches the task rather than being swallowed by the connection loop
+        self.assertTrue(task.cancelled())
+
+        self.assertEqual(set(received), {"BTCUSDT", "ETHUSDT"})
+        return exchange, mock
+
+    async def test_handshakes(self):
+        for name in EXCHANGES:
+            with self.subTest(name):
+                await self.stream(name)
+
+    async def test_huobi_pings_are_answered(self):
+        exchange, mock = await self.stream("huobi", ticks=60, ping_interval=0.05)
+        self.assertGreater(mock.pongs, 0)
+        self.assertEqual(mock.connections, 1)
+
+    async def test_malformed_frames_are_skipped(self):
+        for name in ("binance", "huobi"):
+            with self.subTest(name):
+                exchange, mock = await self.stream(name, ticks=60, malformed_every=5)
+                self.assertGreater(exchange.health.malformed, 0)
+                self.assertEqual(mock.connections, 1)
+
+    async def test_reconnects(self):
+        exchange, mock = await self.stream("binance", ticks=60, disconnect_after=15)
+        self.assertGreater(mock.connections, 1)
+        self.assertGreater(len(exchange.health.lifetimes), 0)
+
+    def test_base_url(self):
+        huobi = Huobi("ethusdt")
+        huobi.use_base_url("http://127.0.0.1:9000")
+        self.assertEqual(huobi.api, "http://127.0.0.1:9000")
+        self.assertEqual(huobi.api_ws, "ws://127.0.0.1:9000/ws")
+        self.assertEqual(huobi.api_feed, "ws://127.0.0.1:9000/feed")
+        self.assertEqual(Huobi.api_ws, "wss://api.huobi.pro/ws")
+
+
+if __name__ == "__main__":
+    unittest.main()
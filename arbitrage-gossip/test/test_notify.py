@@ -1,9 +1,15 @@
 import unittest
 import dotenv
 import os
+from unittest import mock
 
+from exchanges.binance import Binance
+from exchanges.ftx import FTX
 from platforms.twitter import Twitter
 
+from calculate import Calculate
+from notify import Notify
+
 
 class TestPlatforms(unittest.IsolatedAsyncioTestCase):
     async def test_twitter_connectivity(self):
@@ -11,5 +17,35 @@ class TestPlatforms(unittest.IsolatedAsyncioTestCase):
         self.assertNotEqual(Twitter(15).authorize(), False)
 
 
+class TestNotify(unittest.IsolatedAsyncioTestCase):
+    async def test_evaluations_are_logged_at_most_every_interval(self):
+        binance, ftx = Binance("ETH/USDT"), FTX("ETH/USDT")
+        calculate = Calculate({"binance": binance, "ftx": ftx})
+        ftx._update("ETHUSDT", 99.0, 1.0, 100.0, 1.0)
+
+        with self.assertLogs(level="INFO") as logs, mock.patch(
+            "notify.time.monotonic"
+        ) as monotonic:
+            notify = Notify(
+                pairs={"ETHUSDT": {"key": "ETHUSDT"}},
+                calculate=calculate,
+                platforms={},
+                threshold=1.0,
+            )
+            # every tick changes the spread, only the first of each second is logged
+            for i, bid in enumerate((100.1, 100.2, 100.3, 100.4)):
+                monotonic.return_value = i * 0.4
+                binance._update("ETHUSDT", bid, 1.0, bid + 1, 1.0)
+                await notify.evaluate("ETHUSDT")
+            # crossing the threshold is logged right away
+            monotonic.return_value = 1.3
+            binance._update("ETHUSDT", 102.0, 1.0, 103.0, 1.0)
+            await notify.evaluate("ETHUSDT")
+
+        highest = [line for line in logs.output if "Highest bid" in line]
+        self.assertEqual(len(highest), 3)
+        self.assertIn("102.0", highest[-1])
+
+
 if __name__ == "__main__":
     unittest.main()
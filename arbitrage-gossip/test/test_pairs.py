@@ -0,0 +1,25 @@
+import unittest
+
+from utils.pairs import pair_key, parse_pair, make_pair
+
+
+class TestPairs(unittest.TestCase):
+    def test_pair_key(self):
+        for pair in ["eth/usdt", "ETH-USDT", "ethusdt", "ETH:USDT"]:
+            self.assertEqual(pair_key(pair), "ETHUSDT")
+
+    def test_parse_pair(self):
+        self.assertEqual(parse_pair("btc/usdt\n"), ("btc", "usdt"))
+        self.assertEqual(parse_pair("BTC-USDT"), ("BTC", "USDT"))
+        self.assertRaises(ValueError, parse_pair, "btcusdt")
+        self.assertRaises(ValueError, parse_pair, "btc/")
+
+    def test_make_pair(self):
+        pair = make_pair("Eth", "Usdt")
+        self.assertEqual(pair["merged"], "EthUsdt")
+        self.assertEqual(pair["/"], "Eth/Usdt")
+        self.assertEqual(pair["key"], "ETHUSDT")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from platforms.base import BasePlatform
+
+
+class SlowPlatform(BasePlatform):
+    """Blocks for a while on every delivery, like a rate limited api."""
+
+    def __init__(self, cooldown: float, queue_size: int = 16) -> None:
+        super().__init__(cooldown, queue_size)
+        self.sent = []
+        self.release = threading.Event()
+
+    def send(self, pair, prices) -> bool:
+        self.release.wait(1)
+        self.sent.append(prices)
+        return True
+
+
+class TestPlatforms(unittest.IsolatedAsyncioTestCase):
+    async def test_delivery_doesnt_block_the_loop(self):
+        platform = SlowPlatform(0)
+        worker = asyncio.create_task(platform.run())
+        platform.notify({}, {"id": 1})
+
+        # the event loop keeps running while the delivery is blocked
+        start = time.monotonic()
+        await asyncio.sleep(0.05)
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(platform.sent, [])
+
+        platform.release.set()
+        while not platform.sent:
+            await asyncio.sleep(0.01)
+        self.assertEqual(platform.sent, [{"id": 1}])
+        self.assertEqual(len(platform.delivery), 1)
+        worker.cancel()
+
+    async def test_drop_oldest(self):
+        platform = SlowPlatform(0, queue_size=2)
+        for i in range(4):
+            platform.notify({}, {"id": i})
+
+        self.assertEqual(platform.dropped, 2)
+        self.assertEqual(
+            [platform.queue.get_nowait()[2]["id"] for _ in range(2)], [2, 3]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from unittest import mock
+
+from exchanges.health import LifetimeHistogram
+from exchanges.reconnect import Reconnect
+
+
+class TestReconnect(unittest.IsolatedAsyncioTestCase):
+    async def test_backoff(self):
+        reconnect = Reconnect(base=0.3, cap=2.0)
+        self.assertEqual(reconnect.delay(), 0)
+
+        delays = []
+        with mock.patch("asyncio.sleep", new=mock.AsyncMock()) as sleep:
+            for _ in range(8):
+                bound = min(2.0, 0.3 * 2 ** max(reconnect.attempts - 1, 0))
+                await reconnect.wait()
+                if sleep.await_args:
+                    delays.append((sleep.await_args.args[0], bound))
+                sleep.reset_mock()
+
+        self.assertTrue(all(0 <= delay <= bound for delay, bound in delays))
+        self.assertEqual(reconnect.attempts, 8)
+
+        # once subscribed, the next reconnect is immediate
+        reconnect.established()
+        self.assertEqual(reconnect.delay(), 0)
+
+    async def test_rotation(self):
+        reconnect = Reconnect(max_lifetime=60)
+        self.assertIsNone(reconnect.remaining())
+
+        reconnect.established()
+        self.assertGreater(reconnect.remaining(), 59)
+        self.assertIsNone(Reconnect().clone().remaining())
+
+    async def test_lifetimes(self):
+        lifetimes = LifetimeHistogram()
+        reconnect = Reconnect(lifetimes=lifetimes)
+
+        # failed attempts aren't connections
+        await reconnect.wait()
+        self.assertEqual(len(lifetimes), 0)
+
+        reconnect.established()
+        with mock.patch(
+            "exchanges.reconnect.monotonic", return_value=reconnect.established_at + 90
+        ):
+            await reconnect.wait()
+        self.assertEqual(lifetimes.counts[2], 1)
+        self.assertIs(reconnect.clone().lifetimes, lifetimes)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from importlib.metadata import EntryPoint
+from unittest import mock
+
+from exchanges import registry
+from exchanges.base import BaseExchange
+
+
+class Plugin(BaseExchange):
+    """Exchange of a third-party package."""
+
+    notation = "/"
+
+    async def _fetch_symbols(self) -> dict:
+        return {}
+
+    def _on_message(self, msg, connection) -> None: ...
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self):
+        adapters = dict(registry.ADAPTERS)
+
+        def restore():
+            registry.ADAPTERS.clear()
+            registry.ADAPTERS.update(adapters)
+
+        self.addCleanup(restore)
+
+    def test_shipped_exchanges(self):
+        self.assertEqual(
+            registry.names()[:6],
+            ["binance", "ftx", "bybit", "huobi", "kucoin", "bitfinex"],
+        )
+        cls = registry.load("kucoin")
+        self.assertEqual(cls.__name__, "KuCoin")
+        self.assertEqual(cls.notation, "-")
+        self.assertIs(registry.load("kucoin"), cls)
+        self.assertRaises(KeyError, registry.load, "nope")
+
+    def test_register(self):
+        registry.register("Plugin", f"{__name__}:Plugin")
+        self.assertIn("plugin", registry.names())
+        self.assertIs(registry.load("plugin"), Plugin)
+
+        registry.register("broken", f"{__name__}:Missing")
+        self.assertRaises(ImportError, registry.load, "broken")
+
+    def test_entry_points(self):
+        entries = [
+            EntryPoint("plugin", f"{__name__}:Plugin", registry.ENTRY_POINTS),
+            EntryPoint("binance", f"{__name__}:Plugin", registry.ENTRY_POINTS),
+        ]
+        with mock.patch.object(registry, "entry_points", return_value=entries):
+            with mock.patch.object(registry, "_discovered", False):
+                with self.assertLogs(level="WARNING"):
+                    registry.discover()
+        self.assertIs(registry.load("plugin"), Plugin)
+        self.assertEqual(registry.ADAPTERS["binance"], "exchanges.binance:Binance")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import argparse
+import unittest
+
+from exchanges.binance import Binance
+from exchanges.ftx import FTX
+from shard import Coordinator, shards
+from utils.ring import HEARTBEAT, QUOTE, QuoteRing
+
+from calculate import Calculate
+
+
+class TestQuoteRing(unittest.TestCase):
+    def setUp(self):
+        self.ring = QuoteRing.create(4)
+
+        def cleanup():
+            self.ring.close()
+            self.ring.unlink()
+
+        self.addCleanup(cleanup)
+
+    def test_records_are_read_in_order(self):
+        self.ring.push(QUOTE, 1, 2, 100.0, 1.0, 101.0, 2.0, 5, 6, 7)
+        self.ring.push(HEARTBEAT, 3, 0)
+
+        self.assertEqual(len(self.ring), 2)
+        self.assertEqual(
+            self.ring.pop(),
+            [
+                (QUOTE, 1, 2, 100.0, 1.0, 101.0, 2.0, 5, 6, 7),
+                (HEARTBEAT, 3, 0, 0.0, 0.0, 0.0, 0.0, 0, 0, 0),
+            ],
+        )
+        self.assertEqual(len(self.ring), 0)
+        self.assertEqual(self.ring.pop(), [])
+
+    def test_records_wrap_around(self):
+        for i in range(3):
+            self.ring.push(QUOTE, 0, i)
+        self.assertEqual([record[2] for record in self.ring.pop(2)], [0, 1])
+
+        for i in range(3, 6):
+            self.ring.push(QUOTE, 0, i)
+        self.assertEqual([record[2] for record in self.ring.pop()], [2, 3, 4, 5])
+
+    def test_full_ring_drops_the_new_records(self):
+        self.assertEqual(self.ring.capacity, 4)
+        for i in range(4):
+            self.assertTrue(self.ring.push(QUOTE, 0, i))
+        self.assertFalse(self.ring.push(QUOTE, 0, 4))
+        self.assertEqual(self.ring.dropped, 1)
+
+        self.assertEqual([record[2] for record in self.ring.pop()], [0, 1, 2, 3])
+        self.assertTrue(self.ring.push(QUOTE, 0, 5))
+
+    def test_attached_ring_reads_the_records(self):
+        reader = QuoteRing.attach(self.ring.name)
+        self.addCleanup(reader.close)
+        self.assertEqual(reader.capacity, 4)
+
+        self.ring.push(QUOTE, 0, 1, 100.0)
+        self.assertEqual(reader.pop()[0][:4], (QUOTE, 0, 1, 100.0))
+        self.assertEqual(len(self.ring), 0)
+
+
+class TestCoordinator(unittest.IsolatedAsyncioTestCase):
+    def test_shards_spread_every_exchange(self):
+        assigned = shards(["binance", "ftx"], ["BTCUSDT", "ETHUSDT", "DOGEUSDT"], 4)
+        self.assertEqual(
+            assigned,
+            [
+                {"binance": ["BTCUSDT"], "ftx": ["ETHUSDT"]},
+                {"binance": ["ETHUSDT"], "ftx": ["DOGEUSDT"]},
+                {"binance": ["DOGEUSDT"]},
+                {"ftx": ["BTCUSDT"]},
+            ],
+        )
+        self.assertEqual(len(shards(["binance"], ["BTCUSDT"], 4)), 1)
+
+    async def test_drained_quotes_reach_calculate(self):
+        exchanges = {"binance": Binance("ETH/USDT"), "ftx": FTX("ETH/USDT")}
+        calculate = Calculate(exchanges=exchanges, max_age=30)
+        coordinator = Coordinator(
+            exchanges, {"ETHUSDT": {"key": "ETHUSDT"}}, argparse.Namespace(workers=1)
+        )
+        ring = QuoteRing.create(16)
+        self.addCleanup(ring.unlink)
+        self.addCleanup(ring.close)
+
+        ring.push(QUOTE, 0, 0, 100.0, 1.0, 101.0, 1.0, 0, 1_000, 1)
+        ring.push(QUOTE, 1, 0, 102.0, 1.0, 103.0, 1.0, 0, 2_000, 0)
+        ring.push(HEARTBEAT, 1, 0)
+        self.assertEqual(coordinator.drain(ring), 3)
+
+        self.assertEqual(exchanges["binance"].data["ETHUSDT"].bid, 100.0)
+        self.assertEqual(exchanges["binance"].data["ETHUSDT"].receive_time, 1_000)
+        self.assertEqual(exchanges["ftx"].data["ETHUSDT"].ask, 103.0)
+        # the heartbeat keeps the feed alive without being a message
+        self.assertEqual(exchanges["ftx"].health.messages, 1)
+        self.assertEqual(await calculate.wait_for_tick(), {"ETHUSDT"})
+
+        # the standby connections' duplicates are dropped just like in a single process
+        ring.push(QUOTE, 0, 0, 99.0, 1.0, 100.0, 1.0, 0, 3_000, 1)
+        coordinator.drain(ring)
+        self.assertEqual(exchanges["binance"].data["ETHUSDT"].bid, 100.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
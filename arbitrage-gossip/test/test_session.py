@@ -0,0 +1,47 @@
+import asyncio
+import unittest
+
+from aiohttp import web
+
+from exchanges.session import create_session
+
+
+class TestSession(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        async def websocket(request):
+            ws = web.WebSocketResponse()
+            await ws.prepare(request)
+            async for _ in ws:
+                ...
+            return ws
+
+        async def listing(request):
+            return web.json_response({"symbols": []})
+
+        app = web.Application()
+        app.add_routes([web.get("/ws", websocket), web.get("/symbols", listing)])
+        runner = web.AppRunner(app)
+        await runner.setup()
+        self.addAsyncCleanup(runner.cleanup)
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+    async def test_websockets_arent_capped(self):
+        session = create_session(limit_per_host=2)
+        self.addAsyncCleanup(session.close)
+
+        sockets = [
+            await asyncio.wait_for(session.ws_connect(f"{self.url}/ws"), 5)
+            for _ in range(3)
+        ]
+        # the rest calls to the same host still go through
+        async with session.get(f"{self.url}/symbols") as resp:
+            self.assertEqual(await resp.json(), {"symbols": []})
+
+        for ws in sockets:
+            await ws.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
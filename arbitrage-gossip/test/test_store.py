@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+
+from exchanges.binance import Binance
+from exchanges.ftx import FTX
+from store import TickStore, query_opportunities, query_quotes
+
+from calculate import Calculate
+from notify import Notify
+
+
+class TestTickStore(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "ticks.db")
+
+        self.binance, self.ftx = Binance("ETH/USDT"), FTX("ETH/USDT")
+        self.store = TickStore(self.path)
+        for exchange in (self.binance, self.ftx):
+            exchange.register_callback(self.store.on_tick)
+
+    async def asyncTearDown(self):
+        self.store.executor.submit(self.store.close)
+        self.store.executor.shutdown(wait=True)
+
+    async def test_quotes_are_queried_by_pair_and_time(self):
+        self.binance._update("ETHUSDT", 100.0, 1.0, 101.0, 2.0, receive_time=1_000)
+        self.ftx._update("ETHUSDT", 102.0, 1.0, 103.0, 2.0, receive_time=2_000)
+        self.binance._update("ETHUSDT", 99.0, 1.0, 100.0, 2.0, receive_time=3_000)
+        await self.store.flush()
+        self.assertEqual(self.store.written, 3)
+
+        rows = query_quotes(self.path, "ETHUSDT", 1_000, 3_000)
+        self.assertEqual(
+            [row[:4] for row in rows],
+            [
+                (1_000, "Binance", "ETHUSDT", 100.0),
+                (2_000, "FTX", "ETHUSDT", 102.0),
+            ],
+        )
+        rows = query_quotes(self.path, "ETHUSDT", 0, 10_000, exchange="Binance")
+        self.assertEqual([row[0] for row in rows], [1_000, 3_000])
+        self.assertEqual(query_quotes(self.path, "BTCUSDT", 0, 10_000), [])
+
+    async def test_evaluations_are_stored(self):
+        notify = Notify(
+            pairs={"ETHUSDT": {"key": "ETHUSDT"}},
+            calculate=Calculate({"binance": self.binance, "ftx": self.ftx}),
+            platforms={},
+            threshold=1.0,
+        )
+        notify.register_callback(self.store.on_evaluation)
+
+        self.binance._update("ETHUSDT", 102.0, 1.0, 103.0, 1.0, receive_time=1_000)
+        self.ftx._update("ETHUSDT", 99.0, 1.0, 100.0, 1.0, receive_time=2_000)
+        await notify.evaluate("ETHUSDT")
+        await self.store.flush()
+
+        self.assertEqual(
+            query_opportunities(self.path, "ETHUSDT", 0, 10_000),
+            [(2_000, "ETHUSDT", "Binance", 102.0, "FTX", 100.0, 2.0)],
+        )
+
+    async def test_rows_are_dropped_when_behind(self):
+        self.store.max_pending = 2
+        for i in range(1, 4):
+            self.binance._update("ETHUSDT", 100.0 + i, 1.0, 110.0, 1.0, receive_time=i)
+        self.assertEqual(self.store.dropped, 1)
+
+        await self.store.flush()
+        self.assertEqual(len(query_quotes(self.path, "ETHUSDT", 0, 10)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import random
+import unittest
+
+from utils.tracker import PriceTracker
+
+
+class TestPriceTracker(unittest.TestCase):
+    def test_matches_full_scan(self):
+        rng = random.Random(7)
+        tracker = PriceTracker()
+        prices = {}
+        for _ in range(5000):
+            key = f"exchange{rng.randrange(30)}"
+            price = float(rng.randrange(100, 110))
+            tracker.update(key, price)
+            prices[key] = price
+
+            self.assertEqual(tracker.prices[tracker.min()], min(prices.values()))
+            self.assertEqual(tracker.prices[tracker.max()], max(prices.values()))
+
+        # outdated entries don't pile up
+        self.assertLessEqual(
+            len(tracker._min_heap) + len(tracker._max_heap), 4 * len(prices) + 66
+        )
+
+    def test_ties_are_deterministic(self):
+        tracker = PriceTracker()
+        for key in ["binance", "ftx", "kucoin"]:
+            tracker.update(key, 100.0)
+
+        self.assertEqual(tracker.min(), "binance")
+        self.assertEqual(tracker.max(), "kucoin")
+
+    def test_discard(self):
+        tracker = PriceTracker()
+        tracker.update("binance", 100.0)
+        tracker.update("ftx", 101.0)
+        tracker.discard("ftx")
+
+        self.assertEqual(tracker.max(), "binance")
+        self.assertNotIn("ftx", tracker)
+
+        tracker.update("ftx", 99.0)
+        self.assertEqual(tracker.min(), "ftx")
+
+    def test_exclude(self):
+        tracker = PriceTracker()
+        tracker.update("binance", 100.0)
+        tracker.update("ftx", 101.0)
+        tracker.update("kucoin", 102.0)
+        tracker.update("ftx", 103.0)
+
+        self.assertEqual(tracker.max(exclude="ftx"), "kucoin")
+        self.assertEqual(tracker.min(exclude="binance"), "kucoin")
+        self.assertEqual(tracker.max(exclude="binance"), "ftx")
+        # the excluded top stays in place
+        self.assertEqual(tracker.max(), "ftx")
+
+        tracker.discard("kucoin")
+        tracker.discard("binance")
+        self.assertIsNone(tracker.max(exclude="ftx"))
+
+
+if __name__ == "__main__":
+    unittest.main()
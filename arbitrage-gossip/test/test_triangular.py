@@ -0,0 +1,102 @@
+import math
+import unittest
+
+from exchanges.binance import Binance
+from exchanges.ftx import FTX
+from utils.pairs import cross_pairs, make_pair
+
+from triangular import CurrencyGraph, Triangular
+
+
+class TestCurrencyGraph(unittest.TestCase):
+    def test_best_edge(self):
+        graph = CurrencyGraph()
+        graph.update("BTC", "USDT", "Binance", 100.0)
+        graph.update("BTC", "USDT", "FTX", 101.0)
+        self.assertEqual(graph.best[("BTC", "USDT")], (-math.log(101.0), "FTX"))
+        self.assertEqual(graph.changed, {("BTC", "USDT")})
+
+        graph.changed.clear()
+        graph.update("BTC", "USDT", "Binance", 99.0)
+        self.assertEqual(graph.changed, set())
+
+        graph.update("BTC", "USDT", "FTX", 0)
+        self.assertEqual(graph.best[("BTC", "USDT")][1], "Binance")
+        graph.discard("Binance")
+        self.assertEqual(len(graph), 0)
+        self.assertEqual(graph.successors["BTC"], set())
+
+    def test_cycles_through(self):
+        graph = CurrencyGraph()
+        graph.update("USDT", "BTC", "Binance", 1 / 100.0)
+        graph.update("BTC", "USDC", "FTX", 101.0)
+        graph.update("USDC", "USDT", "Binance", 1.0)
+        # a 2 edge cycle, left to Calculate
+        graph.update("BTC", "USDT", "FTX", 102.0)
+
+        cycles = graph.cycles_through(("USDC", "USDT"))
+        self.assertEqual(len(cycles), 1)
+        self.assertEqual(cycles[0].assets, ("BTC", "USDC", "USDT"))
+        self.assertEqual(cycles[0].exchanges, ("FTX", "Binance", "Binance"))
+        self.assertAlmostEqual(cycles[0].gain, 1.0)
+
+        found, searched = graph.search()
+        self.assertEqual(list(found), [("BTC", "USDC", "USDT")])
+        self.assertEqual(len(searched), 4)
+        self.assertEqual(graph.search(), ({}, set()))
+
+
+class TestTriangular(unittest.TestCase):
+    def setUp(self):
+        pairs = [("BTC", "USDT"), ("BTC", "USDC"), ("USDC", "USDT")]
+        self.pairs = {p["key"]: p for p in (make_pair(*pair) for pair in pairs)}
+        symbols = [p["merged"] for p in self.pairs.values()]
+        self.binance, self.ftx = Binance(symbols), FTX(symbols)
+        for exchange in (self.binance, self.ftx):
+            exchange.taker_fee = 0.0
+        self.triangular = Triangular(
+            self.pairs, {"binance": self.binance, "ftx": self.ftx}, threshold=0.5
+        )
+
+    def test_cycle_opens_and_closes(self):
+        opened = []
+        self.triangular.register_callback(opened.append)
+        self.binance._update("BTCUSDT", 100.0, 1.0, 100.0, 1.0)
+        self.binance._update("USDCUSDT", 1.0, 1.0, 1.0, 1.0)
+        self.ftx._update("BTCUSDC", 101.0, 1.0, 101.0, 1.0)
+        self.assertTrue(self.triangular.updated.is_set())
+
+        self.assertEqual(self.triangular.evaluate(), opened)
+        self.assertEqual(
+            [str(cycle) for cycle in opened],
+            ["BTC (FTX) -> USDC (Binance) -> USDT (Binance) -> BTC"],
+        )
+        self.assertAlmostEqual(opened[0].gain, 1.0)
+
+        # an unrelated edge doesn't reopen it
+        self.ftx._update("USDCUSDT", 0.9, 1.0, 1.1, 1.0)
+        self.assertEqual(self.triangular.evaluate(), [])
+        self.assertEqual(len(self.triangular.open), 1)
+
+        self.ftx._update("BTCUSDC", 100.2, 1.0, 100.2, 1.0)
+        self.assertEqual(self.triangular.evaluate(), [])
+        self.assertEqual(self.triangular.open, {})
+
+    def test_fees(self):
+        self.binance.taker_fee = 0.003
+        self.binance._update("BTCUSDT", 100.0, 1.0, 100.0, 1.0)
+        self.binance._update("USDCUSDT", 1.0, 1.0, 1.0, 1.0)
+        self.ftx._update("BTCUSDC", 101.0, 1.0, 101.0, 1.0)
+        self.assertEqual(self.triangular.evaluate(), [])
+
+
+class TestCrossPairs(unittest.TestCase):
+    def test_cross_pairs(self):
+        self.assertEqual(
+            cross_pairs([("eth", "usdt")], ["usdt", "usdc"]),
+            [("ETH", "USDC"), ("USDT", "USDC"), ("USDC", "USDT")],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
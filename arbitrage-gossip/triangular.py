@@ -0,0 +1,278 @@
+import asyncio
+import logging as log
+import math
+from time import monotonic_ns
+from typing import Any, Callable, NamedTuple
+
+from exchanges.base import BaseExchange
+
+# an edge of the graph, converting the first asset into the second
+Edge = tuple[str, str]
+
+
+class Cycle(NamedTuple):
+    """Assets converted into one another in turn, back into the first one."""
+
+    """Assets of the cycle, starting from the alphabetically first one"""
+    assets: tuple[str, ...]
+
+    """Exchange converting each asset into the next one"""
+    exchanges: tuple[str, ...]
+
+    """Sum of the edge weights, negative when the cycle ends with more than it started with"""
+    weight: float
+
+    @property
+    def gain(self) -> float:
+        """What going around the cycle once earns after the fees, in %."""
+        return (math.exp(-self.weight) - 1) * 100
+
+    def __str__(self) -> str:
+        steps = " -> ".join(
+            f"{asset} ({exchange})"
+            for asset, exchange in zip(self.assets, self.exchanges)
+        )
+        return f"{steps} -> {self.assets[0]}"
+
+
+class CurrencyGraph:
+    """The best rate at which each asset converts into another one, among all the exchanges.
+
+    Selling the base of a pair at the bid & buying it back at the ask are the
+    two directed edges of the pair, weighted by the negative log of their rate
+    after the taker fee, so that the weights of a cycle add up to a negative
+    number exactly when going around it earns something. Parallel edges of
+    different exchanges are reduced to the best one, the assets being assumed
+    to be held on every exchange.
+    """
+
+    def __init__(self, max_length: int = 3) -> None:
+        """Longest cycle searched for, in edges"""
+        self.max_length = max_length
+
+        """Weight of each edge per exchange"""
+        self.quotes: dict[Edge, dict[str, float]] = {}
+
+        """Lowest weight of each edge & the exchange offering it"""
+        self.best: dict[Edge, tuple[float, str]] = {}
+
+        """Assets each asset converts into"""
+        self.successors: dict[str, set[str]] = {}
+
+        """Edges whose best weight changed since the last search"""
+        self.changed: set[Edge] = set()
+
+    def __len__(self) -> int:
+        return len(self.best)
+
+    def update(self, source: str, target: str, exchange: str, rate: float) -> None:
+        """Set the rate at which exchange converts source into target, 0 removes it."""
+        edge = (source, target)
+        quotes = self.quotes.setdefault(edge, {})
+        if rate > 0:
+            quotes[exchange] = -math.log(rate)
+        elif quotes.pop(exchange, None) is None:
+            return
+
+        # only a handful of exchanges quote the same edge, scanning them beats keeping a heap
+        best = min(((w, name) for name, w in quotes.items()), default=None)
+        if best == self.best.get(edge):
+            return
+        if best is None:
+            del self.best[edge]
+            self.successors[source].discard(target)
+        else:
+            self.best[edge] = best
+            self.successors.setdefault(source, set()).add(target)
+        self.changed.add(edge)
+
+    def discard(self, exchange: str) -> None:
+        """Remove every edge of exchange."""
+        for source, target in [e for e, q in self.quotes.items() if exchange in q]:
+            self.update(source, target, exchange, 0)
+
+    def cycles_through(self, edge: Edge) -> list[Cycle]:
+        """The cycles running through edge whose weight is negative.
+
+        The other edges are walked depth first from the end of edge back to its
+        start, at most max_length edges in total, pruning nothing but revisited
+        assets. The cycles of 2 edges are left out, they are the price
+        differences of a single pair that Calculate already compares.
+        """
+        if edge not in self.best:
+            return []
+
+        source, target = edge
+        found = []
+        path = [source, target]
+        weight = self.best[edge][0]
+
+        def walk(asset: str, weight: float) -> None:
+            if len(path) == self.max_length:
+                # the last edge can only lead back to the start
+                last = self.best.get((asset, source))
+                if last is not None and weight + last[0] < 0:
+                    found.append(self._cycle(path, weight + last[0]))
+                return
+
+            for successor in self.successors.get(asset, ()):
+                step = self.best[(asset, successor)][0]
+                if successor == source:
+                    if len(path) > 2 and weight + step < 0:
+                        found.append(self._cycle(path, weight + step))
+                elif successor not in path:
+                    path.append(successor)
+                    walk(successor, weight + step)
+                    path.pop()
+
+        walk(target, weight)
+        return found
+
+    def _cycle(self, path: list[str], weight: float) -> Cycle:
+        # the same cycle is found through each of its edges, it is rotated to start from the same asset
+        first = path.index(min(path))
+        assets = tuple(path[first:] + path[:first])
+        exchanges = tuple(
+            self.best[(asset, assets[(i + 1) % len(assets)])][1]
+            for i, asset in enumerate(assets)
+        )
+        return Cycle(assets, exchanges, weight)
+
+    def search(self) -> tuple[dict[tuple[str, ...], Cycle], set[Edge]]:
+        """Search the cycles running through the edges changed since the last search.
+
+        Returns the negative cycles found, by assets, & the edges searched
+        through. Any other cycle through these edges is no longer negative.
+        """
+        changed, self.changed = self.changed, set()
+        found = {}
+        for edge in changed:
+            for cycle in self.cycles_through(edge):
+                found[cycle.assets] = cycle
+        return found, changed
+
+
+class Triangular:
+    """Look for cycles of conversions across the quote assets that earn more than the threshold.
+
+    Every tick updates the two edges of its pair in the currency graph, only
+    the cycles through the edges whose best rate changed are searched again.
+    """
+
+    def __init__(
+        self,
+        pairs: dict[str, dict[str, Any]],
+        exchanges: dict[str, BaseExchange],
+        threshold: float,
+        max_age: float = 0,
+        max_length: int = 3,
+    ) -> None:
+        """Base & quote assets of each monitored pair key"""
+        self.assets = {
+            key: (pair["base"].upper(), pair["quote"].upper())
+            for key, pair in pairs.items()
+        }
+
+        """All implemented exchanges"""
+        self.exchanges = exchanges
+
+        """Gain in % after the fees from which a cycle is reported"""
+        self.threshold = threshold
+
+        """Exchanges silent for longer than max_age seconds are left out, 0 keeps them forever"""
+        self.max_age = max_age
+
+        """Best conversion rates between the assets"""
+        self.graph = CurrencyGraph(max_length)
+
+        """Cycles currently earning more than the threshold, by assets"""
+        self.open: dict[tuple[str, ...], Cycle] = {}
+
+        """Set whenever an edge of the graph changes"""
+        self.updated = asyncio.Event()
+
+        """Functions called with every cycle once it earns more than the threshold"""
+        self.callbacks: list[Callable[[Cycle], None]] = []
+
+        for exchange in self.exchanges.values():
+            exchange.register_callback(self.on_tick)
+
+    def register_callback(self, callback: Callable[[Cycle], None]) -> None:
+        """Register a function to be called on every opened cycle."""
+        self.callbacks.append(callback)
+
+    def on_tick(self, exchange: BaseExchange, key: str) -> None:
+        """Called by the exchanges on every top of the book update."""
+        assets = self.assets.get(key)
+        if assets is None:
+            return
+        base, quote = assets
+        top = exchange.data[key]
+        fee = exchange.taker_fee
+        self.graph.update(
+            base, quote, exchange.exchange, top.bid * (1 - fee) if top.bid_size else 0
+        )
+        self.graph.update(
+            quote,
+            base,
+            exchange.exchange,
+            1 / (top.ask * (1 + fee)) if top.ask and top.ask_size else 0,
+        )
+        if self.graph.changed:
+            self.updated.set()
+
+    def _stale(self, cycle: Cycle, now: int) -> list[BaseExchange]:
+        if self.max_age <= 0:
+            return []
+        by_name = {exchange.exchange: exchange for exchange in self.exchanges.values()}
+        return [
+            by_name[name]
+            for name in set(cycle.exchanges)
+            if by_name[name].health.silence(now) > self.max_age * 1e9
+        ]
+
+    def evaluate(self) -> list[Cycle]:
+        """Search the changed edges, returns the cycles that started earning more than the threshold."""
+        found, searched = self.graph.search()
+
+        # the stale quotes are only looked for among the found cycles, and dropped until their exchange ticks again
+        now = monotonic_ns()
+        for assets, cycle in list(found.items()):
+            stale = self._stale(cycle, now)
+            for exchange in stale:
+                log.debug("Leaving out the stale %s quotes", exchange.exchange)
+                self.graph.discard(exchange.exchange)
+            if stale:
+                del found[assets]
+
+        # the open cycles through the searched edges that weren't found again closed
+        for assets, cycle in list(self.open.items()):
+            edges = zip(assets, assets[1:] + assets[:1])
+            if assets not in found and not searched.isdisjoint(edges):
+                log.debug("Closed %s", cycle)
+                del self.open[assets]
+
+        opened = []
+        for assets, cycle in found.items():
+            if cycle.gain < self.threshold:
+                self.open.pop(assets, None)
+                continue
+            if assets not in self.open:
+                opened.append(cycle)
+            self.open[assets] = cycle
+
+        for cycle in opened:
+            log.info("Cycle %s earns %.4f%% after fees", cycle, cycle.gain)
+            for callback in self.callbacks:
+                callback(cycle)
+        return opened
+
+    async def run(self) -> None:
+        """Search the graph whenever an edge changes, until cancelled."""
+        log.info(
+            f"Searching the cycles across {len({a for pair in self.assets.values() for a in pair})} assets"
+        )
+        while True:
+            await self.updated.wait()
+            self.updated.clear()
+            self.evaluate()
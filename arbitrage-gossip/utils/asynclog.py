@@ -0,0 +1,186 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import queue
+from typing import Any, Optional
+
+# records waiting to be written, past which the new ones are dropped rather than blocking the event loop
+QUEUE_SIZE = 100_000
+
+# records written before the handlers get flushed, while they keep coming
+BATCH_SIZE = 1024
+
+FORMAT = "%(asctime)s %(levelname)s %(message)s"
+DATEFMT = "%Y/%m/%dT%H:%M:%S"
+
+# queue the records are passed through to the writer, shared with the worker processes
+log_queue: Optional[Any] = None
+
+# writes the queued records, running in a thread of the main process
+listener: Optional["BatchingListener"] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Format the records as JSON lines, e.g.
+    {"time": "2022/06/11T08:31:05", "level": "INFO", "process": "MainProcess", "message": "..."}
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "process": record.processName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class BatchedFlush:
+    """Mixin of the stream handlers, leaving the flush to the listener once per batch of records."""
+
+    def flush(self) -> None:
+        # called by emit() after each record
+        ...
+
+    def flush_batch(self) -> None:
+        logging.StreamHandler.flush(self)
+
+
+class BatchedStreamHandler(BatchedFlush, logging.StreamHandler):
+    ...
+
+
+class BatchedFileHandler(BatchedFlush, logging.FileHandler):
+    ...
+
+
+class BatchedRotatingFileHandler(BatchedFlush, logging.handlers.RotatingFileHandler):
+    ...
+
+
+class BatchedTimedRotatingFileHandler(
+    BatchedFlush, logging.handlers.TimedRotatingFileHandler
+):
+    ...
+
+
+def file_handler(
+    path: str, max_size: float = 0, rotate: str = "none", backups: int = 7
+) -> logging.FileHandler:
+    """Handler writing into path, rotated once it grows over max_size MB or at each rotate interval."""
+    if rotate != "none":
+        when = {"hourly": "H", "midnight": "midnight"}[rotate]
+        return BatchedTimedRotatingFileHandler(path, when=when, backupCount=backups)
+    if max_size:
+        return BatchedRotatingFileHandler(
+            path, maxBytes=int(max_size * 1024 * 1024), backupCount=backups
+        )
+    return BatchedFileHandler(path)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Put the records on the queue, dropping them when it's full instead of waiting for the writer."""
+
+    def __init__(self, records: Any) -> None:
+        super().__init__(records)
+
+        """Records dropped because the queue was full"""
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchingListener(logging.handlers.QueueListener):
+    """Write the queued records in a background thread, flushing the handlers once per batch.
+
+    The handlers are flushed whenever the queue runs empty, or after
+    BATCH_SIZE records while it doesn't, so a burst of records costs a single
+    write instead of one per record.
+    """
+
+    def __init__(self, records: Any, *handlers: logging.Handler) -> None:
+        super().__init__(records, *handlers, respect_handler_level=True)
+        self._pending = 0
+
+    def handle(self, record: logging.LogRecord) -> None:
+        super().handle(record)
+        self._pending += 1
+        if self._pending >= BATCH_SIZE or self.queue.empty():
+            self.flush()
+
+    def flush(self) -> None:
+        self._pending = 0
+        for handler in self.handlers:
+            if isinstance(handler, BatchedFlush):
+                handler.flush_batch()
+
+    def stop(self) -> None:
+        super().stop()
+        self.flush()
+
+
+def start(
+    handlers: list[logging.Handler],
+    level: int,
+    fmt: str = "text",
+    shared: bool = False,
+) -> None:
+    """Route the logging of this process through a queue to handlers, written by a background thread.
+
+    fmt is "text" or "json" (lines). With shared, the queue is a multiprocessing
+    one, which the worker processes forward their records to.
+    """
+    global log_queue, listener
+
+    formatter = JsonFormatter(datefmt=DATEFMT) if fmt == "json" else None
+    for handler in handlers:
+        handler.setFormatter(formatter or logging.Formatter(FORMAT, DATEFMT))
+
+    if shared:
+        log_queue = multiprocessing.get_context("spawn").Queue(QUEUE_SIZE)
+    else:
+        log_queue = queue.Queue(QUEUE_SIZE)
+
+    listener = BatchingListener(log_queue, *handlers)
+    forward(log_queue, level)
+    listener.start()
+    atexit.register(stop)
+
+
+def forward(records: Any, level: int) -> None:
+    """Replace the handlers of the root logger by one putting the records on the records queue."""
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(DroppingQueueHandler(records))
+    root.setLevel(level)
+
+
+def stop() -> None:
+    """Write the records still queued & stop the writer."""
+    global listener
+    if listener is None:
+        return
+
+    root = logging.getLogger()
+    dropped = sum(
+        handler.dropped
+        for handler in root.handlers
+        if isinstance(handler, DroppingQueueHandler)
+    )
+    if dropped:
+        logging.warning(f"Dropped {dropped} log records, the log writer fell behind")
+
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+    listener = None
@@ -0,0 +1,36 @@
+import logging
+
+# log one in every sample_every hot path messages, set through --log-sample
+sample_every: int = 1
+
+
+class DebugSampler:
+    """Decide whether a message on a hot path gets logged at debug level.
+
+    The decision is a flag check plus a countdown, so unless debug logging is
+    enabled nothing gets formatted. Meant to be used as
+        if self.debug():
+            log.debug("%s %s", self.exchange, msg)
+    """
+
+    __slots__ = ("enabled", "every", "countdown")
+
+    def __init__(self, logger: logging.Logger = logging.getLogger()) -> None:
+        """Whether debug logging was enabled when the sampler was created"""
+        self.enabled = logger.isEnabledFor(logging.DEBUG)
+
+        """Log one in every N messages"""
+        self.every = max(1, sample_every)
+
+        """Messages left until the next logged one"""
+        self.countdown = 1
+
+    def __call__(self) -> bool:
+        if not self.enabled:
+            return False
+
+        self.countdown -= 1
+        if self.countdown:
+            return False
+        self.countdown = self.every
+        return True
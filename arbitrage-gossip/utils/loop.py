@@ -0,0 +1,113 @@
+import asyncio
+import logging as log
+from collections import deque
+
+# uvloop is optional, the standard library's event loop is always available
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+LOOPS = ["asyncio", "uvloop"]
+
+# name of the event loop asyncio.run creates
+name: str = "asyncio"
+
+
+def use(loop: str) -> str:
+    """Select the event loop asyncio.run creates from now on, returns the one actually used.
+
+    Falls back to the asyncio event loop, with a warning, when uvloop isn't installed.
+    """
+    global name
+    if loop not in LOOPS:
+        raise ValueError(f"Event loop '{loop}' isn't supported, available: {LOOPS}")
+
+    if loop == "uvloop" and uvloop is None:
+        log.warning("uvloop isn't installed, falling back to the asyncio event loop")
+        loop = "asyncio"
+
+    if loop == "uvloop":
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    else:
+        asyncio.set_event_loop_policy(None)
+    name = loop
+    return name
+
+
+class LoopLag:
+    """Measure continuously how late the event loop wakes up a sleeping task.
+
+    Every interval seconds the monitor sleeps & records by how much it
+    oversleeps, which is how long the loop was busy running other callbacks,
+    e.g. a blocking call stalling every feed. Each lag longer than warn_above
+    gets logged as it happens, the p50 & p99 of the recent ones every
+    report_every seconds.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.1,
+        window: int = 600,
+        report_every: float = 60.0,
+        warn_above: float = 0.1,
+        label: str = "Event loop",
+    ) -> None:
+        """Seconds between the measurements"""
+        self.interval = interval
+
+        """The last window lags, in seconds"""
+        self.lags: deque[float] = deque(maxlen=window)
+
+        """Seconds between the logged reports, 0 never logs them"""
+        self.report_every = report_every
+
+        """Lag in seconds from which each measurement gets logged as a warning"""
+        self.warn_above = warn_above
+
+        """Prefix of the logged messages, telling the processes apart"""
+        self.label = label
+
+        """Longest lag since the start"""
+        self.max = 0.0
+
+        """Sum of all the lags since the start, in seconds"""
+        self.total = 0.0
+
+        """Number of lags measured since the start"""
+        self.count = 0
+
+    def record(self, lag: float) -> None:
+        lag = max(lag, 0.0)
+        self.lags.append(lag)
+        self.total += lag
+        self.count += 1
+        if lag > self.max:
+            self.max = lag
+
+    def percentiles(self, *ps: float) -> list[float]:
+        """The ps percentiles of the recent lags in seconds, by the nearest rank."""
+        if not self.lags:
+            return [0.0] * len(ps)
+        lags = sorted(self.lags)
+        return [lags[min(len(lags) - 1, int(p / 100 * len(lags)))] for p in ps]
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        reported = loop.time()
+        while True:
+            due = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            now = loop.time()
+            lag = now - due
+            self.record(lag)
+
+            if lag > self.warn_above:
+                log.warning(f"{self.label} blocked for {lag * 1e3:.0f} ms")
+            if self.report_every and now - reported >= self.report_every:
+                reported = now
+                log.info(f"{self.label} {self}")
+
+    def __repr__(self) -> str:
+        p50, p99 = self.percentiles(50, 99)
+        return f"lag p50={p50 * 1e3:.2f}ms p99={p99 * 1e3:.2f}ms max={self.max * 1e3:.2f}ms"
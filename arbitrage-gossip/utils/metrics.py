@@ -0,0 +1,287 @@
+import asyncio
+import logging as log
+from bisect import bisect_left
+from time import monotonic_ns, time_ns
+from typing import Any, Callable, Iterable, Optional
+
+from aiohttp import web
+
+# upper bounds, in seconds, of the buckets of the short durations, e.g. parsing a message or evaluating a pair
+LATENCY_BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 0.1)
+
+# upper bounds, in seconds, of the buckets of the notification deliveries
+DELIVERY_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Counts of the observed values per bucket, bound to the object observing them.
+
+    A value is counted in the first bucket whose bound it doesn't exceed, the
+    ones over the last bound in an overflow bucket. Observing is a bisect &
+    two additions, no lookup by labels.
+    """
+
+    __slots__ = ("bounds", "counts", "total")
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        """Upper bounds of the buckets, increasing"""
+        self.bounds = bounds
+
+        """Number of values per bucket, the last one being the overflow"""
+        self.counts: list[int] = [0] * (len(bounds) + 1)
+
+        """Sum of the values"""
+        self.total: float = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+
+    def __len__(self) -> int:
+        return sum(self.counts)
+
+
+class Exposition:
+    """Builds the Prometheus text exposition of the metrics."""
+
+    def __init__(self) -> None:
+        self.lines: list[str] = []
+
+    def family(self, name: str, kind: str, help: str) -> None:
+        self.lines.append(f"# HELP {name} {help}")
+        self.lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name: str, value: float, **labels: Any) -> None:
+        self.lines.append(f"{name}{_labels(labels)} {value:g}")
+
+    def histogram(self, name: str, histogram: Histogram, **labels: Any) -> None:
+        """The cumulative buckets, the sum & the count of histogram."""
+        cumulative = 0
+        for bound, count in zip(histogram.bounds, histogram.counts):
+            cumulative += count
+            self.sample(f"{name}_bucket", cumulative, **labels, le=f"{bound:g}")
+        cumulative += histogram.counts[-1]
+        self.sample(f"{name}_bucket", cumulative, **labels, le="+Inf")
+        self.sample(f"{name}_sum", histogram.total, **labels)
+        self.sample(f"{name}_count", cumulative, **labels)
+
+    def __str__(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def _labels(labels: dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for value in labels.values()
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+class MetricsServer:
+    """Serves the metrics of the feeds, Calculate & Notify over http, at /metrics.
+
+    The hot paths only update the counters & histograms bound to the objects
+    they run in, everything else, e.g. the quote ages, is read when scraped.
+    """
+
+    def __init__(
+        self,
+        exchanges: dict[str, Any],
+        notify: Any,
+        lag: Optional[Any] = None,
+    ) -> None:
+        """Exchanges holding the quotes, by name"""
+        self.exchanges = exchanges
+
+        """Notify, evaluating the pairs & notifying the platforms"""
+        self.notify = notify
+
+        """LoopLag measuring the event loop"""
+        self.lag = lag
+
+        self._runner: Optional[web.AppRunner] = None
+
+    def render(self) -> str:
+        out = Exposition()
+        exchanges = self.exchanges.values()
+        self._feeds(out, exchanges)
+        self._quotes(out, exchanges)
+        self._evaluations(out)
+        self._platforms(out)
+        if self.lag is not None:
+            out.family(
+                "arbitrage_loop_lag_seconds",
+                "summary",
+                "Lag of the event loop waking up the tasks, the quantiles over the recent ones",
+            )
+            p50, p99 = self.lag.percentiles(50, 99)
+            out.sample("arbitrage_loop_lag_seconds", p50, quantile="0.5")
+            out.sample("arbitrage_loop_lag_seconds", p99, quantile="0.99")
+            out.sample("arbitrage_loop_lag_seconds_sum", self.lag.total)
+            out.sample("arbitrage_loop_lag_seconds_count", self.lag.count)
+            out.family(
+                "arbitrage_loop_lag_max_seconds",
+                "gauge",
+                "Longest lag of the event loop since the start",
+            )
+            out.sample("arbitrage_loop_lag_max_seconds", self.lag.max)
+        return str(out)
+
+    def _families(
+        self,
+        out: Exposition,
+        families: tuple[tuple[str, str, str, Callable[[Any], Any]], ...],
+        objects: Iterable[Any],
+        labels: Callable[[Any], dict[str, Any]],
+    ) -> None:
+        """Expose a metric of each object per family, read by the family's getter."""
+        for name, kind, help, value in families:
+            out.family(name, kind, help)
+            for obj in objects:
+                if kind == "histogram":
+                    out.histogram(name, value(obj), **labels(obj))
+                else:
+                    out.sample(name, value(obj), **labels(obj))
+
+    def _feeds(self, out: Exposition, exchanges: Iterable[Any]) -> None:
+        now = monotonic_ns()
+        families = (
+            (
+                "arbitrage_messages_total",
+                "counter",
+                "Messages received, heartbeats included",
+                lambda e: e.health.messages,
+            ),
+            (
+                "arbitrage_parse_seconds",
+                "histogram",
+                "Time spent decoding a sample of the messages",
+                lambda e: e.health.parse_time,
+            ),
+            (
+                "arbitrage_reconnects_total",
+                "counter",
+                "Connections that went down & were reestablished",
+                lambda e: len(e.health.lifetimes),
+            ),
+            (
+                "arbitrage_connection_lifetime_seconds",
+                "histogram",
+                "How long the connections stayed up",
+                lambda e: e.health.lifetimes,
+            ),
+            (
+                "arbitrage_subscribe_failures_total",
+                "counter",
+                "Subscriptions refused or left unanswered",
+                lambda e: e.health.subscribe_failures,
+            ),
+            (
+                "arbitrage_malformed_frames_total",
+                "counter",
+                "Frames that couldn't be decoded & were skipped",
+                lambda e: e.health.malformed,
+            ),
+            (
+                "arbitrage_feed_silence_seconds",
+                "gauge",
+                "Time since the last message, ping or pong",
+                lambda e: e.health.silence(now) / 1e9,
+            ),
+        )
+        self._families(out, families, exchanges, lambda e: {"exchange": e.exchange})
+
+    def _quotes(self, out: Exposition, exchanges: Iterable[Any]) -> None:
+        now = time_ns()
+        out.family(
+            "arbitrage_quote_age_seconds",
+            "gauge",
+            "Time since the quote of a pair last changed",
+        )
+        for exchange in exchanges:
+            for key, quote in exchange.data.items():
+                out.sample(
+                    "arbitrage_quote_age_seconds",
+                    (now - quote.receive_time) / 1e9,
+                    exchange=exchange.exchange,
+                    pair=key,
+                )
+
+    def _evaluations(self, out: Exposition) -> None:
+        out.family(
+            "arbitrage_evaluation_seconds",
+            "histogram",
+            "Time spent evaluating a pair, order books included",
+        )
+        out.histogram("arbitrage_evaluation_seconds", self.notify.evaluation)
+        out.family(
+            "arbitrage_spread_percent",
+            "gauge",
+            "Latest price difference of a pair between the highest bid & the lowest ask, in %",
+        )
+        for key, spread in self.notify.spreads.items():
+            out.sample("arbitrage_spread_percent", spread, pair=key)
+
+    def _platforms(self, out: Exposition) -> None:
+        families = (
+            (
+                "arbitrage_notifications_total",
+                "counter",
+                "Notifications queued for delivery",
+                lambda p: p.notified,
+            ),
+            (
+                "arbitrage_notifications_suppressed_total",
+                "counter",
+                "Evaluations over the threshold left out during the cooldown",
+                lambda p: p.suppressed,
+            ),
+            (
+                "arbitrage_notifications_dropped_total",
+                "counter",
+                "Notifications dropped as the delivery fell behind",
+                lambda p: p.dropped,
+            ),
+            (
+                "arbitrage_delivery_seconds",
+                "histogram",
+                "Time from queueing a notification to delivering it",
+                lambda p: p.delivery,
+            ),
+        )
+        self._families(
+            out,
+            families,
+            self.notify.platforms.values(),
+            lambda p: {"platform": p.platform},
+        )
+
+    async def metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.render(), content_type="text/plain")
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving, returns the url of the metrics."""
+        app = web.Application()
+        app.router.add_get("/metrics", self.metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        return f"http://{host}:{port}/metrics"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def run(self, host: str, port: int) -> None:
+        """Serve the metrics until cancelled."""
+        url = await self.start(host, port)
+        log.info(f"Serving the metrics on {url}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.stop()
@@ -0,0 +1,55 @@
+import re
+from typing import Any
+
+
+def pair_key(pair: str) -> str:
+    """Exchange agnostic notation of a pair, e.g. "eth/usdt", "ETH-USDT" and "ethusdt" are all "ETHUSDT"."""
+    return re.sub(r"[-/:]", "", pair).upper()
+
+
+def parse_pair(pair: str) -> tuple[str, str]:
+    """Split a pair written as BASE/QUOTE or BASE-QUOTE into its assets."""
+    assets = re.split(r"[-/:]", pair.strip())
+    if len(assets) != 2 or not all(assets):
+        raise ValueError(f"Invalid pair '{pair}', expected BASE/QUOTE")
+    return assets[0], assets[1]
+
+
+def make_pair(base: str, quote: str) -> dict[str, Any]:
+    """Build the notations used by the different exchanges for a pair.
+
+    Different exchanges use different notations, for example
+    FTX uses ETH/USDT while Binance uses ETHUSDT
+    """
+    return {
+        "base": base.lower(),
+        "quote": quote.lower(),
+        "-": f"{base}-{quote}",
+        "/": f"{base}/{quote}",
+        "merged": f"{base}{quote}",
+        "key": pair_key(f"{base}{quote}"),
+    }
+
+
+def cross_pairs(
+    pairs: list[tuple[str, str]], quotes: list[str]
+) -> list[tuple[str, str]]:
+    """The pairs converting the bases of pairs & the quote assets into one another.
+
+    Each base is paired with every quote asset, and the quote assets with each
+    other both ways round, since which of them is the base varies between the
+    exchanges, e.g. USDC/USDT & USDT/USDC. The pairs an exchange doesn't list
+    are left out once it checks them.
+    """
+    quotes = [quote.upper() for quote in quotes]
+    bases = [base.upper() for base, _ in pairs]
+    crossed = [(base, quote) for base in bases for quote in quotes if base != quote]
+    crossed += [(base, quote) for base in quotes for quote in quotes if base != quote]
+
+    known = {(base.upper(), quote.upper()) for base, quote in pairs}
+    added = []
+    for pair in crossed:
+        if pair not in known:
+            known.add(pair)
+            added.append(pair)
+    return added
@@ -3,6 +3,11 @@ import sys
 import os
 import logging
 
+from exchanges import decoder, registry
+from exchanges.catalog import DEFAULT_CACHE
+from utils import loop
+from utils.pairs import cross_pairs, parse_pair
+
 
 def parse_args() -> argparse.Namespace:
     argsparse = argparse.ArgumentParser("Arbitrage Gossiper")
@@ -11,14 +16,25 @@ def parse_args() -> argparse.Namespace:
         "--base",
         type=str,
         help="Base asset. ETHUSDT, ETH is base asset",
-        required=True,
     )
     argsparse.add_argument(
         "-q",
         "--quote",
         type=str,
         help="Quote asset. ETHUSDT, USDT is quote asset",
-        required=True,
+    )
+    argsparse.add_argument(
+        "-p",
+        "--pairs",
+        type=str,
+        help="Comma separated list of pairs to monitor in addition to --base/--quote, e.g. btc/usdt,eth/usdt",
+        default="",
+    )
+    argsparse.add_argument(
+        "--pairs-file",
+        type=str,
+        help="File with one BASE/QUOTE pair per line to monitor in addition to --base/--quote and --pairs. Lines starting with # are ignored",
+        default="",
     )
     argsparse.add_argument(
         "--report-to",
@@ -39,6 +55,108 @@ def parse_args() -> argparse.Namespace:
         help="Report to the platforms every cooldown seconds. Defaults to 60 seconds",
         default=60.0,
     )
+    argsparse.add_argument(
+        "--coalesce",
+        type=float,
+        help="Evaluate the price difference at most once every coalesce seconds, grouping bursts of ticks together. Defaults to 0 (evaluate on every tick).",
+        default=0.0,
+    )
+    argsparse.add_argument(
+        "--max-age",
+        type=float,
+        help="Leave out the prices of the exchanges from which nothing, not even a heartbeat, was received for max-age seconds, 0 never leaves them out. Defaults to 30 seconds",
+        default=30.0,
+    )
+    argsparse.add_argument(
+        "--standby",
+        action="store_true",
+        help="Keep a second connection subscribed to each exchange, so that the prices keep flowing while either of them reconnects",
+    )
+    argsparse.add_argument(
+        "--depth",
+        action="store_true",
+        help="Stream the order books of the exchanges supporting it (binance, huobi, kucoin, bitfinex) and report the size that can be traded at a profit. By default only the top of the book is streamed",
+    )
+    argsparse.add_argument(
+        "--exchanges",
+        type=str,
+        help=f"Comma separated list of the exchanges to monitor, among {', '.join(registry.names())}, including the ones installed by other packages. Only their modules are imported. Defaults to all the shipped ones",
+        default=",".join(registry.ADAPTERS),
+    )
+    argsparse.add_argument(
+        "--taker-fee",
+        type=str,
+        help="Comma separated list of exchange=fee overriding the default taker fees, e.g. binance=0.00075,kucoin=0.0008",
+        default="",
+    )
+    argsparse.add_argument(
+        "--endpoint",
+        type=str,
+        help="Comma separated list of exchange=url pointing the exchanges at other servers, e.g. the mock exchanges of mock/server.py, keeping the paths of their apis. The symbols cache isn't used meanwhile",
+        default="",
+    )
+    argsparse.add_argument(
+        "--capture",
+        type=str,
+        help="Directory into which the websocket frames received from each exchange are recorded, to be replayed by benchmarks/bench_replay.py. By default nothing is recorded",
+        default="",
+    )
+    argsparse.add_argument(
+        "--workers",
+        type=int,
+        help="Stream the exchanges in this many worker processes, each subscribing to a share of the exchanges' pairs, while the prices are compared in the main one. Not supported with --depth or --capture. Defaults to 0, everything runs in a single process",
+        default=0,
+    )
+    argsparse.add_argument(
+        "--cross-quotes",
+        type=str,
+        help="Comma separated list of quote assets, e.g. usdt,usdc,usd,btc. Every base is also monitored against each of them, the quote assets against each other, and the cycles of conversions between the assets earning more than --threshold after the fees are reported. By default only the pairs themselves are compared",
+        default="",
+    )
+    argsparse.add_argument(
+        "--store",
+        type=str,
+        help="SQLite database into which every quote & every evaluated price difference is stored, written in batches by a background thread. By default nothing is stored",
+        default="",
+    )
+    argsparse.add_argument(
+        "--symbols-cache",
+        type=str,
+        help="File in which the symbols listed by the exchanges are cached. Defaults to ~/.cache/arbitrage-gossip/symbols.json",
+        default=DEFAULT_CACHE,
+    )
+    argsparse.add_argument(
+        "--symbols-ttl",
+        type=float,
+        help="Seconds for which the cached symbols are used before being downloaded again, 0 disables the cache. Defaults to 3600 seconds",
+        default=3600.0,
+    )
+    argsparse.add_argument(
+        "--json-decoder",
+        type=str,
+        help="JSON decoder for the websocket messages. Defaults to auto, the fastest installed one",
+        default="auto",
+        choices=["auto", *decoder.DECODERS],
+    )
+    argsparse.add_argument(
+        "--metrics-port",
+        type=int,
+        help="Serve the metrics of the feeds, the evaluations & the notifications at http://METRICS_HOST:METRICS_PORT/metrics, in the Prometheus text format. Defaults to 0, not served",
+        default=0,
+    )
+    argsparse.add_argument(
+        "--metrics-host",
+        type=str,
+        help="Address the metrics are served on. Defaults to 127.0.0.1",
+        default="127.0.0.1",
+    )
+    argsparse.add_argument(
+        "--loop",
+        type=str,
+        help="Event loop running the program, uvloop falls back to asyncio when it isn't installed. Defaults to asyncio",
+        default="asyncio",
+        choices=loop.LOOPS,
+    )
     argsparse.add_argument(
         "--log-level",
         type=str,
@@ -46,14 +164,93 @@ def parse_args() -> argparse.Namespace:
         default="info",
         choices=["debug", "info", "warning", "error"],
     )
+    argsparse.add_argument(
+        "--log-sample",
+        type=int,
+        help="With debug logging, log only one in every log-sample received websocket messages. Defaults to 1 (log all)",
+        default=1,
+    )
     argsparse.add_argument(
         "--log-file",
         type=str,
-        help="Specify a filename to log into. Defaults to {pair}.log. Log directory is by default /var/log/arbitrage-gossip",
+        help="Specify a filename to log into. Defaults to {pair}.log, or multi.log when monitoring multiple pairs. Log directory is by default /var/log/arbitrage-gossip",
         default="",
     )
+    argsparse.add_argument(
+        "--log-format",
+        type=str,
+        help="Format of the logged lines, json writes a JSON object per line. Defaults to text",
+        default="text",
+        choices=["text", "json"],
+    )
+    argsparse.add_argument(
+        "--log-max-size",
+        type=float,
+        help="Rotate the log file once it grows over log-max-size MB, 0 never does. Defaults to 0",
+        default=0.0,
+    )
+    argsparse.add_argument(
+        "--log-rotate",
+        type=str,
+        help="Rotate the log file every hour or at midnight, instead of by its size. Defaults to none",
+        default="none",
+        choices=["none", "hourly", "midnight"],
+    )
+    argsparse.add_argument(
+        "--log-backups",
+        type=int,
+        help="Number of rotated log files kept. Defaults to 7",
+        default=7,
+    )
     args = argsparse.parse_args()
 
+    # Gather the monitored pairs from --base/--quote, --pairs and --pairs-file
+    if bool(args.base) != bool(args.quote):
+        sys.stderr.write("--base and --quote have to be specified together\n")
+        argsparse.print_help()
+        sys.exit(1)
+
+    raw_pairs = [f"{args.base}/{args.quote}"] if args.base else []
+    raw_pairs += [pair for pair in args.pairs.split(",") if pair.strip()]
+    if args.pairs_file:
+        try:
+            with open(args.pairs_file) as f:
+                raw_pairs += [
+                    line for line in f if line.strip() and not line.startswith("#")
+                ]
+        except OSError as e:
+            sys.stderr.write(f"Unable to read --pairs-file: {e}\n")
+            sys.exit(1)
+
+    args.pairs = []
+    for raw_pair in raw_pairs:
+        try:
+            pair = parse_pair(raw_pair)
+        except ValueError as e:
+            sys.stderr.write(f"{e}\n")
+            argsparse.print_help()
+            sys.exit(1)
+        if pair not in args.pairs:
+            args.pairs.append(pair)
+
+    # The quote assets the bases are converted through, monitored against each other
+    args.cross_quotes = [
+        quote.strip().upper() for quote in args.cross_quotes.split(",") if quote.strip()
+    ]
+    if len(args.cross_quotes) == 1:
+        sys.stderr.write("--cross-quotes needs at least two quote assets\n")
+        argsparse.print_help()
+        sys.exit(1)
+    if args.cross_quotes:
+        args.pairs += cross_pairs(args.pairs, args.cross_quotes)
+
+    if not args.pairs:
+        sys.stderr.write(
+            "No pairs to monitor, use --base/--quote, --pairs or --pairs-file\n"
+        )
+        argsparse.print_help()
+        sys.exit(1)
+
     # Verify the platforms we report to, currently only twitter is supported
     if args.report_to == "none":
         ...
@@ -67,6 +264,75 @@ def parse_args() -> argparse.Namespace:
                 argsparse.print_help()
                 sys.exit(1)
 
+    # Verify the monitored exchanges
+    supported_exchanges = registry.names()
+    args.exchanges = list(
+        dict.fromkeys(
+            name.strip().lower() for name in args.exchanges.split(",") if name.strip()
+        )
+    )
+    for name in args.exchanges:
+        if name not in supported_exchanges:
+            sys.stderr.write(f"Invalid --exchanges exchange: '{name}'\n")
+            argsparse.print_help()
+            sys.exit(1)
+    if not args.exchanges:
+        sys.stderr.write("No exchanges to monitor, use --exchanges\n")
+        argsparse.print_help()
+        sys.exit(1)
+
+    # Verify the taker fee overrides
+    taker_fees = {}
+    for entry in args.taker_fee.split(","):
+        if not entry.strip():
+            continue
+        exchange, _, fee = entry.partition("=")
+        exchange = exchange.strip().lower()
+        try:
+            fee = float(fee)
+        except ValueError:
+            fee = -1
+        if exchange not in supported_exchanges or not 0 <= fee < 1:
+            sys.stderr.write(f"Invalid --taker-fee entry: '{entry}'\n")
+            argsparse.print_help()
+            sys.exit(1)
+        taker_fees[exchange] = fee
+    args.taker_fee = taker_fees
+
+    # Verify the endpoint overrides
+    endpoints = {}
+    for entry in args.endpoint.split(","):
+        if not entry.strip():
+            continue
+        exchange, _, url = entry.partition("=")
+        exchange = exchange.strip().lower()
+        if exchange not in supported_exchanges or not url.startswith(
+            ("http://", "https://")
+        ):
+            sys.stderr.write(f"Invalid --endpoint entry: '{entry}'\n")
+            argsparse.print_help()
+            sys.exit(1)
+        endpoints[exchange] = url.strip()
+    args.endpoint = endpoints
+
+    # Verify the worker processes
+    if args.workers < 0 or args.workers and (args.depth or args.capture):
+        sys.stderr.write(
+            "--workers has to be positive, and can't be combined with --depth or --capture\n"
+        )
+        argsparse.print_help()
+        sys.exit(1)
+
+    # Verify the log rotation
+    if args.log_max_size < 0 or args.log_backups < 0:
+        sys.stderr.write("--log-max-size and --log-backups can't be negative\n")
+        argsparse.print_help()
+        sys.exit(1)
+    if args.log_max_size and args.log_rotate != "none":
+        sys.stderr.write("--log-max-size and --log-rotate can't be combined\n")
+        argsparse.print_help()
+        sys.exit(1)
+
     # Initialize the Logging level.
     if args.log_level.lower() == "debug":
         args.log_level = logging.DEBUG
@@ -80,9 +346,12 @@ def parse_args() -> argparse.Namespace:
     # Initialize the log file
     if not args.log_file:
         default_logdir = "/var/log/arbitrage-gossip"
-        args.log_file = os.path.join(
-            default_logdir, f"{args.base.lower()}{args.quote.lower()}.log"
-        )
+        if len(args.pairs) == 1:
+            base, quote = args.pairs[0]
+            log_name = f"{base.lower()}{quote.lower()}.log"
+        else:
+            log_name = "multi.log"
+        args.log_file = os.path.join(default_logdir, log_name)
         try:
             if not os.path.exists(default_logdir):
                 os.mkdir(default_logdir)
@@ -0,0 +1,142 @@
+import struct
+from multiprocessing import shared_memory
+from typing import Optional
+
+# kind of the records
+QUOTE = 0
+HEARTBEAT = 1
+
+# kind, exchange index, pair index, bid, bid size, ask, ask size,
+# exchange time, receive time, sequence, padded to 64 bytes
+RECORD = struct.Struct("<BBHddddqqq4x")
+
+# the head (next record to write) & the tail (next record to read), each on its own cache line,
+# followed by the capacity, as the memory may have been rounded up to whole pages
+COUNTER = struct.Struct("<Q")
+HEAD = 0
+TAIL = 64
+CAPACITY = 8
+HEADER_SIZE = 128
+
+
+class QuoteRing:
+    """Ring buffer of fixed size quote records in shared memory.
+
+    A single process writes the records & a single other process reads them,
+    each one only moving its own counter, so no lock is needed. The counters
+    only grow, the slot of a record is its counter modulo the capacity.
+    When the reader falls a whole ring behind, the new records are dropped
+    rather than blocking the writer.
+    """
+
+    def __init__(self, memory: shared_memory.SharedMemory, capacity: int) -> None:
+        self.memory = memory
+        self.buf = memory.buf
+
+        """Number of records the ring holds, a power of two"""
+        self.capacity = capacity
+        self._mask = capacity - 1
+
+        """Records the writer had to drop because the ring was full"""
+        self.dropped = 0
+
+    @classmethod
+    def create(cls, capacity: int = 1 << 16) -> "QuoteRing":
+        """Allocate a new ring, capacity is rounded up to a power of two."""
+        capacity = 1 << max(capacity - 1, 1).bit_length()
+        memory = shared_memory.SharedMemory(
+            create=True, size=HEADER_SIZE + capacity * RECORD.size
+        )
+        memory.buf[:HEADER_SIZE] = bytes(HEADER_SIZE)
+        COUNTER.pack_into(memory.buf, CAPACITY, capacity)
+        return cls(memory, capacity)
+
+    @classmethod
+    def attach(cls, name: str) -> "QuoteRing":
+        """Attach to a ring created by another process, which remains responsible for unlinking it.
+
+        The processes have to share the resource tracker, as the ones spawned by
+        the creator do, or the memory is unlinked when the attached one exits.
+        """
+        memory = shared_memory.SharedMemory(name=name)
+        return cls(memory, COUNTER.unpack_from(memory.buf, CAPACITY)[0])
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def __len__(self) -> int:
+        """Records written & not yet read."""
+        return self._load(HEAD) - self._load(TAIL)
+
+    def _load(self, offset: int) -> int:
+        return COUNTER.unpack_from(self.buf, offset)[0]
+
+    def push(
+        self,
+        kind: int,
+        exchange: int,
+        pair: int,
+        bid: float = 0.0,
+        bid_size: float = 0.0,
+        ask: float = 0.0,
+        ask_size: float = 0.0,
+        exchange_time: int = 0,
+        receive_time: int = 0,
+        sequence: int = 0,
+    ) -> bool:
+        """Write a record, returns False if the ring was full & the record dropped."""
+        head = self._load(HEAD)
+        if head - self._load(TAIL) >= self.capacity:
+            self.dropped += 1
+            return False
+
+        RECORD.pack_into(
+            self.buf,
+            HEADER_SIZE + (head & self._mask) * RECORD.size,
+            kind,
+            exchange,
+            pair,
+            bid,
+            bid_size,
+            ask,
+            ask_size,
+            exchange_time,
+            receive_time,
+            sequence,
+        )
+        # the record is complete before the reader can see it
+        COUNTER.pack_into(self.buf, HEAD, head + 1)
+        return True
+
+    def pop(self, limit: Optional[int] = None) -> list[tuple]:
+        """Read the written records, at most limit of them, from the oldest one."""
+        tail = self._load(TAIL)
+        head = self._load(HEAD)
+        if limit is not None:
+            head = min(head, tail + limit)
+        if head == tail:
+            return []
+
+        # the records up to the end of the buffer, then the ones wrapped around to its start
+        start, end = tail & self._mask, ((head - 1) & self._mask) + 1
+        if start < end:
+            segments = [(start, end)]
+        else:
+            segments = [(start, self.capacity), (0, end)]
+        records = []
+        for first, last in segments:
+            offset = HEADER_SIZE + first * RECORD.size
+            segment = self.buf[offset : offset + (last - first) * RECORD.size]
+            records.extend(RECORD.iter_unpack(segment))
+            segment.release()
+
+        COUNTER.pack_into(self.buf, TAIL, head)
+        return records
+
+    def close(self) -> None:
+        self.buf = None
+        self.memory.close()
+
+    def unlink(self) -> None:
+        self.memory.unlink()
@@ -0,0 +1,100 @@
+import heapq
+from typing import Optional
+
+
+class PriceTracker:
+    """Incrementally track the lowest and the highest price among a set of keys.
+
+    Each update is pushed onto a min-heap and a max-heap in O(log N), the extremes
+    are then read in amortized O(1). Outdated heap entries aren't searched for and
+    removed on update, instead they are dropped once they reach the top of a heap.
+
+    Ties are broken by the order in which the keys were first seen - the earliest key
+    wins the minimum and the latest key wins the maximum, so whenever more than one
+    key is tracked the minimum and the maximum are guaranteed to differ.
+    """
+
+    def __init__(self) -> None:
+        """Latest price of each key"""
+        self.prices: dict[str, float] = {}
+
+        """Bumped on every update of a key, invalidating its older heap entries"""
+        self._versions: dict[str, int] = {}
+
+        """Order in which the keys were first seen"""
+        self._order: dict[str, int] = {}
+
+        """Heaps of (price, order, version, key), the max heap negates price and order"""
+        self._min_heap: list[tuple[float, int, int, str]] = []
+        self._max_heap: list[tuple[float, int, int, str]] = []
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.prices
+
+    def update(self, key: str, price: float) -> None:
+        """Set the latest price of key."""
+        if self.prices.get(key) == price:
+            return
+
+        if key not in self._order:
+            self._order[key] = len(self._order)
+        order = self._order[key]
+        version = self._versions.get(key, 0) + 1
+
+        self._versions[key] = version
+        self.prices[key] = price
+        heapq.heappush(self._min_heap, (price, order, version, key))
+        heapq.heappush(self._max_heap, (-price, -order, version, key))
+
+        # the heaps are rebuilt once outdated entries outnumber the live ones
+        if len(self._min_heap) + len(self._max_heap) > 4 * len(self.prices) + 64:
+            self._rebuild()
+
+    def discard(self, key: str) -> None:
+        """Stop tracking key, until its next update."""
+        if key in self.prices:
+            del self.prices[key]
+            self._versions[key] += 1
+
+    def min(self, exclude: Optional[str] = None) -> Optional[str]:
+        """Key with the lowest price, other than exclude."""
+        return self._top(self._min_heap, exclude)
+
+    def max(self, exclude: Optional[str] = None) -> Optional[str]:
+        """Key with the highest price, other than exclude."""
+        return self._top(self._max_heap, exclude)
+
+    def _top(
+        self, heap: list[tuple[float, int, int, str]], exclude: Optional[str] = None
+    ) -> Optional[str]:
+        while heap:
+            _, _, version, key = heap[0]
+            if key in self.prices and self._versions[key] == version:
+                break
+            heapq.heappop(heap)
+        else:
+            return None
+
+        if key != exclude:
+            return key
+
+        # the runner-up is found by setting the top aside for a moment
+        entry = heapq.heappop(heap)
+        runner_up = self._top(heap)
+        heapq.heappush(heap, entry)
+        return runner_up
+
+    def _rebuild(self) -> None:
+        self._min_heap = [
+            (price, self._order[key], self._versions[key], key)
+            for key, price in self.prices.items()
+        ]
+        self._max_heap = [
+            (-price, -self._order[key], self._versions[key], key)
+            for key, price in self.prices.items()
+        ]
+        heapq.heapify(self._min_heap)
+        heapq.heapify(self._max_heap)